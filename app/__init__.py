@@ -6,10 +6,10 @@ from fastapi import FastAPI, Request, status
 from fastapi.encoders import jsonable_encoder
 from fastapi.exceptions import RequestValidationError
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
 from fastapi.routing import APIRoute
 
 from app.utils.logger import get_logger
+from app.utils.serializer import JSONResponse
 from config import ALLOWED_ORIGINS, DOCS, SUBSCRIPTION_PATH
 
 __version__ = "1.0.0-beta-1"
@@ -63,6 +63,7 @@ app = FastAPI(
     description="Unified GUI Censorship Resistant Solution",
     version=__version__,
     lifespan=lifespan,
+    default_response_class=JSONResponse,
     openapi_url="/openapi.json" if DOCS else None,
 )
 
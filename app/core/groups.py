@@ -0,0 +1,68 @@
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app import on_startup
+from app.db import GetDB
+from app.db.models import Group, ProxyInbound, User, inbounds_groups_association
+
+EMPTY_TAGS: frozenset[str] = frozenset()
+
+
+class GroupInboundIndex:
+    """
+    In-memory group_id -> frozenset of inbound tags.
+
+    Resolving a user's inbounds is a union of cached sets over the user's (already loaded) groups,
+    a group missing from the index falls back to loading its inbounds once and is cached afterwards.
+    """
+
+    def __init__(self):
+        self._tags: dict[int, frozenset[str]] = {}
+
+    def __len__(self) -> int:
+        return len(self._tags)
+
+    def get(self, group_id: int) -> frozenset[str] | None:
+        return self._tags.get(group_id)
+
+    def set(self, group_id: int, tags) -> None:
+        self._tags[group_id] = frozenset(tags)
+
+    def remove(self, group_id: int) -> None:
+        self._tags.pop(group_id, None)
+
+    async def refresh(self, db: AsyncSession) -> None:
+        stmt = select(inbounds_groups_association.c.group_id, ProxyInbound.tag).join(
+            ProxyInbound, ProxyInbound.id == inbounds_groups_association.c.inbound_id
+        )
+        tags: dict[int, set[str]] = {}
+        for group_id, tag in await db.execute(stmt):
+            tags.setdefault(group_id, set()).add(tag)
+
+        group_ids = (await db.execute(select(Group.id))).scalars().all()
+        self._tags = {group_id: frozenset(tags.get(group_id, ())) for group_id in group_ids}
+
+    async def group_tags(self, group: Group) -> frozenset[str]:
+        tags = self._tags.get(group.id)
+        if tags is None:
+            await group.awaitable_attrs.inbounds
+            tags = self._tags[group.id] = frozenset(group.inbound_tags)
+        return tags
+
+    async def user_inbounds(self, user: User) -> list[str]:
+        """Returns a flat list of all included inbound tags across the user's enabled groups"""
+        groups = [group for group in user.groups if not group.is_disabled]
+        if not groups:
+            return []
+        if len(groups) == 1:
+            return list(await self.group_tags(groups[0]))
+        return list(EMPTY_TAGS.union(*[await self.group_tags(group) for group in groups]))
+
+
+group_inbounds = GroupInboundIndex()
+
+
+@on_startup
+async def initialize_group_inbounds():
+    async with GetDB() as db:
+        await group_inbounds.refresh(db)
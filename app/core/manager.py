@@ -1,7 +1,7 @@
-from copy import deepcopy
+from types import MappingProxyType
+from typing import Any, Mapping
 
 from aiorwlock import RWLock
-from aiocache import cached
 
 from app import on_startup
 from app.core.abstract_core import AbstractCore
@@ -11,12 +11,32 @@ from app.db.crud.core import get_core_configs
 from app.db.models import CoreConfig
 
 
+def freeze(value: Any) -> Any:
+    """Read-only deep copy of a config value, dicts become read-only mappings and lists become tuples."""
+    if isinstance(value, Mapping):
+        return MappingProxyType({key: freeze(item) for key, item in value.items()})
+    if isinstance(value, (list, tuple)):
+        return tuple(freeze(item) for item in value)
+    return value
+
+
+def thaw(value: Any) -> Any:
+    """Modifiable deep copy of a value returned by `freeze`."""
+    if isinstance(value, Mapping):
+        return {key: thaw(item) for key, item in value.items()}
+    if isinstance(value, tuple):
+        return [thaw(item) for item in value]
+    return value
+
+
 class CoreManager:
     def __init__(self):
         self._cores: dict[int, AbstractCore] = {}
         self._lock = RWLock(fast=True)
-        self._inbounds: list[str] = []
-        self._inbounds_by_tag = {}
+        # immutable snapshot, swapped as a whole on update so readers need neither the lock nor a copy
+        self._inbounds: tuple[str, ...] = ()
+        self._inbounds_by_tag: Mapping[str, Mapping] = MappingProxyType({})
+        self.version = 0
 
     @staticmethod
     def validate_core(
@@ -32,11 +52,9 @@ class CoreManager:
             for core in self._cores.values():
                 new_inbounds.update(core.inbounds_by_tag)
 
-            self._inbounds_by_tag = new_inbounds
-            self._inbounds = list(self._inbounds_by_tag.keys())
-
-            await self.get_inbounds.cache.clear()
-            await self.get_inbounds_by_tag.cache.clear()
+            inbounds_by_tag = freeze(new_inbounds)
+            self._inbounds_by_tag, self._inbounds = inbounds_by_tag, tuple(inbounds_by_tag)
+            self.version += 1
 
     async def update_core(self, db_core_config: CoreConfig):
         backend_config = self.validate_core(
@@ -67,22 +85,16 @@ class CoreManager:
 
             return core
 
-    @cached()
-    async def get_inbounds(self) -> list[str]:
-        async with self._lock.reader_lock:
-            return deepcopy(self._inbounds)
+    async def get_inbounds(self) -> tuple[str, ...]:
+        return self._inbounds
 
-    @cached()
-    async def get_inbounds_by_tag(self) -> dict:
-        async with self._lock.reader_lock:
-            return deepcopy(self._inbounds_by_tag)
+    async def get_inbounds_by_tag(self) -> Mapping[str, Mapping]:
+        """Read-only view of every inbound, nested values included, use `thaw` to get one that can be modified."""
+        return self._inbounds_by_tag
 
-    async def get_inbound_by_tag(self, tag) -> dict:
-        async with self._lock.reader_lock:
-            inbound = self._inbounds_by_tag.get(tag, None)
-            if not inbound:
-                return None
-            return deepcopy(inbound)
+    async def get_inbound_by_tag(self, tag) -> Mapping | None:
+        """Read-only view of an inbound, use `thaw` to get one that can be modified."""
+        return self._inbounds_by_tag.get(tag, None)
 
 
 core_manager = CoreManager()
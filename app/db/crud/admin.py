@@ -181,19 +181,20 @@ async def get_admins(
     return admins
 
 
-async def reset_admin_usage(db: AsyncSession, db_admin: Admin) -> Admin:
+async def reset_admin_usage(db: AsyncSession, db_admin: Admin, pending_usage: int = 0) -> Admin:
     """
     Retrieves an admin's usage by their username.
     Args:
         db (AsyncSession): Database session.
         db_admin (Admin): The admin object to be updated.
+        pending_usage (int, optional): Traffic of the admin not yet written to the database.
     Returns:
         Admin: The updated admin.
     """
-    if db_admin.used_traffic == 0:
+    if db_admin.used_traffic + pending_usage == 0:
         return db_admin
 
-    usage_log = AdminUsageLogs(admin_id=db_admin.id, used_traffic_at_reset=db_admin.used_traffic)
+    usage_log = AdminUsageLogs(admin_id=db_admin.id, used_traffic_at_reset=db_admin.used_traffic + pending_usage)
     db.add(usage_log)
     db_admin.used_traffic = 0
 
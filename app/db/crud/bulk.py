@@ -20,10 +20,10 @@ from app.models.group import BulkGroup
 from app.models.user import BulkUser, BulkUsersProxy
 
 from .general import get_datetime_add_expression
-from .user import load_user_attrs
+from .user import USER_NODE_OPTIONS, load_users_attrs
 
 
-async def reset_all_users_data_usage(db: AsyncSession, admin: Optional[Admin] = None):
+async def reset_all_users_data_usage(db: AsyncSession, admin: Optional[Admin] = None) -> list[int]:
     """
     Efficiently resets data usage for all users, or users under a specific admin if provided.
 
@@ -44,12 +44,15 @@ async def reset_all_users_data_usage(db: AsyncSession, admin: Optional[Admin] =
         - All operations are executed in bulk for performance.
         - This function assumes proper foreign key constraints and cascading rules are in place.
         - The function commits changes at the end of the operation.
+
+    Returns:
+        list[int]: Ids of the reset users.
     """
     user_ids_query = select(User.id).where(User.admin_id == admin.id) if admin else select(User.id)
     user_ids = (await db.execute(user_ids_query)).scalars().all()
 
     if not user_ids:
-        return
+        return []
 
     await db.execute(update(User).where(User.id.in_(user_ids)).values(used_traffic=0, status=UserStatus.active))
 
@@ -58,6 +61,7 @@ async def reset_all_users_data_usage(db: AsyncSession, admin: Optional[Admin] =
     await db.execute(delete(NextPlan).where(NextPlan.user_id.in_(user_ids)))
 
     await db.commit()
+    return user_ids
 
 
 async def disable_all_active_users(db: AsyncSession, admin: Admin | None = None):
@@ -177,10 +181,7 @@ async def add_groups_to_users(db: AsyncSession, bulk_model: BulkGroup) -> tuple[
     await db.commit()
 
     # Return users that actually had groups added
-    result = await db.execute(select(User).where(User.id.in_({r["user_id"] for r in new_rows})))
-    users = result.scalars().all()
-    for user in users:
-        await load_user_attrs(user)
+    users = await load_users_attrs(db, list({r["user_id"] for r in new_rows}), USER_NODE_OPTIONS)
     return users, count_effctive_users
 
 
@@ -212,21 +213,20 @@ async def remove_groups_from_users(
         )
         .distinct()
     )
-    result = await db.execute(select(User).where(User.id.in_(subquery)))
-    users = result.scalars().all()
+    result = await db.execute(subquery)
+    affected_user_ids = result.scalars().all()
 
-    if not users:
+    if not affected_user_ids:
         return [], count_effctive_users
 
     await db.execute(
         delete(users_groups_association).where(
-            users_groups_association.c.user_id.in_([u.id for u in users]),
+            users_groups_association.c.user_id.in_(affected_user_ids),
             users_groups_association.c.groups_id.in_(bulk_model.group_ids),
         )
     )
     await db.commit()
-    for user in users:
-        await load_user_attrs(user)
+    users = await load_users_attrs(db, affected_user_ids, USER_NODE_OPTIONS)
     return users, count_effctive_users
 
 
@@ -296,10 +296,7 @@ async def update_users_expire(db: AsyncSession, bulk_model: BulkUser) -> tuple[l
 
     # Return the users whose status changed
     if status_changed_user_ids:
-        result = await db.execute(select(User).where(User.id.in_(status_changed_user_ids)))
-        users = result.scalars().all()
-        for user in users:
-            await load_user_attrs(user)
+        users = await load_users_attrs(db, status_changed_user_ids, USER_NODE_OPTIONS)
         return users, count_effctive_users
     return [], count_effctive_users
 
@@ -352,10 +349,7 @@ async def update_users_datalimit(db: AsyncSession, bulk_model: BulkUser) -> tupl
 
     # Return the users whose status changed
     if status_changed_user_ids:
-        result = await db.execute(select(User).where(User.id.in_(status_changed_user_ids)))
-        users = result.scalars().all()
-        for user in users:
-            await load_user_attrs(user)
+        users = await load_users_attrs(db, status_changed_user_ids, USER_NODE_OPTIONS)
         return users, count_effctive_users
     return [], count_effctive_users
 
@@ -369,12 +363,12 @@ async def update_users_proxy_settings(
     final_filter = _create_final_filter(bulk_model)
 
     # First select the users that will be updated
-    select_stmt = select(User).where(final_filter)
+    select_stmt = select(User.id).where(final_filter)
     result = await db.execute(select_stmt)
-    users_to_update = result.scalars().all()
-    count_effctive_users = len(users_to_update)
+    user_ids = result.scalars().all()
+    count_effctive_users = len(user_ids)
 
-    if not users_to_update:
+    if not user_ids:
         return [], count_effctive_users
 
     # Prepare the update statement
@@ -408,9 +402,7 @@ async def update_users_proxy_settings(
     await db.execute(update_stmt)
     await db.commit()
 
-    # Refresh the user objects to get updated values
-    for user in users_to_update:
-        await db.refresh(user)
-        await load_user_attrs(user)
+    # Load the updated users
+    users = await load_users_attrs(db, user_ids, USER_NODE_OPTIONS)
 
-    return users_to_update, count_effctive_users
+    return users, count_effctive_users
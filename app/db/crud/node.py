@@ -144,6 +144,37 @@ async def get_nodes_usage(
     return NodeUsageStatsList(period=period, start=start, end=end, stats=stats)
 
 
+async def get_nodes_latest_users(db: AsyncSession, node_ids: list[int]) -> dict[int, int]:
+    """
+    Counts the users each node served in its latest recorded usage hour.
+
+    Args:
+        db (AsyncSession): The database session.
+        node_ids (list[int]): The nodes to count users for.
+
+    Returns:
+        dict[int, int]: Node id to user count, nodes without recorded usage are left out.
+    """
+    if not node_ids:
+        return {}
+
+    latest = (
+        select(NodeUserUsage.node_id, func.max(NodeUserUsage.created_at).label("created_at"))
+        .where(NodeUserUsage.node_id.in_(node_ids))
+        .group_by(NodeUserUsage.node_id)
+        .subquery()
+    )
+    stmt = (
+        select(NodeUserUsage.node_id, func.count())
+        .join(
+            latest,
+            and_(NodeUserUsage.node_id == latest.c.node_id, NodeUserUsage.created_at == latest.c.created_at),
+        )
+        .group_by(NodeUserUsage.node_id)
+    )
+    return {node_id: users for node_id, users in (await db.execute(stmt)).all()}
+
+
 async def get_node_stats(
     db: AsyncSession, node_id: int, start: datetime, end: datetime, period: Period
 ) -> NodeStatsList:
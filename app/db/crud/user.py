@@ -4,11 +4,12 @@ from datetime import UTC, datetime, timedelta, timezone
 from enum import Enum
 from typing import List, Optional, Sequence
 
-from sqlalchemy import and_, case, delete, desc, func, not_, or_, select, update
+from sqlalchemy import and_, case, delete, desc, func, insert, not_, or_, select, update
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.orm import joinedload
+from sqlalchemy.orm import joinedload, selectinload
 from sqlalchemy.sql.functions import coalesce
 
+from app.db.base import DATABASE_DIALECT
 from app.db.compiles_types import DateDiff
 from app.db.models import (
     Admin,
@@ -31,6 +32,20 @@ from config import USERS_AUTODELETE_DAYS
 from .general import _build_trunc_expression, build_json_proxy_settings_search_condition
 from .group import get_groups_by_ids
 
+PENDING_USAGE_CHUNK_SIZE = 5000
+
+
+# Relationship loading option sets, chosen per call site.
+# Each one loads its relationships for any number of users in a constant number of queries.
+USER_ATTRS_OPTIONS = (
+    joinedload(User.admin),
+    joinedload(User.next_plan),
+    selectinload(User.usage_logs),
+    selectinload(User.groups),
+)
+# enough to serialize users for nodes
+USER_NODE_OPTIONS = (selectinload(User.groups),)
+
 
 async def load_user_attrs(user: User):
     await user.awaitable_attrs.admin
@@ -39,6 +54,18 @@ async def load_user_attrs(user: User):
     await user.awaitable_attrs.groups
 
 
+async def load_users_attrs(db: AsyncSession, user_ids: list[int], options=USER_ATTRS_OPTIONS) -> list[User]:
+    """
+    (Re)loads users by id together with their relationships, replacing per-user `load_user_attrs` calls.
+
+    Users already in the session are refreshed in place.
+    """
+    if not user_ids:
+        return []
+    stmt = select(User).where(User.id.in_(user_ids)).options(*options).execution_options(populate_existing=True)
+    return list((await db.execute(stmt)).unique().scalars().all())
+
+
 async def get_user(db: AsyncSession, username: str) -> Optional[User]:
     """
     Retrieves a user by username.
@@ -50,12 +77,9 @@ async def get_user(db: AsyncSession, username: str) -> Optional[User]:
     Returns:
         Optional[User]: The user object if found, else None.
     """
-    stmt = select(User).where(User.username == username)
+    stmt = select(User).where(User.username == username).options(*USER_ATTRS_OPTIONS)
 
-    user = (await db.execute(stmt)).unique().scalar_one_or_none()
-    if user:
-        await load_user_attrs(user)
-    return user
+    return (await db.execute(stmt)).unique().scalar_one_or_none()
 
 
 async def get_user_by_id(db: AsyncSession, user_id: int) -> User | None:
@@ -69,12 +93,9 @@ async def get_user_by_id(db: AsyncSession, user_id: int) -> User | None:
     Returns:
         Optional[User]: The user object if found, else None.
     """
-    stmt = select(User).where(User.id == user_id)
+    stmt = select(User).where(User.id == user_id).options(*USER_ATTRS_OPTIONS)
 
-    user = (await db.execute(stmt)).unique().scalar_one_or_none()
-    if user:
-        await load_user_attrs(user)
-    return user
+    return (await db.execute(stmt)).unique().scalar_one_or_none()
 
 
 UsersSortingOptions = Enum(
@@ -176,12 +197,9 @@ async def get_users(
     if limit:
         stmt = stmt.limit(limit)
 
-    result = await db.execute(stmt)
+    result = await db.execute(stmt.options(*USER_ATTRS_OPTIONS))
     users = list(result.unique().scalars().all())
 
-    for user in users:
-        await load_user_attrs(user)
-
     if return_with_count:
         return users, total
     return users
@@ -204,19 +222,82 @@ async def get_expired_users(
     return (await db.execute(query)).unique().scalars().all()
 
 
-async def get_active_to_expire_users(db: AsyncSession) -> list[User]:
+async def _get_users_by_ids(db: AsyncSession, user_ids: list[int], *conditions) -> list[User]:
+    users = []
+    for i in range(0, len(user_ids), PENDING_USAGE_CHUNK_SIZE):
+        stmt = select(User).where(User.id.in_(user_ids[i : i + PENDING_USAGE_CHUNK_SIZE]), *conditions)
+        users.extend((await db.execute(stmt)).unique().scalars().all())
+    return users
+
+
+async def get_active_to_expire_users(db: AsyncSession, user_ids: list[int] | None = None) -> list[User]:
+    """
+    Retrieves active users who passed their expire date, only among ``user_ids`` when given.
+    Those are compared with the server's clock instead of the database's, like the deadlines they come from.
+    """
+    if user_ids is not None:
+        users = await _get_users_by_ids(db, user_ids, User.status == UserStatus.active)
+        return [user for user in users if user.is_expired]
+
     stmt = select(User).where(User.status == UserStatus.active).where(User.is_expired)
 
     return list((await db.execute(stmt)).unique().scalars().all())
 
 
-async def get_active_to_limited_users(db: AsyncSession) -> list[User]:
+async def get_active_to_limited_users(
+    db: AsyncSession, pending_usage: dict[int, int] | None = None, user_ids: list[int] | None = None
+) -> list[User]:
+    """
+    Retrieves active users who reached their data limit.
+
+    Args:
+        db (AsyncSession): Database session.
+        pending_usage (dict[int, int], optional): Traffic not yet written to the database, keyed by user id.
+        user_ids (list[int], optional): Only look at these users.
+
+    Returns:
+        list[User]: Users to be limited.
+    """
+    if user_ids is not None:
+        users = await _get_users_by_ids(db, user_ids, User.status == UserStatus.active, User.data_limit > 0)
+        pending_usage = pending_usage or {}
+        return [user for user in users if user.data_limit <= user.used_traffic + pending_usage.get(user.id, 0)]
+
     stmt = select(User).where(User.status == UserStatus.active).where(User.is_limited)
+    users = list((await db.execute(stmt)).unique().scalars().all())
 
-    return list((await db.execute(stmt)).unique().scalars().all())
+    if not pending_usage:
+        return users
+
+    limited_ids = {user.id for user in users}
+    candidate_ids = [uid for uid in pending_usage if uid not in limited_ids]
+    overlay_ids = []
+    for i in range(0, len(candidate_ids), PENDING_USAGE_CHUNK_SIZE):
+        chunk_stmt = select(User.id, User.used_traffic, User.data_limit).where(
+            User.id.in_(candidate_ids[i : i + PENDING_USAGE_CHUNK_SIZE]),
+            User.status == UserStatus.active,
+            User.data_limit > 0,
+        )
+        overlay_ids.extend(
+            uid
+            for uid, used_traffic, data_limit in (await db.execute(chunk_stmt)).all()
+            if data_limit <= used_traffic + pending_usage[uid]
+        )
 
+    if overlay_ids:
+        users.extend((await db.execute(select(User).where(User.id.in_(overlay_ids)))).unique().scalars().all())
+
+    return users
+
+
+async def get_on_hold_to_active_users(db: AsyncSession, user_ids: list[int] | None = None) -> list[User]:
+    """
+    Retrieves on hold users who came online or passed their on hold timeout. When ``user_ids`` is given
+    those are already known to be due, like users seen in traffic not yet written to the database.
+    """
+    if user_ids is not None:
+        return await _get_users_by_ids(db, user_ids, User.status == UserStatus.on_hold)
 
-async def get_on_hold_to_active_users(db: AsyncSession) -> list[User]:
     stmt = select(User).where(User.status == UserStatus.on_hold).where(User.become_online)
 
     return list((await db.execute(stmt)).unique().scalars().all())
@@ -280,16 +361,13 @@ async def get_usage_percentage_reached_users(db: AsyncSession, percentage: int)
 
     stmt = (
         select(User)
-        .options(joinedload(User.notification_reminders))
+        .options(joinedload(User.notification_reminders), *USER_ATTRS_OPTIONS)
         .where(User.status == UserStatus.active)
         .where(User.usage_percentage >= percentage)
         .where(not_(existing_reminder_subq))  # Only users without existing reminders
     )
 
-    users = list((await db.execute(stmt)).unique().scalars().all())
-    for user in users:
-        await load_user_attrs(user)
-    return users
+    return list((await db.execute(stmt)).unique().scalars().all())
 
 
 async def get_days_left_reached_users(db: AsyncSession, days: int) -> list[User]:
@@ -310,17 +388,14 @@ async def get_days_left_reached_users(db: AsyncSession, days: int) -> list[User]
 
     stmt = (
         select(User)
-        .options(joinedload(User.notification_reminders))
+        .options(joinedload(User.notification_reminders), *USER_ATTRS_OPTIONS)
         .where(User.status == UserStatus.active)
         .where(User.expire.isnot(None))
         .where(User.days_left == days)
         .where(not_(existing_reminder_subq))  # Only users without existing reminders
     )
 
-    users = list((await db.execute(stmt)).unique().scalars().all())
-    for user in users:
-        await load_user_attrs(user)
-    return users
+    return list((await db.execute(stmt)).unique().scalars().all())
 
 
 async def get_user_usages(
@@ -594,13 +669,13 @@ async def modify_user(db: AsyncSession, db_user: User, modify: UserModify) -> Us
     return db_user
 
 
-async def _reset_user_traffic_and_log(db: AsyncSession, db_user: User):
-    """Helper to reset user traffic and log the action."""
+async def _reset_user_traffic_and_log(db: AsyncSession, db_user: User, pending_usage: int = 0):
+    """Helper to reset user traffic and log the action, ``pending_usage`` is traffic not yet written."""
     await db_user.awaitable_attrs.node_usages
     await db_user.awaitable_attrs.next_plan
     usage_log = UserUsageResetLogs(
         user_id=db_user.id,
-        used_traffic_at_reset=db_user.used_traffic,
+        used_traffic_at_reset=db_user.used_traffic + pending_usage,
     )
     db.add(usage_log)
 
@@ -612,18 +687,19 @@ async def _reset_user_traffic_and_log(db: AsyncSession, db_user: User):
         db_user.next_plan = None
 
 
-async def reset_user_data_usage(db: AsyncSession, db_user: User) -> User:
+async def reset_user_data_usage(db: AsyncSession, db_user: User, pending_usage: int = 0) -> User:
     """
     Resets the data usage of a user and logs the reset.
 
     Args:
         db (AsyncSession): Database session.
         dbuser (User): The user object whose data usage is to be reset.
+        pending_usage (int, optional): Traffic of the user not yet written to the database.
 
     Returns:
         User: The updated user object.
     """
-    await _reset_user_traffic_and_log(db, db_user)
+    await _reset_user_traffic_and_log(db, db_user, pending_usage)
 
     if db_user.status not in [UserStatus.expired, UserStatus.disabled]:
         db_user.status = UserStatus.active.value
@@ -634,40 +710,44 @@ async def reset_user_data_usage(db: AsyncSession, db_user: User) -> User:
     return db_user
 
 
-async def bulk_reset_user_data_usage(db: AsyncSession, users: list[User]) -> list[User]:
+async def bulk_reset_user_data_usage(
+    db: AsyncSession, users: list[User], pending_usage: dict[int, int] | None = None
+) -> list[User]:
     """
     Resets the data usage for a list of users and logs the reset.
 
     Args:
         db (AsyncSession): Database session.
         users (list[User]): The list of user objects whose data usage is to be reset.
+        pending_usage (dict[int, int], optional): Traffic not yet written to the database, keyed by user id.
 
     Returns:
         list[User]: The updated list of user objects.
     """
+    pending_usage = pending_usage or {}
+    user_ids = [user.id for user in users]
     for db_user in users:
-        await _reset_user_traffic_and_log(db, db_user)
+        await _reset_user_traffic_and_log(db, db_user, pending_usage.get(db_user.id, 0))
         if db_user.status not in [UserStatus.expired, UserStatus.disabled]:
             db_user.status = UserStatus.active.value
     await db.commit()
-    for user in users:
-        await db.refresh(user)
-        await load_user_attrs(user)
+    await load_users_attrs(db, user_ids)
     return users
 
 
-async def reset_user_by_next(db: AsyncSession, db_user: User) -> User:
+async def reset_user_by_next(db: AsyncSession, db_user: User, pending_usage: int = 0) -> User:
     """
     Resets the data usage of a user based on next user.
 
     Args:
         db (AsyncSession): Database session.
         dbuser (User): The user object whose data usage is to be reset.
+        pending_usage (int, optional): Traffic of the user not yet written to the database.
 
     Returns:
         User: The updated user object.
     """
-    remaining_traffic = (db_user.data_limit or 0) - db_user.used_traffic
+    remaining_traffic = (db_user.data_limit or 0) - db_user.used_traffic - pending_usage
     if db_user.next_plan.user_template_id is None:
         db_user.data_limit = db_user.next_plan.data_limit + (
             0 if not db_user.next_plan.add_remaining_traffic else remaining_traffic
@@ -709,7 +789,7 @@ async def reset_user_by_next(db: AsyncSession, db_user: User) -> User:
             db_user.proxy_settings = proxy_settings
         db_user.data_limit_reset_strategy = db_user.next_plan.user_template.data_limit_reset_strategy
 
-    await _reset_user_traffic_and_log(db, db_user)
+    await _reset_user_traffic_and_log(db, db_user, pending_usage)
     db_user.status = UserStatus.active
 
     await db.commit()
@@ -741,19 +821,71 @@ async def revoke_user_sub(db: AsyncSession, db_user: User) -> User:
     return db_user
 
 
-async def user_sub_update(db: AsyncSession, user_id: User, user_agent: str) -> User:
+async def add_user_sub_updates(db: AsyncSession, updates: list[dict]) -> None:
     """
-    Updates the user's subscription details.
+    Inserts subscription updates in one executemany, without committing.
 
     Args:
         db (AsyncSession): Database session.
-        user_id (User): The user id whose subscription is to be updated.
-        user_agent (str): The user agent string.
+        updates (list[dict]): Rows with user_id, user_agent and created_at.
+    """
+    await db.execute(insert(UserSubscriptionUpdate), updates)
 
+
+async def get_existing_user_ids(db: AsyncSession, user_ids: list[int]) -> set[int]:
+    return set((await db.execute(select(User.id).where(User.id.in_(user_ids)))).scalars())
+
+
+async def trim_user_sub_updates(db: AsyncSession, user_ids: list[int], limit: int) -> int:
     """
-    agent = UserSubscriptionUpdate(user_id=user_id, user_agent=user_agent)
-    db.add(agent)
-    await db.commit()
+    Deletes all but the newest `limit` subscription updates of the given users, without committing.
+
+    Returns:
+        int: Number of deleted rows.
+    """
+    users_with_excess = await db.execute(
+        select(UserSubscriptionUpdate.user_id)
+        .where(UserSubscriptionUpdate.user_id.in_(user_ids))
+        .group_by(UserSubscriptionUpdate.user_id)
+        .having(func.count(UserSubscriptionUpdate.id) > limit)
+    )
+    user_ids = [row.user_id for row in users_with_excess]
+    if not user_ids:
+        return 0
+
+    if DATABASE_DIALECT == "mysql":
+        # MySQL/MariaDB don't support LIMIT in an IN subquery
+        total_deleted = 0
+        for user_id in user_ids:
+            keep_ids = (
+                await db.execute(
+                    select(UserSubscriptionUpdate.id)
+                    .where(UserSubscriptionUpdate.user_id == user_id)
+                    .order_by(UserSubscriptionUpdate.created_at.desc())
+                    .limit(limit)
+                )
+            ).scalars()
+            result = await db.execute(
+                delete(UserSubscriptionUpdate).where(
+                    UserSubscriptionUpdate.user_id == user_id, UserSubscriptionUpdate.id.not_in(list(keep_ids))
+                )
+            )
+            total_deleted += result.rowcount
+        return total_deleted
+
+    sub = UserSubscriptionUpdate.__table__.alias("sub")
+    keep_subquery = (
+        select(sub.c.id)
+        .where(sub.c.user_id == UserSubscriptionUpdate.user_id)
+        .order_by(sub.c.created_at.desc())
+        .limit(limit)
+    )
+    result = await db.execute(
+        delete(UserSubscriptionUpdate).where(
+            UserSubscriptionUpdate.user_id.in_(user_ids), UserSubscriptionUpdate.id.not_in(keep_subquery)
+        )
+    )
+    return result.rowcount
 
 
 async def get_user_sub_update_list(
@@ -908,9 +1040,7 @@ async def update_users_status(db: AsyncSession, users: list[User], status: UserS
     )
     await db.execute(stmt)
     await db.commit()
-    for user in users:
-        await db.refresh(user)
-        await load_user_attrs(user)
+    await load_users_attrs(db, user_ids)
     return users
 
 
@@ -946,6 +1076,7 @@ async def start_users_expire(db: AsyncSession, users: list[User]) -> list[User]:
         list[User]: The updated users list.
     """
     now = datetime.now(timezone.utc)
+    user_ids = [user.id for user in users]
     for user in users:
         expire_time = now + timedelta(seconds=user.on_hold_expire_duration)
         stmt = (
@@ -956,9 +1087,7 @@ async def start_users_expire(db: AsyncSession, users: list[User]) -> list[User]:
         await db.execute(stmt)
 
     await db.commit()
-    for user in users:
-        await db.refresh(user)
-        await load_user_attrs(user)
+    await load_users_attrs(db, user_ids)
     return users
 
 
@@ -0,0 +1,18 @@
+import asyncio
+
+from app import on_startup, scheduler
+from app.subscription.cache import subscription_cache
+from app.utils.public_ip import public_ip
+
+
+async def discover_public_ip():
+    """Refresh the public addresses once the app is up, rendered subscriptions hold the old ones."""
+    if await public_ip.discover():
+        subscription_cache.clear()
+
+
+@on_startup
+async def load_public_ip():
+    await asyncio.to_thread(public_ip.load)
+    # runs once in the background, startup doesn't wait for the lookups
+    scheduler.add_job(discover_public_ip, "date", coalesce=True, max_instances=1)
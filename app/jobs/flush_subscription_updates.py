@@ -0,0 +1,22 @@
+from app import on_shutdown, scheduler
+from app.subscription.updates import subscription_updates
+from config import JOB_FLUSH_SUBSCRIPTION_UPDATES_INTERVAL
+
+
+async def flush_subscription_updates():
+    """Write the queued subscription fetches, and trim the flushed users to their clients limit."""
+    await subscription_updates.flush()
+
+
+scheduler.add_job(
+    flush_subscription_updates,
+    "interval",
+    seconds=JOB_FLUSH_SUBSCRIPTION_UPDATES_INTERVAL,
+    coalesce=True,
+    max_instances=1,
+)
+
+
+@on_shutdown
+async def shutdown_subscription_updates():
+    await subscription_updates.flush()
@@ -1,6 +1,7 @@
 from app import scheduler
 from app.db import GetDB
 from app.db.crud.host import get_inbounds_not_in_tags, remove_inbounds
+from app.core.groups import group_inbounds
 from app.core.manager import core_manager
 from app.utils.logger import get_logger
 from config import JOB_REMOVE_OLD_INBOUNDS_INTERVAL
@@ -16,6 +17,9 @@ async def remove_old_inbounds():
         old_inbounds = await get_inbounds_not_in_tags(db, in_use_inbounds)
 
         await remove_inbounds(db, old_inbounds)
+        if old_inbounds:
+            # removed tags must stop resolving for the users of the groups they belonged to
+            await group_inbounds.refresh(db)
 
         for inbound in old_inbounds:
             logger.info(f"inbound {inbound.tag} removed.")
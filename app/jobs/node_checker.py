@@ -4,11 +4,11 @@ from PasarGuardNodeBridge import NodeAPIError, PasarGuardNode
 
 from app import on_shutdown, on_startup, scheduler
 from app.db import GetDB
-from app.db.models import Node, NodeStatus
-from app.db.crud.node import get_nodes
+from app.db.models import NodeStatus
+from app.db.crud.node import get_nodes, get_nodes_latest_users
 from app.node import node_manager
 from app.utils.logger import get_logger
-from app.operation.node import NodeOperation
+from app.operation.node import NodeOperation, node_reconnects
 from app.operation import OperatorType
 
 from config import JOB_CORE_HEALTH_CHECK_INTERVAL
@@ -30,15 +30,18 @@ async def node_health_check():
             if e.code > -3:
                 await node_operator.update_node_status(id, NodeStatus.error, err=e.detail)
             if e.code > 0:
-                await node_operator.connect_node(node_id=id)
+                node_operator.schedule_connect(id)
 
-    broken_nodes, not_connected_nodes = await node_manager.get_nodes_by_health_status()
+    # the periodic poll that keeps the health snapshot of every reader fresh
+    snapshot = await node_manager.poll_health()
+    broken_nodes, not_connected_nodes = snapshot.broken, snapshot.not_connected
 
-    check_tasks = [check_node(id, node) for id, node in broken_nodes]
-    connect_tasks = [node_operator.connect_node(id) for id, _ in not_connected_nodes]
+    # nodes that keep failing wait for their backoff in the reconnection scheduler
+    for id, _ in not_connected_nodes:
+        node_operator.schedule_connect(id)
 
     # Use return_exceptions=True to prevent one failed node from stopping others
-    await asyncio.gather(*check_tasks + connect_tasks, return_exceptions=True)
+    await asyncio.gather(*[check_node(id, node) for id, node in broken_nodes], return_exceptions=True)
 
 
 @on_startup
@@ -47,21 +50,20 @@ async def initialize_nodes():
 
     async with GetDB() as db:
         db_nodes = await get_nodes(db=db, enabled=True)
+        # nothing was collected yet, the busiest nodes of the latest recorded hour connect first
+        latest_users = await get_nodes_latest_users(db, [db_node.id for db_node in db_nodes])
 
-        async def start_node(node: Node):
+        for db_node in db_nodes:
             try:
-                await node_manager.update_node(node)
+                await node_manager.update_node(db_node)
             except NodeAPIError as e:
-                await node_operator.update_node_status(node.id, NodeStatus.error, err=e.detail)
-                return
+                await node_operator.update_node_status(db_node.id, NodeStatus.error, err=e.detail)
+                continue
 
-            await node_operator.connect_node(node_id=node.id)
+            node_operator.schedule_connect(db_node.id, users=latest_users.get(db_node.id, 0))
 
-        start_tasks = [start_node(node=db_node) for db_node in db_nodes]
-
-        await asyncio.gather(*start_tasks)
-
-    logger.info("All nodes' cores have been started.")
+    # the scheduler connects them a few at a time in the background, see GET /api/nodes/reconnects
+    logger.info(f"{len(db_nodes)} nodes' cores have been scheduled to start.")
 
     scheduler.add_job(
         node_health_check, "interval", seconds=JOB_CORE_HEALTH_CHECK_INTERVAL, coalesce=True, max_instances=1
@@ -72,6 +74,9 @@ async def initialize_nodes():
 async def shutdown_nodes():
     logger.info("Stopping nodes' cores...")
 
+    await node_reconnects.close()
+    await node_manager.flush_user_changes()
+
     nodes: dict[int, PasarGuardNode] = await node_manager.get_nodes()
 
     stop_tasks = [node.stop() for node in nodes.values()]
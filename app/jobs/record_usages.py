@@ -1,27 +1,41 @@
 import asyncio
+import time
 from collections import defaultdict
 from datetime import datetime as dt, timezone as tz
 from operator import attrgetter
 
 from PasarGuardNodeBridge import PasarGuardNode, NodeAPIError
 from PasarGuardNodeBridge.common.service_pb2 import StatType
-from sqlalchemy import and_, bindparam, insert, select, update
-from sqlalchemy.exc import DatabaseError, OperationalError
+from sqlalchemy import bindparam, update
+from sqlalchemy.dialects.mysql import Insert as MySQLInsert, insert as mysql_insert
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.exc import DatabaseError, IntegrityError, OperationalError
 from sqlalchemy.sql.expression import Insert
 
-from app import scheduler
+from app import on_shutdown, scheduler
 from app.db import AsyncSession, GetDB
+from app.db.crud.user import get_existing_user_ids
 from app.db.models import Admin, NodeUsage, NodeUserUsage, System, User
+from app.models.stats import NodeUsageCollectionStats
 from app.node import node_manager as node_manager
+from app.usage import UsageColumns, node_collection_stats, usage_accumulator, user_admin_index, user_review
 from app.utils.logger import get_logger
 from config import (
     DISABLE_RECORDING_NODE_USAGE,
+    JOB_FLUSH_USER_USAGES_INTERVAL,
     JOB_RECORD_NODE_USAGES_INTERVAL,
     JOB_RECORD_USER_USAGES_INTERVAL,
 )
 
 logger = get_logger("record-usages")
 
+USERS_STATS_CHUNK_SIZE = 10_000
+NODE_USERS_STATS_TIMEOUT = 30
+
+# in flight user stats collections, keyed by node id
+_collections: dict[int, asyncio.Task] = {}
+
 
 async def safe_execute(db: AsyncSession, stmt, params=None, max_retries: int = 3):
     """
@@ -35,8 +49,8 @@ async def safe_execute(db: AsyncSession, stmt, params=None, max_retries: int = 3
     """
     dialect = db.bind.dialect.name
 
-    # MySQL-specific IGNORE prefix
-    if dialect == "mysql" and isinstance(stmt, Insert):
+    # MySQL-specific IGNORE prefix, upserts already handle duplicate keys
+    if dialect == "mysql" and isinstance(stmt, Insert) and not isinstance(stmt, MySQLInsert):
         stmt = stmt.prefix_with("IGNORE")
 
     for attempt in range(max_retries):
@@ -67,102 +81,162 @@ async def safe_execute(db: AsyncSession, stmt, params=None, max_retries: int = 3
             raise
 
 
-async def record_user_stats(params: list[dict], node_id: int, usage_coefficient: int = 1):
+def build_upsert(
+    dialect: str, model, values: dict, conflict_columns: tuple[str, ...], increment_columns: tuple[str, ...]
+) -> Insert:
     """
-    Record user statistics for a specific node.
+    Build a single-statement upsert that adds the inserted values to the existing row on conflict.
 
     Args:
-        params (list[dict]): User statistic parameters
+        dialect (str): Database dialect name
+        model: ORM model to insert into
+        values (dict): Column values, may contain bind parameters for executemany
+        conflict_columns (tuple[str, ...]): Columns of the unique constraint to resolve conflicts on
+        increment_columns (tuple[str, ...]): Columns that get incremented by the inserted value on conflict
+
+    Returns:
+        Insert: `INSERT ... ON CONFLICT DO UPDATE` or `INSERT ... ON DUPLICATE KEY UPDATE` statement
+    """
+    table = model.__table__
+
+    if dialect == "mysql":
+        stmt = mysql_insert(table).values(**values)
+        return stmt.on_duplicate_key_update({col: table.c[col] + stmt.inserted[col] for col in increment_columns})
+
+    if dialect == "postgresql":
+        stmt = pg_insert(table).values(**values)
+    elif dialect == "sqlite":
+        stmt = sqlite_insert(table).values(**values)
+    else:
+        raise ValueError(f"Unsupported dialect: {dialect}")
+
+    return stmt.on_conflict_do_update(
+        index_elements=list(conflict_columns),
+        set_={col: table.c[col] + stmt.excluded[col] for col in increment_columns},
+    )
+
+
+async def upsert_node_user_usages(db: AsyncSession, params: list[dict], node_id: int, created_at: dt):
+    """
+    Add user traffic to the hourly node user usage rows, creating missing rows in the same statement.
+
+    Args:
+        db (AsyncSession): Async database session
+        params (list[dict]): User statistic parameters with coefficient already applied
         node_id (int): Node identifier
-        usage_coefficient (int, optional): usage multiplier
+        created_at (datetime): Hour bucket of the records
     """
-    if not params:
+    stmt = build_upsert(
+        db.bind.dialect.name,
+        NodeUserUsage,
+        values={
+            "user_id": bindparam("uid"),
+            "created_at": created_at,
+            "node_id": node_id,
+            "used_traffic": bindparam("value"),
+        },
+        conflict_columns=("created_at", "user_id", "node_id"),
+        increment_columns=("used_traffic",),
+    )
+    await safe_execute(db, stmt, params)
+
+
+async def upsert_existing_node_user_usages(db: AsyncSession, params: list[dict], node_id: int, created_at: dt):
+    """
+    Upsert node user usages, users removed while their usage was pending are dropped and the rest retried.
+    Nothing is written if the node itself was removed.
+    """
+    try:
+        await upsert_node_user_usages(db, params, node_id, created_at)
+        return
+    except IntegrityError as e:
+        error = e
+
+    existing = await get_existing_user_ids(db, [param["uid"] for param in params])
+    kept = [param for param in params if param["uid"] in existing]
+    if len(kept) == len(params):
+        # the node was removed while its usage was pending
+        logger.warning("Dropped node %s user usages, error: %s", node_id, error.orig)
         return
 
-    created_at = dt.now(tz.utc).replace(minute=0, second=0, microsecond=0)
+    logger.warning(
+        "Dropped node %s usages of %d removed users, error: %s", node_id, len(params) - len(kept), error.orig
+    )
+    if kept:
+        try:
+            await upsert_node_user_usages(db, kept, node_id, created_at)
+        except IntegrityError as e:
+            logger.warning("Dropped node %s user usages, error: %s", node_id, e.orig)
 
-    async with GetDB() as db:
-        # Find existing user entries for this node and time
-        select_stmt = select(NodeUserUsage.user_id).where(
-            and_(NodeUserUsage.node_id == node_id, NodeUserUsage.created_at == created_at)
-        )
-        existing_users = set((await db.execute(select_stmt)).scalars().all())
-
-        # Prepare new user entries
-        new_users = [{"uid": int(p["uid"])} for p in params if int(p["uid"]) not in existing_users]
-
-        # Insert missing user entries
-        if new_users:
-            insert_stmt = insert(NodeUserUsage).values(
-                user_id=bindparam("uid"), created_at=created_at, node_id=node_id, used_traffic=0
-            )
-            await safe_execute(db, insert_stmt, new_users)
-
-        # Update user traffic - ensure uid is converted to int
-        update_params = [{"uid": int(p["uid"]), "value": p["value"]} for p in params]
-        update_stmt = (
-            update(NodeUserUsage)
-            .values(used_traffic=NodeUserUsage.used_traffic + bindparam("value") * usage_coefficient)
-            .where(
-                and_(
-                    NodeUserUsage.user_id == bindparam("uid"),
-                    NodeUserUsage.node_id == node_id,
-                    NodeUserUsage.created_at == created_at,
-                )
-            )
-        )
-        await safe_execute(db, update_stmt, update_params)
+
+async def upsert_node_usage(db: AsyncSession, uplink: int, downlink: int, node_id: int, created_at: dt):
+    """
+    Add traffic to the hourly node usage row, creating it in the same statement if missing.
+
+    Args:
+        db (AsyncSession): Async database session
+        uplink (int): Uplink traffic to add
+        downlink (int): Downlink traffic to add
+        node_id (int): Node identifier
+        created_at (datetime): Hour bucket of the record
+    """
+    stmt = build_upsert(
+        db.bind.dialect.name,
+        NodeUsage,
+        values={"created_at": created_at, "node_id": node_id, "uplink": uplink, "downlink": downlink},
+        conflict_columns=("created_at", "node_id"),
+        increment_columns=("uplink", "downlink"),
+    )
+    await safe_execute(db, stmt)
 
 
-async def record_node_stats(params: dict, node_id: int):
+async def record_node_stats(params: list[dict], node_id: int):
     """
     Record node-level statistics.
 
     Args:
-        params (Dict): Node statistic parameters
+        params (list[dict]): Node statistic parameters
         node_id (int): Node identifier
     """
     if not params:
         return
 
     created_at = dt.now(tz.utc).replace(minute=0, second=0, microsecond=0)
+    uplink = sum(param["up"] for param in params)
+    downlink = sum(param["down"] for param in params)
 
     async with GetDB() as db:
-        # Check if node usage entry exists
-        select_stmt = select(NodeUsage.node_id).where(
-            and_(NodeUsage.node_id == node_id, NodeUsage.created_at == created_at)
-        )
-        result = await db.execute(select_stmt)
-        node_exists = result.scalar() is not None  # Correctly check if row exists
-
-        # Insert node usage entry if not exists
-        if not node_exists:
-            insert_stmt = insert(NodeUsage).values(created_at=created_at, node_id=node_id, uplink=0, downlink=0)
-            await safe_execute(db, insert_stmt)
-
-        # Update node usage
-        update_stmt = (
-            update(NodeUsage)
-            .values(uplink=NodeUsage.uplink + bindparam("up"), downlink=NodeUsage.downlink + bindparam("down"))
-            .where(and_(NodeUsage.node_id == node_id, NodeUsage.created_at == created_at))
-        )
-        await safe_execute(db, update_stmt, params)
+        await upsert_node_usage(db, uplink, downlink, node_id, created_at)
 
 
-async def get_users_stats(node: PasarGuardNode):
+async def parse_users_stats(stats) -> UsageColumns:
+    """
+    Sum user stats by uid, chunk by chunk, yielding to the event loop between chunks
+    so large nodes don't block processing of the other nodes' responses.
+    """
+    params = defaultdict(int)
+    for start in range(0, len(stats), USERS_STATS_CHUNK_SIZE):
+        for stat in stats[start : start + USERS_STATS_CHUNK_SIZE]:
+            if not stat.value:
+                continue
+            # stat name is "<uid>.<username>", slicing is cheaper than a full split
+            name = stat.name
+            dot = name.find(".")
+            params[int(name[:dot] if dot >= 0 else name)] += stat.value
+        await asyncio.sleep(0)
+    return UsageColumns.from_dict(params)
+
+
+async def get_users_stats(node: PasarGuardNode) -> UsageColumns:
     try:
-        stats_respons = await node.get_stats(stat_type=StatType.UsersStat, reset=True, timeout=30)
-        params = defaultdict(int)
-        for stat in filter(attrgetter("value"), stats_respons.stats):
-            params[stat.name.split(".", 1)[0]] += stat.value
-        params = list({"uid": int(uid), "value": value} for uid, value in params.items())
-        return params
+        stats_respons = await node.get_stats(stat_type=StatType.UsersStat, reset=True, timeout=NODE_USERS_STATS_TIMEOUT)
+        return await parse_users_stats(stats_respons.stats)
     except NodeAPIError as e:
         logger.error("Failed to get outbounds stats, error: %s", e.detail)
-        return []
+        return UsageColumns()
     except Exception as e:
         logger.error("Failed to get outbounds stats, unknown error: %s", e)
-        return []
+        return UsageColumns()
 
 
 async def get_outbounds_stats(node: PasarGuardNode):
@@ -181,90 +255,106 @@ async def get_outbounds_stats(node: PasarGuardNode):
         return []
 
 
-async def calculate_admin_usage(users_usage: list) -> dict:
+async def calculate_admin_usage(users_usage: UsageColumns) -> dict:
     if not users_usage:
         return {}
 
-    # Get unique user IDs from users_usage
-    uids = {int(user_usage["uid"]) for user_usage in users_usage}
-
     async with GetDB() as db:
-        # Query only relevant users' admin IDs
-        stmt = select(User.id, User.admin_id).where(User.id.in_(uids))
-        result = await db.execute(stmt)
-        user_admin_pairs = result.fetchall()
-
-    user_admin_map = {uid: admin_id for uid, admin_id in user_admin_pairs}
+        user_admin_map = await user_admin_index.get_many(db, users_usage.uids)
 
     admin_usage = defaultdict(int)
-    for user_usage in users_usage:
-        admin_id = user_admin_map.get(int(user_usage["uid"]))
+    for uid, value in users_usage:
+        admin_id = user_admin_map.get(uid)
         if admin_id:
-            admin_usage[admin_id] += user_usage["value"]
+            admin_usage[admin_id] += value
 
     return admin_usage
 
 
-async def calculate_users_usage(api_params: dict, usage_coefficient: dict) -> list:
-    """Calculate aggregated user usage across all nodes with coefficients applied"""
-    users_usage = defaultdict(int)
-
-    # Process all node data in a single pass
-    for node_id, params in api_params.items():
-        coeff = usage_coefficient.get(node_id, 1)
-        # Use generator to avoid intermediate lists
-        node_usage = ((int(param["uid"]), int(param["value"] * coeff)) for param in params)
-        for uid, value in node_usage:
-            users_usage[uid] += value
-
-    return [{"uid": uid, "value": value} for uid, value in users_usage.items()]
+async def record_node_user_usages(node: PasarGuardNode, node_id: int):
+    """Collect user stats of a single node and hand them to the accumulator as soon as they arrive."""
+    start = time.perf_counter()
+    node_usage = (await get_users_stats(node)).scale(node_manager.get_usage_coefficient(node_id))
+    latency = time.perf_counter() - start
 
+    now = dt.now(tz.utc)
+    node_collection_stats[node_id] = NodeUsageCollectionStats(latency=latency, collected_at=now, users=len(node_usage))
+    if latency > JOB_RECORD_USER_USAGES_INTERVAL:
+        logger.warning("Collecting user stats of node %s took %.2f seconds", node_id, latency)
 
-async def record_user_usages():
-    nodes: tuple[int, PasarGuardNode] = await node_manager.get_healthy_nodes()
+    if not node_usage:
+        return
 
-    node_data = await asyncio.gather(*[asyncio.create_task(node.get_extra()) for _, node in nodes])
-    usage_coefficient = {node_id: data.get("usage_coefficient", 1) for (node_id, _), data in zip(nodes, node_data)}
+    usage_accumulator.add_users(node_usage, online_at=now)
+    # users crossing their data limit or coming online while on hold are reviewed right away
+    user_review.add_usage(node_usage)
+    usage_accumulator.add_admins(await calculate_admin_usage(node_usage))
+    if not DISABLE_RECORDING_NODE_USAGE:
+        usage_accumulator.add_node_users(node_id, node_usage, now.replace(minute=0, second=0, microsecond=0))
 
-    stats_tasks = [asyncio.create_task(get_users_stats(node)) for _, node in nodes]
-    await asyncio.gather(*stats_tasks)
 
-    api_params = {nodes[i][0]: task.result() for i, task in enumerate(stats_tasks)}
+async def record_user_usages():
+    """
+    Start a collection for every healthy node that doesn't have one in flight.
 
-    users_usage = await calculate_users_usage(api_params, usage_coefficient)
-    if not users_usage:
-        return
+    Nodes are collected independently, a slow node only delays its own accounting and
+    is skipped by the following ticks until its current collection finishes.
+    """
+    for node_id, node in await node_manager.get_healthy_nodes():
+        task = _collections.get(node_id)
+        if task is not None and not task.done():
+            continue
+        _collections[node_id] = asyncio.create_task(record_node_user_usages(node, node_id))
 
-    async with GetDB() as db:
-        user_stmt = (
-            update(User)
-            .where(User.id == bindparam("uid"))
-            .values(used_traffic=User.used_traffic + bindparam("value"), online_at=dt.now(tz.utc))
-            .execution_options(synchronize_session=False)
-        )
-        await safe_execute(db, user_stmt, users_usage)
-
-        admin_usage = await calculate_admin_usage(users_usage)
-        if admin_usage:
-            admin_data = [{"admin_id": aid, "value": val} for aid, val in admin_usage.items()]
-            admin_stmt = (
-                update(Admin)
-                .where(Admin.id == bindparam("admin_id"))
-                .values(used_traffic=Admin.used_traffic + bindparam("value"))
-                .execution_options(synchronize_session=False)
-            )
-            await safe_execute(db, admin_stmt, admin_data)
 
-    if DISABLE_RECORDING_NODE_USAGE:
+async def flush_user_usages():
+    """Write the accumulated user, admin and node user usages to the database."""
+    batch = usage_accumulator.take()
+    if batch is None:
         return
 
-    record_tasks = [
-        asyncio.create_task(
-            record_user_stats(params=api_params[node_id], node_id=node_id, usage_coefficient=usage_coefficient[node_id])
-        )
-        for node_id in api_params
-    ]
-    await asyncio.gather(*record_tasks)
+    try:
+        async with GetDB() as db:
+            # resets take the deltas of the users and admins they reset under the same lock
+            async with usage_accumulator.lock:
+                if batch.users:
+                    user_stmt = (
+                        update(User)
+                        .where(User.id == bindparam("uid"))
+                        .values(used_traffic=User.used_traffic + bindparam("value"), online_at=bindparam("online"))
+                        .execution_options(synchronize_session=False)
+                    )
+                    users_data = [
+                        {"uid": uid, "value": value, "online": batch.online_at[uid]}
+                        for uid, value in batch.users.items()
+                    ]
+                    await safe_execute(db, user_stmt, users_data)
+                    batch.users.clear()
+                    batch.online_at.clear()
+
+                if batch.admins:
+                    admin_stmt = (
+                        update(Admin)
+                        .where(Admin.id == bindparam("admin_id"))
+                        .values(used_traffic=Admin.used_traffic + bindparam("value"))
+                        .execution_options(synchronize_session=False)
+                    )
+                    admin_data = [{"admin_id": aid, "value": val} for aid, val in batch.admins.items()]
+                    await safe_execute(db, admin_stmt, admin_data)
+                    batch.admins.clear()
+
+            node_users = defaultdict(list)
+            for (node_id, uid, created_at), value in batch.node_users.items():
+                node_users[(node_id, created_at)].append({"uid": uid, "value": value})
+
+            for (node_id, created_at), params in node_users.items():
+                await upsert_existing_node_user_usages(db, params, node_id, created_at)
+                for param in params:
+                    del batch.node_users[(node_id, param["uid"], created_at)]
+    except Exception as e:
+        logger.error("Failed to flush user usages, will retry on next flush, error: %s", e)
+    finally:
+        usage_accumulator.done(batch)
 
 
 async def record_node_usages():
@@ -300,6 +390,15 @@ async def record_node_usages():
 scheduler.add_job(
     record_user_usages, "interval", seconds=JOB_RECORD_USER_USAGES_INTERVAL, coalesce=True, max_instances=1
 )
+scheduler.add_job(flush_user_usages, "interval", seconds=JOB_FLUSH_USER_USAGES_INTERVAL, coalesce=True, max_instances=1)
 scheduler.add_job(
     record_node_usages, "interval", seconds=JOB_RECORD_NODE_USAGES_INTERVAL, coalesce=True, max_instances=1
 )
+
+
+@on_shutdown
+async def shutdown_user_usages():
+    if collections := [task for task in _collections.values() if not task.done()]:
+        await asyncio.wait(collections, timeout=NODE_USERS_STATS_TIMEOUT)
+
+    await flush_user_usages()
@@ -6,6 +6,9 @@ from app.db.crud.user import autodelete_expired_users
 from app.models.user import UserNotificationResponse
 from app import notification
 from app.jobs.dependencies import SYSTEM_ADMIN
+from app.subscription.cache import subscription_cache
+from app.subscription.updates import subscription_updates
+from app.usage import usage_accumulator, user_admin_index
 from app.utils.logger import get_logger
 from config import USER_AUTODELETE_INCLUDE_LIMITED_ACCOUNTS, JOB_REMOVE_EXPIRED_USERS_INTERVAL
 
@@ -16,6 +19,10 @@ logger = get_logger("jobs")
 async def remove_expired_users():
     async with GetDB() as db:
         deleted_users = await autodelete_expired_users(db, USER_AUTODELETE_INCLUDE_LIMITED_ACCOUNTS)
+        usage_accumulator.discard_users([user.id for user in deleted_users])
+        subscription_updates.discard_users([user.id for user in deleted_users])
+        user_admin_index.remove([user.id for user in deleted_users])
+        subscription_cache.invalidate_users([user.id for user in deleted_users])
 
         for user in deleted_users:
             asyncio.create_task(
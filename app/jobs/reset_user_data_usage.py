@@ -10,6 +10,7 @@ from app import notification
 from app.core.manager import core_manager
 from app.node import node_manager
 from app.jobs.dependencies import SYSTEM_ADMIN
+from app.usage import usage_accumulator, user_review
 from app.utils.logger import get_logger
 from config import JOB_RESET_USER_DATA_USAGE_INTERVAL
 
@@ -21,10 +22,13 @@ async def reset_data_usage():
         users = await get_users_to_reset_data_usage(db)
         old_statuses = {user.id: user.status for user in users}
 
-        updated_users = await bulk_reset_user_data_usage(db, users)
+        async with usage_accumulator.lock:
+            pending = usage_accumulator.take_users(list(old_statuses))
+            updated_users = await bulk_reset_user_data_usage(db, users, pending)
 
         for db_user in updated_users:
             user = UserNotificationResponse.model_validate(db_user)
+            user_review.update(user)
             asyncio.create_task(notification.reset_user_data_usage(user, SYSTEM_ADMIN))
 
             if old_statuses.get(user.id) != user.status:
@@ -3,7 +3,8 @@ from datetime import datetime as dt, timedelta as td, timezone as tz
 
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app import notification, scheduler
+from app import notification, on_shutdown, on_startup, scheduler
+from app.core.groups import group_inbounds
 from app.db import GetDB
 from app.db.models import User, UserStatus, ReminderType
 from app.db.crud.user import (
@@ -22,16 +23,20 @@ from app.models.settings import Webhook
 from app.models.user import UserNotificationResponse
 from app.node import node_manager as node_manager
 from app.settings import webhook_settings
+from app.usage import usage_accumulator, user_review
 from app.utils.logger import get_logger
-from config import JOB_REVIEW_USERS_INTERVAL
+from config import JOB_RECONCILE_USERS_STATUS_INTERVAL, JOB_REVIEW_USERS_INTERVAL
 
 logger = get_logger("review-users")
 
 
 async def reset_user_by_next_report(db: AsyncSession, db_user: User):
-    db_user = await reset_user_by_next(db, db_user)
-    inbounds = await db_user.inbounds()
+    async with usage_accumulator.lock:
+        pending = usage_accumulator.take_users([db_user.id])
+        db_user = await reset_user_by_next(db, db_user, pending.get(db_user.id, 0))
+    inbounds = await group_inbounds.user_inbounds(db_user)
     user = UserNotificationResponse.model_validate(db_user)
+    user_review.update(user)
 
     asyncio.create_task(node_manager.update_user(user, inbounds))
     asyncio.create_task(notification.user_data_reset_by_next(user, SYSTEM_ADMIN))
@@ -41,6 +46,7 @@ async def reset_user_by_next_report(db: AsyncSession, db_user: User):
 
 async def change_status(db: AsyncSession, db_user: User, status: UserStatus):
     user = UserNotificationResponse.model_validate(db_user)
+    user_review.update(user)
     if user.status is not UserStatus.active:
         asyncio.create_task(node_manager.remove_user(user))
     asyncio.create_task(notification.user_status_change(user, SYSTEM_ADMIN))
@@ -51,30 +57,79 @@ async def change_status(db: AsyncSession, db_user: User, status: UserStatus):
         await reset_user_by_next_report(db, db_user)
 
 
-async def expire_users_job():
+async def expire_users_job(user_ids: list[int] | None = None):
     async with GetDB() as db:
-        if expired_users := await get_active_to_expire_users(db):
+        if expired_users := await get_active_to_expire_users(db, user_ids):
             updated_users = await update_users_status(db, expired_users, UserStatus.expired)
             for user in updated_users:
                 await change_status(db, user, UserStatus.expired)
 
 
-async def limit_users_job():
+async def limit_users_job(user_ids: list[int] | None = None):
     async with GetDB() as db:
-        if limited_users := await get_active_to_limited_users(db):
+        if limited_users := await get_active_to_limited_users(db, usage_accumulator.pending_users_usage(), user_ids):
             updated_users = await update_users_status(db, limited_users, UserStatus.limited)
             for user in updated_users:
                 await change_status(db, user, UserStatus.limited)
 
 
-async def on_hold_to_active_users_job():
+async def on_hold_to_active_users_job(user_ids: list[int] | None = None):
     async with GetDB() as db:
-        if on_hold_users := await get_on_hold_to_active_users(db):
+        if on_hold_users := await get_on_hold_to_active_users(db, user_ids):
             updated_users = await start_users_expire(db, on_hold_users)
             for user in updated_users:
                 await change_status(db, user, UserStatus.active)
 
 
+async def review_due_users():
+    if user_review.stale:
+        async with GetDB() as db:
+            await user_review.resync(db)
+        logger.debug("User review resynced, stats: %s", user_review.stats())
+
+    expired, limited, on_hold = user_review.take_due()
+    if expired:
+        await expire_users_job(expired)
+    if limited:
+        await limit_users_job(limited)
+    if on_hold:
+        await on_hold_to_active_users_job(on_hold)
+
+
+async def review_users_loop():
+    """Reviews users as soon as they are due, the interval jobs only reconcile what this missed."""
+    while True:
+        try:
+            await review_due_users()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Failed to review due users: {e}")
+            # rebuild from the database, the users taken from the review may not have been handled
+            user_review.invalidate()
+            await asyncio.sleep(JOB_REVIEW_USERS_INTERVAL)
+        await user_review.wait()
+
+
+review_task: asyncio.Task | None = None
+
+
+@on_startup
+async def start_review_users():
+    global review_task
+    review_task = asyncio.create_task(review_users_loop())
+
+
+@on_shutdown
+async def stop_review_users():
+    if review_task is not None:
+        review_task.cancel()
+
+
+async def reconcile_user_review():
+    user_review.invalidate()
+
+
 async def usage_percent_notification_job():
     settings: Webhook = await webhook_settings()
     if not settings.enable:
@@ -163,27 +218,42 @@ async def days_left_notification_job():
 
 
 now = dt.now(tz.utc)
-interval = int(JOB_REVIEW_USERS_INTERVAL / 5)
+interval = int(JOB_REVIEW_USERS_INTERVAL / 2)
+reconcile_interval = int(JOB_RECONCILE_USERS_STATUS_INTERVAL / 4)
 
 # Register each job separately
+# full scans reconciling the user review, due users are handled by review_users_loop
 scheduler.add_job(
-    expire_users_job, "interval", seconds=JOB_REVIEW_USERS_INTERVAL, coalesce=True, max_instances=1, start_date=now
+    expire_users_job,
+    "interval",
+    seconds=JOB_RECONCILE_USERS_STATUS_INTERVAL,
+    coalesce=True,
+    max_instances=1,
+    start_date=now,
 )
 scheduler.add_job(
     limit_users_job,
     "interval",
-    seconds=JOB_REVIEW_USERS_INTERVAL,
+    seconds=JOB_RECONCILE_USERS_STATUS_INTERVAL,
     coalesce=True,
     max_instances=1,
-    start_date=now + td(seconds=interval),
+    start_date=now + td(seconds=reconcile_interval),
 )
 scheduler.add_job(
     on_hold_to_active_users_job,
     "interval",
-    seconds=JOB_REVIEW_USERS_INTERVAL,
+    seconds=JOB_RECONCILE_USERS_STATUS_INTERVAL,
     coalesce=True,
     max_instances=1,
-    start_date=now + td(seconds=interval * 2),
+    start_date=now + td(seconds=reconcile_interval * 2),
+)
+scheduler.add_job(
+    reconcile_user_review,
+    "interval",
+    seconds=JOB_RECONCILE_USERS_STATUS_INTERVAL,
+    coalesce=True,
+    max_instances=1,
+    start_date=now + td(seconds=reconcile_interval * 3),
 )
 scheduler.add_job(
     usage_percent_notification_job,
@@ -191,7 +261,7 @@ scheduler.add_job(
     seconds=JOB_REVIEW_USERS_INTERVAL,
     coalesce=True,
     max_instances=1,
-    start_date=now + td(seconds=interval * 3),
+    start_date=now,
 )
 scheduler.add_job(
     days_left_notification_job,
@@ -199,5 +269,5 @@ scheduler.add_job(
     seconds=JOB_REVIEW_USERS_INTERVAL,
     coalesce=True,
     max_instances=1,
-    start_date=now + td(seconds=interval * 4),
+    start_date=now + td(seconds=interval),
 )
@@ -0,0 +1,26 @@
+from app import on_startup, scheduler
+from app.db import GetDB
+from app.usage import user_admin_index
+from app.utils.logger import get_logger
+from config import JOB_RESYNC_USER_ADMIN_INDEX_INTERVAL
+
+
+logger = get_logger("jobs")
+
+
+async def resync_user_admin_index():
+    async with GetDB() as db:
+        await user_admin_index.resync(db)
+
+    logger.debug("User admin index resynced, stats: %s", user_admin_index.stats())
+
+
+on_startup(resync_user_admin_index)
+
+scheduler.add_job(
+    resync_user_admin_index,
+    "interval",
+    seconds=JOB_RESYNC_USER_ADMIN_INDEX_INTERVAL,
+    coalesce=True,
+    max_instances=1,
+)
@@ -1,4 +1,3 @@
-import json
 from uuid import uuid4, UUID
 from enum import Enum
 
@@ -45,5 +44,6 @@ class ProxyTable(BaseModel):
 
     def dict(self, *, no_obj=True, **kwargs):
         if no_obj:
-            return json.loads(self.model_dump_json())
+            # json mode hands out UUIDs and enums as plain strings, ready for every serializer
+            return self.model_dump(mode="json")
         return super().model_dump(**kwargs)
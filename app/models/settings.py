@@ -174,6 +174,18 @@ class ConfigFormat(str, Enum):
 class SubRule(BaseModel):
     pattern: str
     target: ConfigFormat
+    # json formats without indentation, for clients that never show the config
+    compact: bool = Field(default=False)
+
+
+class SubRuleStats(SubRule):
+    hits: int
+
+
+class SubRulesStats(BaseModel):
+    rules: list[SubRuleStats]
+    unmatched: int
+    cached_user_agents: int
 
 
 class SubFormatEnable(BaseModel):
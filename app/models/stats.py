@@ -55,6 +55,47 @@ class NodeRealtimeStats(BaseModel):
     outgoing_bandwidth_speed: int
 
 
+class NodeUsageCollectionStats(BaseModel):
+    latency: float
+    collected_at: dt
+    users: int
+
+
+class NodeUserChangesStats(BaseModel):
+    pending: int
+    max_pending: int
+    lag: float
+    enqueued: int
+    coalesced: int
+    shipped: int
+    batches: int
+    overflows: int
+    failures: int
+    full_syncs: int
+    delta_syncs: int
+    last_sync_users: int
+    synced_users: int
+    last_latency: float
+    last_flush_at: dt | None = None
+
+
+class NodeReconnectState(BaseModel):
+    state: str
+    priority: int
+    failures: int
+    retry_in: float
+
+
+class NodeReconnectStats(BaseModel):
+    concurrency: int
+    queued: int
+    running: int
+    attempts: int
+    connected: int
+    failed: int
+    nodes: dict[int, NodeReconnectState]
+
+
 class NodeStats(BaseModel):
     period_start: dt
     mem_usage_percentage: float
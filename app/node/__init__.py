@@ -4,7 +4,10 @@ from PasarGuardNodeBridge import PasarGuardNode, create_node, Health, NodeType
 from aiorwlock import RWLock
 
 from app.db.models import Node, NodeConnectionType, User
-from app.node.user import serialize_user_for_node, core_users, serialize_users_for_node
+from app.node.changes import NodeChangeQueue
+from app.node.health import NodeHealthTable, NodesHealth
+from app.node.user import UserRoster, serialize_user_for_node, core_users, serialize_users_for_node
+from app.models.stats import NodeUserChangesStats
 from app.models.user import UserResponse
 
 
@@ -13,10 +16,15 @@ type_map = {
     NodeConnectionType.grpc: NodeType.grpc,
 }
 
+user_roster: UserRoster = UserRoster()
+
 
 class NodeManager:
     def __init__(self):
         self._nodes: dict[int, PasarGuardNode] = {}
+        self._usage_coefficients: dict[int, float] = {}
+        self._changes: dict[int, NodeChangeQueue] = {}
+        self._health = NodeHealthTable(self._nodes)
         self._lock = RWLock(fast=True)
 
     async def update_node(self, node: Node) -> PasarGuardNode:
@@ -30,6 +38,9 @@ class NodeManager:
                     pass
                 finally:
                     del self._nodes[node.id]
+            # the new connection starts with the whole user roster
+            if old_changes := self._changes.pop(node.id, None):
+                await old_changes.close(flush=False)
 
             new_node = create_node(
                 connection=type_map[node.connection_type],
@@ -42,6 +53,9 @@ class NodeManager:
             )
 
             self._nodes[node.id] = new_node
+            self._usage_coefficients[node.id] = node.usage_coefficient
+            self._changes[node.id] = NodeChangeQueue(node.id, new_node, user_roster)
+            self._health.set(node.id, Health.NOT_CONNECTED)
 
             return new_node
 
@@ -56,84 +70,90 @@ class NodeManager:
                     pass
                 finally:
                     del self._nodes[id]
+                    self._usage_coefficients.pop(id, None)
+            if changes := self._changes.pop(id, None):
+                await changes.close(flush=False)
+            self._health.discard(id)
 
     async def get_node(self, id: int) -> PasarGuardNode | None:
         async with self._lock.reader_lock:
             return self._nodes.get(id, None)
 
+    def get_usage_coefficient(self, id: int) -> float:
+        return self._usage_coefficients.get(id, 1)
+
     async def get_nodes(self) -> dict[int, PasarGuardNode]:
         async with self._lock.reader_lock:
             return self._nodes
 
+    async def get_health_snapshot(self) -> NodesHealth:
+        """Health buckets of all nodes from one consistent snapshot, polled again once it is too old."""
+        return await self._health.snapshot()
+
+    async def poll_health(self) -> NodesHealth:
+        """Polls the health of every node concurrently."""
+        return await self._health.poll()
+
+    async def refresh_node_health(self, id: int) -> None:
+        await self._health.refresh(id)
+
     async def get_healthy_nodes(self) -> list[tuple[int, PasarGuardNode]]:
-        async with self._lock.reader_lock:
-            nodes: list[tuple[int, PasarGuardNode]] = [
-                (id, node) for id, node in self._nodes.items() if (await node.get_health() == Health.HEALTHY)
-            ]
-            return nodes
+        return list((await self.get_health_snapshot()).healthy)
 
     async def get_broken_nodes(self) -> list[tuple[int, PasarGuardNode]]:
-        async with self._lock.reader_lock:
-            nodes: list[tuple[int, PasarGuardNode]] = [
-                (id, node) for id, node in self._nodes.items() if (await node.get_health() == Health.BROKEN)
-            ]
-            return nodes
+        return list((await self.get_health_snapshot()).broken)
 
     async def get_not_connected_nodes(self) -> list[tuple[int, PasarGuardNode]]:
-        async with self._lock.reader_lock:
-            nodes: list[tuple[int, PasarGuardNode]] = [
-                (id, node) for id, node in self._nodes.items() if (await node.get_health() == Health.NOT_CONNECTED)
-            ]
-            return nodes
+        return list((await self.get_health_snapshot()).not_connected)
 
     async def get_nodes_by_health_status(
         self,
     ) -> tuple[list[tuple[int, PasarGuardNode]], list[tuple[int, PasarGuardNode]]]:
-        """Optimized method to get both broken and not_connected nodes in single lock acquisition"""
-        async with self._lock.reader_lock:
-            if not self._nodes:
-                return [], []
-
-            health_tasks = [node.get_health() for node in self._nodes.values()]
-            health_results = await asyncio.gather(*health_tasks, return_exceptions=True)
+        """Broken and not connected nodes from the same snapshot"""
+        snapshot = await self.get_health_snapshot()
+        return list(snapshot.broken), list(snapshot.not_connected)
 
-            broken_nodes = []
-            not_connected_nodes = []
-
-            for (node_id, node), health in zip(self._nodes.items(), health_results):
-                if isinstance(health, Exception):
-                    continue
-                if health == Health.BROKEN:
-                    broken_nodes.append((node_id, node))
-                elif health == Health.NOT_CONNECTED:
-                    not_connected_nodes.append((node_id, node))
-                else:
-                    continue
-
-            return broken_nodes, not_connected_nodes
+    def _push_changes(self, proto_users: list[tuple[int, object]]) -> None:
+        """Queues user changes for every node, they are pushed in batches by each node's queue."""
+        for changes in list(self._changes.values()):
+            for user_id, proto_user in proto_users:
+                changes.push(user_id, proto_user)
 
     async def update_user(self, user: UserResponse, inbounds: list[str] = None):
         proto_user = serialize_user_for_node(user.id, user.username, user.proxy_settings.dict(), inbounds)
-
-        async with self._lock.reader_lock:
-            add_tasks = [node.update_user(proto_user) for node in self._nodes.values()]
-            await asyncio.gather(*add_tasks, return_exceptions=True)
+        user_roster.invalidate()
+        self._push_changes([(user.id, proto_user)])
 
     async def update_users(self, users: list[User]):
         proto_users = await serialize_users_for_node(users)
-        async with self._lock.reader_lock:
-            add_tasks = [node.update_users(proto_users) for node in self._nodes.values()]
-            await asyncio.gather(*add_tasks, return_exceptions=True)
+        user_roster.invalidate()
+        self._push_changes([(user.id, proto_user) for user, proto_user in zip(users, proto_users)])
 
     async def remove_user(self, user: UserResponse):
         proto_user = serialize_user_for_node(user.id, user.username, user.proxy_settings.dict())
+        user_roster.invalidate()
+        self._push_changes([(user.id, proto_user)])
 
-        async with self._lock.reader_lock:
-            remove_tasks = [node.update_user(proto_user) for node in self._nodes.values()]
-            await asyncio.gather(*remove_tasks, return_exceptions=True)
+    async def flush_user_changes(self) -> None:
+        """Pushes the pending user changes of every node now."""
+        await asyncio.gather(*[changes.flush() for changes in list(self._changes.values())], return_exceptions=True)
+
+    async def sync_node_users(self, id: int, full: bool = False) -> None:
+        """Resyncs a node with the user roster, only the users it is missing unless ``full``."""
+        if changes := self._changes.get(id):
+            await changes.sync(full=full, flush_queue=full)
+
+    def record_node_sync(self, id: int, node: PasarGuardNode, users: list, version: int) -> None:
+        """Records that ``node`` got ``users`` as its whole roster, ignored if the node was replaced since."""
+        changes = self._changes.get(id)
+        if changes is not None and changes.node is node:
+            changes.record_sync(users, version)
+
+    def get_user_changes_stats(self) -> dict[int, NodeUserChangesStats]:
+        return {node_id: changes.stats() for node_id, changes in self._changes.items()}
 
 
 node_manager: NodeManager = NodeManager()
 
 
-__all__ = ["core_users", "node_manager"]
+__all__ = ["core_users", "node_manager", "user_roster"]
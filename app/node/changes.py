@@ -0,0 +1,196 @@
+import asyncio
+import time
+from datetime import datetime as dt, timezone as tz
+
+from PasarGuardNodeBridge import PasarGuardNode
+
+from app.models.stats import NodeUserChangesStats
+from app.node.sync import NodeSyncLedger
+from app.utils.logger import get_logger
+from config import NODE_USER_CHANGES_DELAY, NODE_USER_CHANGES_QUEUE_SIZE
+
+logger = get_logger("node-changes")
+
+
+class NodeChangeQueue:
+    """
+    User changes waiting to be pushed to one node.
+
+    Changes are keyed by user id, so the latest change of a user replaces any pending one. A worker waits
+    ``delay`` seconds after the first change to collect the ones that follow, then ships the whole batch
+    through ``update_users``. The queue holds at most ``maxsize`` users, past that the pending changes are
+    dropped and the node is resynced with the user roster instead.
+
+    What the node was sent is kept in a ``NodeSyncLedger``, so a resync only pushes the users that differ
+    from the roster and falls back to the whole roster when the ledger is unknown.
+    """
+
+    def __init__(
+        self,
+        node_id: int,
+        node: PasarGuardNode,
+        roster,
+        delay: float = NODE_USER_CHANGES_DELAY,
+        maxsize: int = NODE_USER_CHANGES_QUEUE_SIZE,
+    ):
+        self.node_id = node_id
+        self.node = node
+        self.roster = roster
+        self.delay = delay
+        self.maxsize = maxsize
+        self._pending: dict[int, object] = {}
+        self._since: float | None = None
+        self._resync = False
+        self._wakeup = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        self._task: asyncio.Task | None = None
+        self.ledger = NodeSyncLedger()
+        self.enqueued = 0
+        self.coalesced = 0
+        self.shipped = 0
+        self.batches = 0
+        self.overflows = 0
+        self.failures = 0
+        self.full_syncs = 0
+        self.delta_syncs = 0
+        self.last_sync_users = 0
+        self.max_pending = 0
+        self.last_latency = 0.0
+        self.last_flush_at: dt | None = None
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    def push(self, user_id: int, proto_user) -> None:
+        self.enqueued += 1
+        if self._since is None:
+            self._since = time.monotonic()
+
+        if user_id in self._pending:
+            self.coalesced += 1
+        elif self._resync:
+            # the next flush resyncs the node with the roster, which has this change too
+            self._wake()
+            return
+        elif len(self._pending) >= self.maxsize:
+            self.overflows += 1
+            self._pending.clear()
+            self._resync = True
+            logger.warning(f"User changes queue of node {self.node_id} is full, the node will be resynced")
+            self._wake()
+            return
+        self._pending[user_id] = proto_user
+        self.max_pending = max(self.max_pending, len(self._pending))
+        self._wake()
+
+    def _wake(self) -> None:
+        self._wakeup.set()
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def _run(self) -> None:
+        while True:
+            await self._wakeup.wait()
+            # debounce window, changes landing meanwhile join the batch
+            await asyncio.sleep(self.delay)
+            await self.flush()
+
+    async def flush(self) -> None:
+        async with self._flush_lock:
+            self._wakeup.clear()
+            if not self._pending and not self._resync:
+                return
+
+            pending, self._pending = self._pending, {}
+            resync, self._resync = self._resync, False
+            since, self._since = self._since, None
+            try:
+                if resync:
+                    await self._sync(full=False, flush_queue=True)
+                else:
+                    users = list(pending.values())
+                    await self.node.update_users(users)
+                    self.ledger.apply(users)
+            except Exception as e:
+                # the changes are lost, the next change resyncs the node with the roster
+                self.failures += 1
+                self._resync = True
+                logger.error(f"Failed to push {len(pending)} user changes to node {self.node_id}: {e}")
+                return
+
+            self.batches += 1
+            self.shipped += len(pending)
+            self.last_flush_at = dt.now(tz.utc)
+            if since is not None:
+                self.last_latency = time.monotonic() - since
+
+    async def sync(self, full: bool = False, flush_queue: bool = False) -> None:
+        """
+        Brings the node up to date with the roster now, sending only what differs from the ledger unless
+        ``full``. Pending changes are part of the roster and are dropped. Errors are raised to the caller.
+        """
+        async with self._flush_lock:
+            self._wakeup.clear()
+            self._pending = {}
+            self._resync = False
+            self._since = None
+            try:
+                await self._sync(full=full, flush_queue=flush_queue)
+            except Exception:
+                self._resync = True
+                raise
+            self.last_flush_at = dt.now(tz.utc)
+
+    async def _sync(self, full: bool, flush_queue: bool) -> None:
+        version = self.roster.version
+        users = await self.roster.get()
+        changes = None if full else self.ledger.diff(users, version)
+
+        if changes is None:
+            try:
+                await self.node.sync_users(users, flush_queue=flush_queue, timeout=30)
+            except Exception:
+                self.ledger.reset()
+                raise
+            self.ledger.record(users, version)
+            self.full_syncs += 1
+            self.last_sync_users = len(users)
+            return
+
+        if changes:
+            await self.node.update_users(changes)
+            self.ledger.apply(changes)
+        self.ledger.version = version
+        self.delta_syncs += 1
+        self.last_sync_users = len(changes)
+
+    def record_sync(self, users: list, version: int | None = None) -> None:
+        """The node got ``users`` as its whole roster outside the queue, like on start."""
+        self.ledger.record(users, version)
+
+    async def close(self, flush: bool = True) -> None:
+        """Stops the worker, ``flush`` ships what is pending first (an ongoing flush is awaited)."""
+        if flush:
+            await self.flush()
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    def stats(self) -> NodeUserChangesStats:
+        return NodeUserChangesStats(
+            pending=len(self._pending),
+            max_pending=self.max_pending,
+            lag=time.monotonic() - self._since if self._since is not None else 0.0,
+            enqueued=self.enqueued,
+            coalesced=self.coalesced,
+            shipped=self.shipped,
+            batches=self.batches,
+            overflows=self.overflows,
+            failures=self.failures,
+            full_syncs=self.full_syncs,
+            delta_syncs=self.delta_syncs,
+            last_sync_users=self.last_sync_users,
+            synced_users=len(self.ledger),
+            last_latency=self.last_latency,
+            last_flush_at=self.last_flush_at,
+        )
@@ -0,0 +1,93 @@
+import asyncio
+import time
+from typing import NamedTuple
+
+from PasarGuardNodeBridge import Health, PasarGuardNode
+
+from config import JOB_CORE_HEALTH_CHECK_INTERVAL
+
+
+class NodesHealth(NamedTuple):
+    """Health buckets of every node taken at once, nodes in no bucket are invalid or never polled."""
+
+    healthy: tuple[tuple[int, PasarGuardNode], ...]
+    broken: tuple[tuple[int, PasarGuardNode], ...]
+    not_connected: tuple[tuple[int, PasarGuardNode], ...]
+    polled_at: float | None
+    poll_time: float
+
+
+class NodeHealthTable:
+    """
+    Last known health of every node, read without awaiting the nodes.
+
+    The bridge doesn't push health changes, so the table is filled by a concurrent poll of all nodes, at
+    most one at a time, and by the transitions the node manager drives itself. Readers get an immutable
+    snapshot rebuilt on every change; a snapshot older than ``max_age`` seconds triggers a poll first.
+    """
+
+    def __init__(self, nodes: dict[int, PasarGuardNode], max_age: float = JOB_CORE_HEALTH_CHECK_INTERVAL):
+        self._nodes = nodes
+        self.max_age = max_age
+        self._health: dict[int, Health] = {}
+        self._poll: asyncio.Task | None = None
+        self._snapshot = NodesHealth((), (), (), None, 0.0)
+
+    def set(self, node_id: int, health: Health) -> None:
+        self._health[node_id] = health
+        self._rebuild()
+
+    def discard(self, node_id: int) -> None:
+        self._health.pop(node_id, None)
+        self._rebuild()
+
+    async def refresh(self, node_id: int) -> None:
+        """Polls a single node, after a transition the manager can't see like a (re)connection."""
+        node = self._nodes.get(node_id)
+        if node is None:
+            return
+        try:
+            health = await node.get_health()
+        except Exception:
+            return
+        if self._nodes.get(node_id) is node:
+            self.set(node_id, health)
+
+    async def poll(self) -> NodesHealth:
+        if self._poll is None or self._poll.done():
+            self._poll = asyncio.create_task(self._poll_nodes())
+        # shield the shared poll so one cancelled caller doesn't cancel it for the others
+        return await asyncio.shield(self._poll)
+
+    async def snapshot(self) -> NodesHealth:
+        polled_at = self._snapshot.polled_at
+        if polled_at is None or time.monotonic() - polled_at > self.max_age:
+            return await self.poll()
+        return self._snapshot
+
+    async def _poll_nodes(self) -> NodesHealth:
+        start = time.monotonic()
+        nodes = list(self._nodes.items())
+        results = await asyncio.gather(*[node.get_health() for _, node in nodes], return_exceptions=True)
+        for (node_id, node), health in zip(nodes, results):
+            # nodes replaced or removed during the poll keep their newer entry
+            if isinstance(health, Exception) or self._nodes.get(node_id) is not node:
+                continue
+            self._health[node_id] = health
+        self._rebuild(polled_at=time.monotonic(), poll_time=time.monotonic() - start)
+        return self._snapshot
+
+    def _rebuild(self, polled_at: float | None = None, poll_time: float | None = None) -> None:
+        buckets = {Health.HEALTHY: [], Health.BROKEN: [], Health.NOT_CONNECTED: []}
+        for node_id, node in self._nodes.items():
+            bucket = buckets.get(self._health.get(node_id))
+            if bucket is not None:
+                bucket.append((node_id, node))
+
+        self._snapshot = NodesHealth(
+            healthy=tuple(buckets[Health.HEALTHY]),
+            broken=tuple(buckets[Health.BROKEN]),
+            not_connected=tuple(buckets[Health.NOT_CONNECTED]),
+            polled_at=self._snapshot.polled_at if polled_at is None else polled_at,
+            poll_time=self._snapshot.poll_time if poll_time is None else poll_time,
+        )
@@ -0,0 +1,163 @@
+import asyncio
+import random
+import time
+from typing import Awaitable, Callable
+
+from app.models.stats import NodeReconnectState, NodeReconnectStats
+from app.utils.logger import get_logger
+from config import NODE_RECONNECT_BACKOFF, NODE_RECONNECT_CONCURRENCY, NODE_RECONNECT_MAX_BACKOFF
+
+logger = get_logger("node-reconnect")
+
+
+class NodeReconnectScheduler:
+    """
+    Connects scheduled nodes, at most ``concurrency`` at once and the highest priority first.
+
+    ``connect`` returns whether the node is connected. A node that fails isn't retried on its own, but the
+    next time it is scheduled it waits for a backoff doubling from ``backoff`` up to ``max_backoff``
+    seconds after each failure, with jitter so failed nodes don't come back all at once. Scheduling a node
+    ``immediate`` skips its backoff, a node scheduled while it is connecting is connected again after.
+    """
+
+    def __init__(
+        self,
+        connect: Callable[[int], Awaitable[bool]],
+        concurrency: int = NODE_RECONNECT_CONCURRENCY,
+        backoff: float = NODE_RECONNECT_BACKOFF,
+        max_backoff: float = NODE_RECONNECT_MAX_BACKOFF,
+    ):
+        self._connect = connect
+        self.concurrency = max(concurrency, 1)
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self._queued: dict[int, int] = {}
+        self._running: dict[int, asyncio.Task] = {}
+        self._failures: dict[int, int] = {}
+        self._retry_at: dict[int, float] = {}
+        self._wakeup = asyncio.Event()
+        self._idle = asyncio.Event()
+        self._idle.set()
+        self._task: asyncio.Task | None = None
+        self.attempts = 0
+        self.connected = 0
+        self.failed = 0
+
+    def schedule(self, node_id: int, priority: int = 0, immediate: bool = False) -> None:
+        if immediate:
+            self._retry_at.pop(node_id, None)
+        self._queued[node_id] = max(priority, self._queued.get(node_id, priority))
+        if self._retry_at.get(node_id, 0) <= time.monotonic():
+            self._idle.clear()
+        self._wake()
+
+    def discard(self, node_id: int) -> None:
+        """Forgets a removed node, a connection already running is left to finish."""
+        self._queued.pop(node_id, None)
+        self._failures.pop(node_id, None)
+        self._retry_at.pop(node_id, None)
+        self._wake()
+
+    def delay(self, failures: int) -> float:
+        """Backoff after ``failures`` failures in a row, between half and all of the doubled delay."""
+        delay = min(self.backoff * 2 ** (failures - 1), self.max_backoff)
+        return delay / 2 + random.uniform(0, delay / 2)
+
+    async def join(self) -> None:
+        """Waits until every scheduled node that isn't backing off has been attempted."""
+        await self._idle.wait()
+
+    async def close(self) -> None:
+        for task in [self._task, *self._running.values()]:
+            if task is not None:
+                task.cancel()
+        self._task = None
+        self._running.clear()
+        self._queued.clear()
+        self._idle.set()
+
+    def _wake(self) -> None:
+        self._wakeup.set()
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    def _next(self, now: float) -> int | None:
+        ready = [
+            node_id
+            for node_id in self._queued
+            if node_id not in self._running and self._retry_at.get(node_id, 0) <= now
+        ]
+        # dicts keep insertion order, so equal priorities go first come first served
+        return max(ready, key=self._queued.__getitem__, default=None)
+
+    async def _run(self) -> None:
+        while True:
+            self._wakeup.clear()
+            now = time.monotonic()
+            while len(self._running) < self.concurrency and (node_id := self._next(now)) is not None:
+                del self._queued[node_id]
+                self._running[node_id] = asyncio.create_task(self._attempt(node_id))
+
+            # the rest of the queue waits for a free slot, a backoff or the node's running connection
+            if self._running:
+                self._idle.clear()
+            else:
+                self._idle.set()
+
+            waiting = [self._retry_at.get(node_id, 0) for node_id in self._queued if node_id not in self._running]
+            waiting = [retry_at for retry_at in waiting if retry_at > now]
+            timeout = min(waiting) - now if waiting else None
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+            except TimeoutError:
+                pass
+
+    async def _attempt(self, node_id: int) -> None:
+        self.attempts += 1
+        try:
+            connected = await self._connect(node_id)
+        except Exception as e:
+            logger.error(f"Failed to connect node {node_id}: {e}")
+            connected = False
+
+        if connected:
+            self.connected += 1
+            self._failures.pop(node_id, None)
+            self._retry_at.pop(node_id, None)
+        else:
+            self.failed += 1
+            failures = self._failures[node_id] = self._failures.get(node_id, 0) + 1
+            self._retry_at[node_id] = time.monotonic() + self.delay(failures)
+
+        self._running.pop(node_id, None)
+        self._wake()
+
+    def stats(self) -> NodeReconnectStats:
+        now = time.monotonic()
+        nodes = {}
+        for node_id in self._queued.keys() | self._running.keys() | self._failures.keys():
+            retry_in = max(self._retry_at.get(node_id, now) - now, 0)
+            if node_id in self._running:
+                state = "running"
+            elif node_id not in self._queued:
+                state = "failed"
+            elif retry_in > 0:
+                state = "waiting"
+            else:
+                state = "queued"
+            nodes[node_id] = NodeReconnectState(
+                state=state,
+                priority=self._queued.get(node_id, 0),
+                failures=self._failures.get(node_id, 0),
+                retry_in=retry_in,
+            )
+
+        return NodeReconnectStats(
+            concurrency=self.concurrency,
+            queued=len(self._queued),
+            running=len(self._running),
+            attempts=self.attempts,
+            connected=self.connected,
+            failed=self.failed,
+            nodes=nodes,
+        )
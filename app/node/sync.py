@@ -0,0 +1,73 @@
+import hashlib
+
+from PasarGuardNodeBridge import create_proxy, create_user
+
+_roster_digests: tuple[list, dict[str, bytes]] | None = None
+
+
+def user_digest(proto_user) -> bytes:
+    return hashlib.blake2b(proto_user.SerializeToString(deterministic=True), digest_size=16).digest()
+
+
+def roster_digests(users: list) -> dict[str, bytes]:
+    """Digest of every user in the roster by email, computed once per roster shared by all nodes."""
+    global _roster_digests
+    if _roster_digests is None or _roster_digests[0] is not users:
+        _roster_digests = (users, {user.email: user_digest(user) for user in users})
+    return _roster_digests[1]
+
+
+class NodeSyncLedger:
+    """
+    Users one node was last brought up to date with, as a digest per user email.
+
+    A full push records the whole roster and every batch of changes shipped afterwards is applied on
+    top, so a resync only needs the users whose digest differs. Until the first full push, or after one
+    fails, the ledger is unknown and the node needs the whole roster again.
+    """
+
+    def __init__(self):
+        self._digests: dict[str, bytes] | None = None
+        self.version: int | None = None
+
+    @property
+    def known(self) -> bool:
+        return self._digests is not None
+
+    def reset(self) -> None:
+        self._digests = None
+        self.version = None
+
+    def record(self, users: list, version: int | None = None) -> None:
+        """The node got ``users`` as its whole roster, built for roster ``version``."""
+        self._digests = dict(roster_digests(users))
+        self.version = version
+
+    def apply(self, users: list) -> None:
+        """The node got ``users`` as changes, users without inbounds are removed from it."""
+        if self._digests is None:
+            return
+        for user in users:
+            if user.inbounds:
+                self._digests[user.email] = user_digest(user)
+            else:
+                self._digests.pop(user.email, None)
+        self.version = None
+
+    def diff(self, users: list, version: int | None = None) -> list | None:
+        """
+        Changes that bring the node from the ledger to ``users``: added and changed users as they are,
+        removed users without inbounds. ``None`` when the ledger is unknown and a full push is needed.
+        """
+        if self._digests is None:
+            return None
+        if version is not None and version == self.version:
+            return []
+
+        digests = roster_digests(users)
+        changes = [user for user in users if self._digests.get(user.email) != digests[user.email]]
+        changes.extend(create_user(email, create_proxy(), []) for email in self._digests.keys() - digests.keys())
+        return changes
+
+    def __len__(self) -> int:
+        return len(self._digests) if self._digests is not None else 0
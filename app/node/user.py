@@ -1,9 +1,12 @@
+import asyncio
+
 from sqlalchemy.orm import load_only, selectinload
 from sqlalchemy import select
 from PasarGuardNodeBridge import create_user, create_proxy
 
-from app.db import AsyncSession
-from app.db.models import ProxyInbound, Group, User, UserStatus
+from app.core.groups import group_inbounds
+from app.db import AsyncSession, GetDB
+from app.db.models import User, UserStatus
 
 
 def serialize_user_for_node(id: int, username: str, user_settings: dict, inbounds: list[str] = None):
@@ -32,7 +35,6 @@ async def core_users(db: AsyncSession):
         .options(
             load_only(User.id, User.username, User.proxy_settings),
             selectinload(User.groups),
-            selectinload(User.groups).selectinload(Group.inbounds).load_only(ProxyInbound.tag),
         )
         .filter(User.status.in_([UserStatus.active, UserStatus.on_hold]))
     )
@@ -40,7 +42,7 @@ async def core_users(db: AsyncSession):
     bridge_users: list = []
 
     for user in users:
-        inbounds_list = await user.inbounds()
+        inbounds_list = await group_inbounds.user_inbounds(user)
         if len(inbounds_list) > 0:
             bridge_users.append(serialize_user_for_node(user.id, user.username, user.proxy_settings, inbounds_list))
 
@@ -53,8 +55,59 @@ async def serialize_users_for_node(users: list[User]):
     for user in users:
         inbounds_list = []
         if user.status in [UserStatus.active, UserStatus.on_hold]:
-            inbounds_list = await user.inbounds()
+            inbounds_list = await group_inbounds.user_inbounds(user)
 
         bridge_users.append(serialize_user_for_node(user.id, user.username, user.proxy_settings, inbounds_list))
 
     return bridge_users
+
+
+class UserRoster:
+    """
+    Serialized proto users of every active/on_hold user, shared by all nodes.
+
+    The roster is built at most once per version; concurrent callers await the same build.
+    Any change that is pushed to nodes (users, groups, inbounds) must call ``invalidate``.
+    """
+
+    def __init__(self):
+        self._version = 0
+        self._users: list | None = None
+        self._users_version = -1
+        self._build: asyncio.Task | None = None
+        self._build_version = -1
+
+    @property
+    def version(self) -> int:
+        return self._version
+
+    def invalidate(self) -> None:
+        self._version += 1
+
+    async def get(self) -> list:
+        version = self._version
+        if self._users_version == version:
+            return self._users
+
+        if self._build is None or self._build_version != version:
+            self._build = asyncio.create_task(self._build_roster(version))
+            self._build_version = version
+
+        # shield the shared build so one cancelled caller doesn't cancel it for the others
+        return await asyncio.shield(self._build)
+
+    async def _build_roster(self, version: int) -> list:
+        try:
+            async with GetDB() as db:
+                users = await core_users(db)
+        except BaseException:
+            # drop the failed build so the next caller retries instead of re-raising it
+            if self._build_version == version:
+                self._build = None
+            raise
+
+        # a change landed while building, keep the result for current callers but don't cache it
+        if self._version == version:
+            self._users = users
+            self._users_version = version
+        return users
@@ -146,8 +146,9 @@ class BaseOperation:
         return db_node
 
     async def check_inbound_tags(self, tags: list[str]) -> None:
+        inbounds = await core_manager.get_inbounds()
         for tag in tags:
-            if tag not in await core_manager.get_inbounds():
+            if tag not in inbounds:
                 await self.raise_error(f"{tag} not found", 400)
 
     async def get_validated_core_config(self, db: AsyncSession, core_id) -> CoreConfig:
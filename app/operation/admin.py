@@ -18,10 +18,17 @@ from app.db.models import Admin as DBAdmin
 from app.models.admin import AdminCreate, AdminDetails, AdminModify
 from app.node import node_manager
 from app.operation import BaseOperation, OperatorType
+from app.usage import usage_accumulator, user_review
+from app.utils.jwt import admin_tokens
 from app.utils.logger import get_logger
+from app.utils.ttl_cache import TTLCache
+from config import ADMIN_CACHE_TTL, TOKEN_CACHE_SIZE
 
 logger = get_logger("admin-operation")
 
+# username -> (admin, password_reset_at) for authenticating API calls, dropped whenever the admin changes
+admin_cache = TTLCache(TOKEN_CACHE_SIZE, ADMIN_CACHE_TTL)
+
 
 class AdminOperation(BaseOperation):
     async def create_admin(self, db: AsyncSession, new_admin: AdminCreate, admin: AdminDetails) -> AdminDetails:
@@ -49,6 +56,9 @@ class AdminOperation(BaseOperation):
             )
 
         db_admin = await update_admin(db, db_admin, modified_admin)
+        admin_cache.invalidate(username)
+        if modified_admin.password is not None:
+            admin_tokens.invalidate(username)
 
         if self.operator_type != OperatorType.CLI:
             logger.info(
@@ -72,6 +82,8 @@ class AdminOperation(BaseOperation):
             )
 
         await remove_admin(db, db_admin)
+        admin_cache.invalidate(username)
+        admin_tokens.invalidate(username)
         if self.operator_type != OperatorType.CLI:
             logger.info(
                 f'Admin "{db_admin.username}" with id "{db_admin.id}" deleted by admin "{current_admin.username}"'
@@ -97,6 +109,7 @@ class AdminOperation(BaseOperation):
 
         users = await get_users(db, admin=db_admin)
         await node_manager.update_users(users)
+        user_review.invalidate()
 
         logger.info(f'Admin "{username}" users has been disabled by admin "{admin.username}"')
 
@@ -111,13 +124,17 @@ class AdminOperation(BaseOperation):
 
         users = await get_users(db, admin=db_admin)
         await node_manager.update_users(users)
+        user_review.invalidate()
 
         logger.info(f'Admin "{username}" users has been activated by admin "{admin.username}"')
 
     async def reset_admin_usage(self, db: AsyncSession, username: str, admin: AdminDetails) -> AdminDetails:
         db_admin = await self.get_validated_admin(db, username=username)
 
-        db_admin = await reset_admin_usage(db, db_admin=db_admin)
+        async with usage_accumulator.lock:
+            pending = usage_accumulator.take_admins([db_admin.id])
+            db_admin = await reset_admin_usage(db, db_admin=db_admin, pending_usage=pending.get(db_admin.id, 0))
+        admin_cache.invalidate(username)
         if self.operator_type != OperatorType.CLI:
             logger.info(f'Admin "{username}" usage has been reset by admin "{admin.username}"')
 
@@ -7,7 +7,10 @@ from app.models.core import CoreCreate, CoreResponseList, CoreResponse
 from app.core.manager import core_manager
 from app.operation import BaseOperation
 from app import notification
+from app.core.groups import group_inbounds
 from app.core.hosts import hosts as hosts_storage
+from app.node import user_roster
+from app.subscription.cache import subscription_cache
 from app.utils.logger import get_logger
 
 
@@ -23,12 +26,15 @@ class CoreOperation(BaseOperation):
             await self.raise_error(message=e, code=400, db=db)
 
         await core_manager.update_core(db_core)
+        user_roster.invalidate()
         logger.info(f'Core config "{db_core.id}" created by admin "{admin.username}"')
 
         core = CoreResponse.model_validate(db_core)
         asyncio.create_task(notification.create_core(core, admin.username))
 
         await hosts_storage.update(db)
+        await group_inbounds.refresh(db)
+        subscription_cache.clear()
 
         return core
 
@@ -49,6 +55,7 @@ class CoreOperation(BaseOperation):
             await self.raise_error(message=e, code=400, db=db)
 
         await core_manager.update_core(db_core)
+        user_roster.invalidate()
 
         logger.info(f'Core config "{db_core.name}" modified by admin "{admin.username}"')
 
@@ -56,6 +63,8 @@ class CoreOperation(BaseOperation):
         asyncio.create_task(notification.modify_core(core, admin.username))
 
         await hosts_storage.update(db)
+        await group_inbounds.refresh(db)
+        subscription_cache.clear()
 
         return core
 
@@ -67,9 +76,12 @@ class CoreOperation(BaseOperation):
 
         await remove_core_config(db, db_core)
         await core_manager.remove_core(db_core.id)
+        user_roster.invalidate()
 
         asyncio.create_task(notification.remove_core(db_core.id, admin.username))
 
         logger.info(f'core config "{db_core.name}" deleted by admin "{admin.username}"')
 
         await hosts_storage.update(db)
+        await group_inbounds.refresh(db)
+        subscription_cache.clear()
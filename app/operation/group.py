@@ -1,6 +1,7 @@
 import asyncio
 
 from app import notification
+from app.core.groups import group_inbounds
 from app.db import AsyncSession
 from app.db.crud.bulk import add_groups_to_users, remove_groups_from_users
 from app.db.crud.group import create_group, get_group, modify_group, remove_group
@@ -19,6 +20,7 @@ class GroupOperation(BaseOperation):
         await self.check_inbound_tags(new_group.inbound_tags)
 
         db_group = await create_group(db, new_group)
+        group_inbounds.set(db_group.id, db_group.inbound_tags)
 
         group = GroupResponse.model_validate(db_group)
 
@@ -38,6 +40,7 @@ class GroupOperation(BaseOperation):
         if modified_group.inbound_tags:
             await self.check_inbound_tags(modified_group.inbound_tags)
         db_group = await modify_group(db, db_group, modified_group)
+        group_inbounds.set(db_group.id, db_group.inbound_tags)
 
         users = await get_users(db, group_ids=[db_group.id])
         await node_manager.update_users(users)
@@ -56,6 +59,7 @@ class GroupOperation(BaseOperation):
         username_list = [user.username for user in users]
 
         await remove_group(db, db_group)
+        group_inbounds.remove(group_id)
         users = await get_users(db, usernames=username_list)
 
         await node_manager.update_users(users)
@@ -7,6 +7,7 @@ from app.models.admin import AdminDetails
 from app.operation import BaseOperation
 from app.db.crud.host import create_host, get_host_by_id, remove_host, get_hosts, modify_host
 from app.core.hosts import hosts as hosts_storage
+from app.subscription.cache import subscription_cache
 from app.utils.logger import get_logger
 
 from app import notification
@@ -50,6 +51,7 @@ class HostOperation(BaseOperation):
         asyncio.create_task(notification.create_host(host, admin.username))
 
         await hosts_storage.update(db)
+        subscription_cache.clear()
 
         return host
 
@@ -71,6 +73,7 @@ class HostOperation(BaseOperation):
         asyncio.create_task(notification.modify_host(host, admin.username))
 
         await hosts_storage.update(db)
+        subscription_cache.clear()
 
         return host
 
@@ -84,6 +87,7 @@ class HostOperation(BaseOperation):
         asyncio.create_task(notification.remove_host(host, admin.username))
 
         await hosts_storage.update(db)
+        subscription_cache.clear()
 
     async def modify_hosts(
         self, db: AsyncSession, modified_hosts: list[CreateHost], admin: AdminDetails
@@ -101,6 +105,7 @@ class HostOperation(BaseOperation):
                 await modify_host(db, old_host, host)
 
         await hosts_storage.update(db)
+        subscription_cache.clear()
 
         logger.info(f'Host\'s has been modified by admin "{admin.username}"')
 
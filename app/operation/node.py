@@ -23,9 +23,19 @@ from app.db.crud.user import get_user
 from app.db.models import Node, NodeStatus
 from app.models.admin import AdminDetails
 from app.models.node import NodeCreate, NodeModify, NodeResponse, UsageTable
-from app.models.stats import NodeRealtimeStats, NodeStatsList, NodeUsageStatsList, Period
-from app.node import core_users, node_manager
+from app.models.stats import (
+    NodeRealtimeStats,
+    NodeReconnectStats,
+    NodeStatsList,
+    NodeUsageCollectionStats,
+    NodeUsageStatsList,
+    NodeUserChangesStats,
+    Period,
+)
+from app.node import node_manager, user_roster
+from app.node.reconnect import NodeReconnectScheduler
 from app.operation import BaseOperation
+from app.usage import node_collection_stats
 from app.utils.logger import get_logger
 
 MAX_MESSAGE_LENGTH = 128
@@ -77,16 +87,16 @@ class NodeOperation(BaseOperation):
             asyncio.create_task(notification.error_node(node_response))
 
     @staticmethod
-    async def connect_node(node_id: int) -> None:
+    async def connect_node(node_id: int) -> bool:
         gozargah_node: PasarGuardNode | None = await node_manager.get_node(node_id)
         if gozargah_node is None:
-            return
+            return False
 
         async with GetDB() as db:
             db_node = await get_node_by_id(db, node_id)
 
             if db_node is None:
-                return
+                return False
 
             notify_err = True if db_node.status is not NodeStatus.error else False
 
@@ -96,15 +106,19 @@ class NodeOperation(BaseOperation):
             core = await core_manager.get_core(db_node.core_config_id if db_node.core_config_id else 1)
 
             try:
+                roster_version = user_roster.version
+                users = await user_roster.get()
                 info = await gozargah_node.start(
                     config=core.to_str(),
                     backend_type=0,
-                    users=await core_users(db=db),
+                    users=users,
                     keep_alive=db_node.keep_alive,
                     ghather_logs=db_node.gather_logs,
                     exclude_inbounds=core.exclude_inbound_tags,
                     timeout=10,
                 )
+                # later resyncs of this connection only send what changed since
+                node_manager.record_node_sync(node_id, gozargah_node, users, roster_version)
                 await NodeOperation.update_node_status(
                     node_id=db_node.id,
                     status=NodeStatus.connected,
@@ -114,9 +128,10 @@ class NodeOperation(BaseOperation):
                 logger.info(
                     f'Connected to "{db_node.name}" node v{info.node_version}, xray run on v{info.core_version}'
                 )
+                return True
             except NodeAPIError as e:
                 if e.code == -4:
-                    return
+                    return False
 
                 detail = e.detail
 
@@ -128,6 +143,24 @@ class NodeOperation(BaseOperation):
                 await NodeOperation.update_node_status(
                     node_id=db_node.id, status=NodeStatus.error, err=detail, notify_err=notify_err
                 )
+                return False
+            finally:
+                await node_manager.refresh_node_health(node_id)
+
+    @staticmethod
+    def schedule_connect(node_id: int, immediate: bool = False, users: int = 0) -> None:
+        """
+        Queues a node for the reconnection scheduler. Nodes that served the most users in the last usage
+        collection go first, ``users`` is used instead until the node was collected (e.g. at startup).
+        ``immediate`` skips the backoff of a node that failed to connect.
+        """
+        stats = node_collection_stats.get(node_id)
+        node_reconnects.schedule(node_id, priority=stats.users if stats else users, immediate=immediate)
+
+    @staticmethod
+    async def get_reconnect_stats() -> NodeReconnectStats:
+        """Progress of the reconnection scheduler, nodes failing to connect show up with their backoff"""
+        return node_reconnects.stats()
 
     async def create_node(self, db: AsyncSession, new_node: NodeCreate, admin: AdminDetails) -> NodeResponse:
         await self.get_validated_core_config(db, new_node.core_config_id)
@@ -138,7 +171,7 @@ class NodeOperation(BaseOperation):
 
         try:
             await node_manager.update_node(db_node)
-            asyncio.create_task(self.connect_node(node_id=db_node.id))
+            self.schedule_connect(db_node.id, immediate=True)
         except NodeAPIError as e:
             await self.update_node_status(db_node.id, NodeStatus.error, err=e.detail)
 
@@ -164,10 +197,11 @@ class NodeOperation(BaseOperation):
 
         if db_node.status is NodeStatus.disabled:
             await node_manager.remove_node(db_node.id)
+            node_reconnects.discard(db_node.id)
         else:
             try:
                 await node_manager.update_node(db_node)
-                asyncio.create_task(self.connect_node(node_id=db_node.id))
+                self.schedule_connect(db_node.id, immediate=True)
             except NodeAPIError as e:
                 await self.update_node_status(db_node.id, NodeStatus.error, err=e.detail)
 
@@ -183,6 +217,7 @@ class NodeOperation(BaseOperation):
         db_node: Node = await self.get_validated_node(db=db, node_id=node_id)
 
         await node_manager.remove_node(db_node.id)
+        node_reconnects.discard(db_node.id)
         await remove_node(db=db, db_node=db_node)
 
         logger.info(f'Node "{db_node.name}" with id "{db_node.id}" deleted by admin "{admin.username}"')
@@ -190,12 +225,14 @@ class NodeOperation(BaseOperation):
         asyncio.create_task(notification.remove_node(db_node, admin.username))
 
     async def restart_node(self, node_id: Node, admin: AdminDetails) -> None:
-        asyncio.create_task(self.connect_node(node_id))
+        self.schedule_connect(node_id, immediate=True)
         logger.info(f'Node "{node_id}" restarted by admin "{admin.username}"')
 
     async def restart_all_node(self, db: AsyncSession, admin: AdminDetails, core_id: int | None = None) -> None:
         nodes: list[Node] = await self.get_db_nodes(db, core_id)
-        await asyncio.gather(*[NodeOperation.connect_node(node.id) for node in nodes])
+        for node in nodes:
+            if node.status is not NodeStatus.disabled:
+                self.schedule_connect(node.id, immediate=True)
 
         logger.info(f'All nodes restarted by admin "{admin.username}"')
 
@@ -269,6 +306,17 @@ class NodeOperation(BaseOperation):
 
         return results
 
+    @staticmethod
+    async def get_usage_collection_stats() -> dict[int, NodeUsageCollectionStats]:
+        """Latest user stats collection of every node, slow nodes show up with a high latency"""
+        nodes = await node_manager.get_nodes()
+        return {node_id: stats for node_id, stats in node_collection_stats.items() if node_id in nodes}
+
+    @staticmethod
+    async def get_user_changes_stats() -> dict[int, NodeUserChangesStats]:
+        """User changes queued for every node, a growing lag or overflows point at a node that can't keep up"""
+        return node_manager.get_user_changes_stats()
+
     async def _get_node_stats_safe(self, node_id: Node) -> NodeRealtimeStats | None:
         """Wrapper method that returns None instead of raising exceptions"""
         try:
@@ -330,7 +378,7 @@ class NodeOperation(BaseOperation):
             await self.raise_error(message="Node is not connected", code=409)
 
         try:
-            await gozargah_node.sync_users(await core_users(db=db), flush_queue=flush_users)
+            await node_manager.sync_node_users(node_id, full=flush_users)
         except NodeAPIError as e:
             await update_node_status(db=db, db_node=db_node, status=NodeStatus.error, message=e.detail)
             await self.raise_error(message=e.detail, code=e.code)
@@ -348,3 +396,6 @@ class NodeOperation(BaseOperation):
             return {"detail": f"All data from '{table}' has been deleted successfully."}
         except Exception as e:
             await self.raise_error(code=400, message=f"Deletion failed due to server error: {str(e)}")
+
+
+node_reconnects = NodeReconnectScheduler(NodeOperation.connect_node)
@@ -4,8 +4,10 @@ from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.db.models import Settings
 from app.db.crud.settings import get_settings, modify_settings
-from app.models.settings import SettingsSchema
-from app.settings import refresh_caches
+from app.models.settings import SettingsSchema, SubRuleStats, SubRulesStats
+from app.settings import refresh_caches, subscription_settings
+from app.subscription.cache import subscription_cache
+from app.subscription.client_rules import client_rules
 from app.notification.client import define_client
 from app.notification.webhook import queue as webhook_queue
 from app.telegram import startup_telegram_bot
@@ -35,6 +37,7 @@ class SettingsOperation(BaseOperation):
         new_settings = SettingsSchema.model_validate(db_settings)
 
         await refresh_caches()
+        subscription_cache.clear()
         asyncio.create_task(self.reset_services(old_settings, new_settings))
 
         return new_settings
@@ -42,3 +45,14 @@ class SettingsOperation(BaseOperation):
     async def get_general_settings(self, db: AsyncSession):
         settings = await self.get_settings(db)
         return settings.general
+
+    async def get_subscription_rules_stats(self) -> SubRulesStats:
+        """Hits of every subscription client rule since the rules last changed."""
+        sub_settings = await subscription_settings()
+        return SubRulesStats(
+            rules=[
+                SubRuleStats(**rule.model_dump(), hits=hits) for rule, hits in client_rules.stats(sub_settings.rules)
+            ],
+            unmatched=client_rules.unmatched,
+            cached_user_agents=client_rules.cached_user_agents,
+        )
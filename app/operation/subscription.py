@@ -1,19 +1,26 @@
-import re
 from datetime import datetime as dt
 
 from fastapi import Response
-from fastapi.responses import HTMLResponse
+from fastapi.responses import HTMLResponse, StreamingResponse
 
+from app.core.groups import group_inbounds
+from app.core.hosts import hosts as hosts_storage
+from app.core.manager import core_manager
 from app.db import AsyncSession
-from app.db.crud.user import get_user_usages, user_sub_update
+from app.db.crud.user import get_user_usages
 from app.db.models import User
 from app.models.settings import ConfigFormat, SubRule, Subscription as SubSettings
 from app.models.stats import Period, UserUsageStatsList
 from app.models.user import SubscriptionUserResponse, UsersResponseWithInbounds
 from app.settings import subscription_settings
-from app.subscription.share import encode_title, generate_subscription
+from app.subscription.cache import CachedSubscription, etag_matches, subscription_cache
+from app.subscription.client_rules import client_rules
+from app.subscription.share import encode_title, generate_subscription, generate_subscription_chunks
+from app.subscription.streaming import MIN_COMPRESS_SIZE, compress_chunks, negotiate_encoding
+from app.subscription.updates import subscription_updates
 from app.templates import render_template
-from config import SUBSCRIPTION_PAGE_TEMPLATE
+from app.usage import usage_accumulator
+from config import SUBSCRIPTION_CACHE_TRAFFIC_BUCKET, SUBSCRIPTION_PAGE_TEMPLATE, SUBSCRIPTION_STREAMING
 
 from . import BaseOperation
 
@@ -26,29 +33,29 @@ client_config = {
     ConfigFormat.outline: {"config_format": "outline", "media_type": "application/json", "as_base64": False},
     ConfigFormat.xray: {"config_format": "xray", "media_type": "application/json", "as_base64": False},
 }
+# formats rendered incrementally, the others are built as a whole anyway and go through the cache
+streamable_formats = {ConfigFormat.links, ConfigFormat.links_base64, ConfigFormat.xray, ConfigFormat.sing_box}
 
 
 class SubscriptionOperation(BaseOperation):
     @staticmethod
     async def validated_user(db_user: User) -> UsersResponseWithInbounds:
         user = UsersResponseWithInbounds.model_validate(db_user.__dict__)
-        user.inbounds = await db_user.inbounds()
+        user.inbounds = await group_inbounds.user_inbounds(db_user)
         user.expire = db_user.expire
 
         return user
 
     @staticmethod
-    async def detect_client_type(user_agent: str, rules: list[SubRule]) -> ConfigFormat | None:
-        """Detect the appropriate client configuration based on the user agent."""
-        for rule in rules:
-            if re.match(rule.pattern, user_agent):
-                return rule.target
+    async def detect_client_rule(user_agent: str, rules: list[SubRule]) -> SubRule | None:
+        """Detect the rule, and so the client configuration, that matches the user agent."""
+        return client_rules.match(user_agent, rules)
 
     @staticmethod
     def create_response_headers(user: UsersResponseWithInbounds, request_url: str, sub_settings: SubSettings) -> dict:
         """Create response headers for subscription responses, including user subscription info."""
         # Generate user subscription info
-        user_info = {"upload": 0, "download": user.used_traffic}
+        user_info = {"upload": 0, "download": user.used_traffic + usage_accumulator.pending_user_usage(user.id)}
 
         if user.data_limit:
             user_info["total"] = user.data_limit
@@ -69,19 +76,93 @@ class SubscriptionOperation(BaseOperation):
             "subscription-userinfo": "; ".join(f"{key}={val}" for key, val in user_info.items()),
         }
 
-    async def fetch_config(self, user: UsersResponseWithInbounds, client_type: ConfigFormat) -> tuple[str, str]:
+    @staticmethod
+    def cache_key(user: UsersResponseWithInbounds, client_type: ConfigFormat, compact: bool = False) -> tuple:
+        """Everything a rendered subscription depends on, starting with the user id."""
+        return (
+            user.id,
+            client_type,
+            compact,
+            hosts_storage.version,
+            core_manager.version,
+            user.edit_at,
+            user.status,
+            user.used_traffic // SUBSCRIPTION_CACHE_TRAFFIC_BUCKET,
+            user.data_limit,
+            user.expire,
+            user.on_hold_expire_duration,
+            user.admin.username if user.admin else None,
+            frozenset(user.inbounds),
+        )
+
+    async def fetch_config(
+        self, user: UsersResponseWithInbounds, client_type: ConfigFormat, compact: bool = False
+    ) -> CachedSubscription:
+        key = self.cache_key(user, client_type, compact)
+        if cached := subscription_cache.get(key):
+            return cached
+
         # Get client configuration
         config = client_config.get(client_type)
 
         # Generate subscription content
-        return (
-            await generate_subscription(
-                user=user,
-                config_format=config["config_format"],
-                as_base64=config["as_base64"],
-            ),
-            config["media_type"],
+        conf = await generate_subscription(
+            user=user,
+            config_format=config["config_format"],
+            as_base64=config["as_base64"],
+            compact=compact,
+        )
+        return subscription_cache.set(key, conf, config["media_type"])
+
+    @staticmethod
+    def config_response(
+        subscription: CachedSubscription, headers: dict, if_none_match: str = "", accept_encoding: str = ""
+    ) -> Response:
+        encoding = negotiate_encoding(accept_encoding) if len(subscription.config) >= MIN_COMPRESS_SIZE else "identity"
+        etag = subscription.encoded_etag(encoding)
+        headers = {**headers, "etag": etag, "vary": "Accept-Encoding"}
+        if etag_matches(etag, if_none_match):
+            return Response(status_code=304, headers=headers)
+        if encoding != "identity":
+            headers["content-encoding"] = encoding
+        return Response(content=subscription.body(encoding), media_type=subscription.media_type, headers=headers)
+
+    @staticmethod
+    async def stream_config(
+        user: UsersResponseWithInbounds,
+        client_type: ConfigFormat,
+        headers: dict,
+        compact: bool = False,
+        accept_encoding: str = "",
+    ) -> StreamingResponse:
+        """Renders the config while it is sent, nothing is cached and the size is unknown so there is no etag."""
+        config = client_config.get(client_type)
+        chunks = await generate_subscription_chunks(
+            user=user,
+            config_format=config["config_format"],
+            as_base64=config["as_base64"],
+            compact=compact,
         )
+        encoding = negotiate_encoding(accept_encoding)
+        headers = {**headers, "vary": "Accept-Encoding"}
+        if encoding != "identity":
+            headers["content-encoding"] = encoding
+        return StreamingResponse(compress_chunks(chunks, encoding), media_type=config["media_type"], headers=headers)
+
+    async def config_or_stream(
+        self,
+        user: UsersResponseWithInbounds,
+        client_type: ConfigFormat,
+        headers: dict,
+        compact: bool = False,
+        if_none_match: str = "",
+        accept_encoding: str = "",
+    ) -> Response:
+        if SUBSCRIPTION_STREAMING and client_type in streamable_formats:
+            return await self.stream_config(user, client_type, headers, compact, accept_encoding)
+
+        subscription = await self.fetch_config(user, client_type, compact)
+        return self.config_response(subscription, headers, if_none_match, accept_encoding)
 
     async def user_subscription(
         self,
@@ -90,6 +171,8 @@ class SubscriptionOperation(BaseOperation):
         accept_header: str = "",
         user_agent: str = "",
         request_url: str = "",
+        if_none_match: str = "",
+        accept_encoding: str = "",
     ):
         """Provides a subscription link based on the user agent (Clash, V2Ray, etc.)."""
         # Handle HTML request (subscription page)
@@ -105,23 +188,30 @@ class SubscriptionOperation(BaseOperation):
                 if db_user.admin and db_user.admin.sub_template
                 else SUBSCRIPTION_PAGE_TEMPLATE
             )
-            conf, media_type = await self.fetch_config(user, ConfigFormat.links)
+            links = await self.fetch_config(user, ConfigFormat.links)
 
-            return HTMLResponse(render_template(template, {"user": user, "links": conf.split("\n")}))
+            return HTMLResponse(render_template(template, {"user": user, "links": links.config.split("\n")}))
         else:
-            client_type = await self.detect_client_type(user_agent, sub_settings.rules)
-            if client_type == ConfigFormat.block or not client_type:
+            rule = await self.detect_client_rule(user_agent, sub_settings.rules)
+            if not rule or rule.target == ConfigFormat.block:
                 await self.raise_error(message="Client not supported", code=406)
 
-            # Update user subscription info
-            await user_sub_update(db, db_user.id, user_agent)
-            conf, media_type = await self.fetch_config(user, client_type)
+            # Update user subscription info, written in bulk by the flush job
+            subscription_updates.record(db_user.id, user_agent)
 
         # Create response with appropriate headers
-        return Response(content=conf, media_type=media_type, headers=response_headers)
+        return await self.config_or_stream(
+            user, rule.target, response_headers, rule.compact, if_none_match, accept_encoding
+        )
 
     async def user_subscription_with_client_type(
-        self, db: AsyncSession, token: str, client_type: ConfigFormat, request_url: str = ""
+        self,
+        db: AsyncSession,
+        token: str,
+        client_type: ConfigFormat,
+        request_url: str = "",
+        if_none_match: str = "",
+        accept_encoding: str = "",
     ):
         """Provides a subscription link based on the specified client type (e.g., Clash, V2Ray)."""
         sub_settings: SubSettings = await subscription_settings()
@@ -132,10 +222,11 @@ class SubscriptionOperation(BaseOperation):
         response_headers = self.create_response_headers(db_user, request_url, sub_settings)
 
         user = await self.validated_user(db_user)
-        conf, media_type = await self.fetch_config(user, client_type)
 
         # Create response headers
-        return Response(content=conf, media_type=media_type, headers=response_headers)
+        return await self.config_or_stream(
+            user, client_type, response_headers, if_none_match=if_none_match, accept_encoding=accept_encoding
+        )
 
     async def user_subscription_info(self, db: AsyncSession, token: str) -> SubscriptionUserResponse:
         """Retrieves detailed information about the user's subscription."""
@@ -62,4 +62,4 @@ class SystemOperation(BaseOperation):
 
     @staticmethod
     async def get_inbounds() -> list[str]:
-        return await core_manager.get_inbounds()
+        return list(await core_manager.get_inbounds())
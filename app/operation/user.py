@@ -6,6 +6,7 @@ from pydantic import ValidationError
 from sqlalchemy.exc import IntegrityError
 
 from app import notification
+from app.core.groups import group_inbounds
 from app.db import AsyncSession
 from app.db.crud.admin import get_admin
 from app.db.crud.bulk import (
@@ -48,9 +49,12 @@ from app.models.user import (
 )
 from app.node import node_manager
 from app.operation import BaseOperation, OperatorType
+from app.usage import usage_accumulator, user_admin_index, user_review
 from app.utils.logger import get_logger
-from app.utils.jwt import create_subscription_token
+from app.utils.jwt import create_subscription_token, subscription_tokens
 from app.settings import subscription_settings
+from app.subscription.cache import subscription_cache
+from app.subscription.updates import subscription_updates
 from config import SUBSCRIPTION_PATH
 
 
@@ -77,9 +81,11 @@ class UserOperation(BaseOperation):
 
     async def update_user(self, db_user: User) -> UserNotificationResponse:
         user = await self.validate_user(db_user)
+        subscription_cache.invalidate_users([user.id])
+        user_review.update(user)
 
         if db_user.status in (UserStatus.active, UserStatus.on_hold):
-            user_inbounds = await db_user.inbounds()
+            user_inbounds = await group_inbounds.user_inbounds(db_user)
             await node_manager.update_user(user, inbounds=user_inbounds)
         else:
             await node_manager.remove_user(user)
@@ -99,6 +105,7 @@ class UserOperation(BaseOperation):
             await self.raise_error(message="User already exists", code=409, db=db)
 
         user = await self.update_user(db_user)
+        user_admin_index.set(db_user.id, db_user.admin_id)
 
         logger.info(f'New user "{db_user.username}" with id "{db_user.id}" added by admin "{admin.username}"')
 
@@ -143,7 +150,13 @@ class UserOperation(BaseOperation):
 
         user = await self.validate_user(db_user)
         await remove_user(db, db_user)
-        node_manager.remove_user(user)
+        subscription_tokens.invalidate(user.username)
+        await node_manager.remove_user(user)
+        usage_accumulator.discard_users([user.id])
+        subscription_updates.discard_users([user.id])
+        subscription_cache.invalidate_users([user.id])
+        user_admin_index.remove([user.id])
+        user_review.remove([user.id])
 
         asyncio.create_task(notification.remove_user(user, admin))
 
@@ -153,7 +166,9 @@ class UserOperation(BaseOperation):
     async def _reset_user_data_usage(self, db: AsyncSession, db_user: User, admin: AdminDetails):
         old_status = db_user.status
 
-        db_user = await reset_user_data_usage(db=db, db_user=db_user)
+        async with usage_accumulator.lock:
+            pending = usage_accumulator.take_users([db_user.id])
+            db_user = await reset_user_data_usage(db=db, db_user=db_user, pending_usage=pending.get(db_user.id, 0))
         user = await self.update_user(db_user)
 
         if user.status != old_status:
@@ -174,6 +189,7 @@ class UserOperation(BaseOperation):
         db_user = await self.get_validated_user(db, username, admin)
 
         db_user = await revoke_user_sub(db=db, db_user=db_user)
+        subscription_tokens.invalidate(username)
         user = await self.update_user(db_user)
 
         asyncio.create_task(notification.user_subscription_revoked(user, admin))
@@ -185,7 +201,10 @@ class UserOperation(BaseOperation):
     async def reset_users_data_usage(self, db: AsyncSession, admin: AdminDetails):
         """Reset all users data usage"""
         db_admin = await self.get_validated_admin(db, admin.username)
-        await reset_all_users_data_usage(db=db, admin=db_admin)
+        async with usage_accumulator.lock:
+            user_ids = await reset_all_users_data_usage(db=db, admin=db_admin)
+            usage_accumulator.take_users(user_ids)
+        user_review.invalidate()
 
     async def active_next_plan(self, db: AsyncSession, username: str, admin: AdminDetails) -> UserResponse:
         """Reset user by next plan"""
@@ -196,7 +215,9 @@ class UserOperation(BaseOperation):
 
         old_status = db_user.status
 
-        db_user = await reset_user_by_next(db=db, db_user=db_user)
+        async with usage_accumulator.lock:
+            pending = usage_accumulator.take_users([db_user.id])
+            db_user = await reset_user_by_next(db=db, db_user=db_user, pending_usage=pending.get(db_user.id, 0))
 
         user = await self.update_user(db_user)
 
@@ -217,6 +238,8 @@ class UserOperation(BaseOperation):
         db_user = await self.get_validated_user(db, username, admin)
 
         db_user = await set_owner(db, db_user, new_admin)
+        user_admin_index.set(db_user.id, new_admin.id)
+        subscription_cache.invalidate_users([db_user.id])
         user = await self.validate_user(db_user)
         logger.info(f'{user.username}"owner successfully set to{new_admin.username} by admin "{admin.username}"')
 
@@ -381,6 +404,10 @@ class UserOperation(BaseOperation):
             admin_id = None
         users = await get_expired_users(db, expired_after, expired_before, admin_id)
         await remove_users(db, users)
+        usage_accumulator.discard_users([user.id for user in users])
+        subscription_updates.discard_users([user.id for user in users])
+        user_admin_index.remove([user.id for user in users])
+        subscription_cache.invalidate_users([user.id for user in users])
 
         username_list = [row.username for row in users]
         self.remove_users_logger(users=username_list, by=admin.username)
@@ -477,6 +504,7 @@ class UserOperation(BaseOperation):
         users, users_count = await update_users_expire(db, bulk_model)
 
         await node_manager.update_users(users)
+        user_review.invalidate()
 
         if self.operator_type in (OperatorType.API, OperatorType.WEB):
             return {"detail": f"operation has been successfuly done on {users_count} users"}
@@ -486,6 +514,7 @@ class UserOperation(BaseOperation):
         users, users_count = await update_users_datalimit(db, bulk_model)
 
         await node_manager.update_users(users)
+        user_review.invalidate()
 
         if self.operator_type in (OperatorType.API, OperatorType.WEB):
             return {"detail": f"operation has been successfuly done on {users_count} users"}
@@ -495,6 +524,7 @@ class UserOperation(BaseOperation):
         users, users_count = await update_users_proxy_settings(db, bulk_model)
 
         await node_manager.update_users(users)
+        subscription_cache.invalidate_users([user.id for user in users])
 
         if self.operator_type in (OperatorType.API, OperatorType.WEB):
             return {"detail": f"operation has been successfuly done on {users_count} users"}
@@ -503,7 +533,9 @@ class UserOperation(BaseOperation):
     async def get_user_sub_update_list(
         self, db: AsyncSession, username: str, admin: AdminDetails, offset: int = 0, limit: int = 10
     ) -> UserSubscriptionUpdateList:
-        db_user = await self.get_validated_user(db, username, admin)
-        user_sub_data, count = await get_user_sub_update_list(db, user_id=db_user.id, offset=offset, limit=limit)
+        user_id = (await self.get_validated_user(db, username, admin)).id
+        # queued fetches have to be in the database to be listed
+        await subscription_updates.flush(db)
+        user_sub_data, count = await get_user_sub_update_list(db, user_id=user_id, offset=offset, limit=limit)
 
         return UserSubscriptionUpdateList(updates=user_sub_data, count=count)
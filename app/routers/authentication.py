@@ -8,6 +8,7 @@ from app.db import AsyncSession, get_db
 from app.db.crud.admin import get_admin as get_admin_by_username, get_admin_by_telegram_id
 from app.models.admin import AdminDetails, AdminInDB, AdminValidationResult
 from app.models.settings import Telegram
+from app.operation.admin import admin_cache
 from app.settings import telegram_settings
 from app.utils.jwt import get_admin_payload
 from config import DEBUG, SUDOERS
@@ -20,15 +21,23 @@ async def get_admin(db: AsyncSession, token: str) -> AdminDetails | None:
     if not payload:
         return
 
-    db_admin = await get_admin_by_username(db, payload["username"])
-    if db_admin:
-        if db_admin.password_reset_at:
+    username = payload["username"]
+    if cached := admin_cache.get(username):
+        admin, password_reset_at = cached
+    elif db_admin := await get_admin_by_username(db, username):
+        admin, password_reset_at = AdminDetails.model_validate(db_admin), db_admin.password_reset_at
+        admin_cache.set(username, (admin, password_reset_at), group=username)
+    else:
+        admin = None
+
+    if admin:
+        if password_reset_at:
             if not payload.get("created_at"):
                 return
-            if db_admin.password_reset_at.astimezone(tz.utc) > payload.get("created_at"):
+            if password_reset_at.astimezone(tz.utc) > payload.get("created_at"):
                 return
 
-        return AdminDetails.model_validate(db_admin)
+        return admin.model_copy()
 
     elif payload["username"] in SUDOERS and payload["is_sudo"] is True:
         return AdminDetails(username=payload["username"], is_sudo=True)
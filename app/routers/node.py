@@ -8,7 +8,15 @@ from sse_starlette.sse import EventSourceResponse
 from app.db import AsyncSession, get_db
 from app.models.admin import AdminDetails
 from app.models.node import NodeCreate, NodeModify, NodeResponse, NodeSettings, UsageTable
-from app.models.stats import NodeRealtimeStats, NodeStatsList, NodeUsageStatsList, Period
+from app.models.stats import (
+    NodeRealtimeStats,
+    NodeStatsList,
+    NodeUsageCollectionStats,
+    NodeUsageStatsList,
+    NodeReconnectStats,
+    NodeUserChangesStats,
+    Period,
+)
 from app.operation import OperatorType
 from app.operation.node import NodeOperation
 from app.utils import responses
@@ -162,6 +170,24 @@ async def realtime_nodes_stats(_: AdminDetails = Depends(check_sudo_admin)):
     return await node_operator.get_nodes_system_stats()
 
 
+@router.get("s/usage_collection", response_model=dict[int, NodeUsageCollectionStats])
+async def nodes_usage_collection(_: AdminDetails = Depends(check_sudo_admin)):
+    """Retrieve the latency of the latest user usage collection of each node."""
+    return await node_operator.get_usage_collection_stats()
+
+
+@router.get("s/user_changes", response_model=dict[int, NodeUserChangesStats])
+async def nodes_user_changes(_: AdminDetails = Depends(check_sudo_admin)):
+    """Retrieve the user changes waiting to be pushed to each node."""
+    return await node_operator.get_user_changes_stats()
+
+
+@router.get("s/reconnects", response_model=NodeReconnectStats)
+async def nodes_reconnects(_: AdminDetails = Depends(check_sudo_admin)):
+    """Retrieve the progress of the node (re)connection scheduler."""
+    return await node_operator.get_reconnect_stats()
+
+
 @router.get("/{node_id}/online_stats/{username}", response_model=dict[int, int])
 async def user_online_stats(
     node_id: int, username: str, db: AsyncSession = Depends(get_db), _: AdminDetails = Depends(check_sudo_admin)
@@ -1,7 +1,7 @@
 from fastapi import APIRouter, Depends
 
 from app.db import AsyncSession, get_db
-from app.models.settings import General, SettingsSchema
+from app.models.settings import General, SettingsSchema, SubRulesStats
 from app.operation import OperatorType
 from app.operation.settings import SettingsOperation
 from app.utils import responses
@@ -22,6 +22,11 @@ async def get_general_settings(db: AsyncSession = Depends(get_db), _=Depends(get
     return await settings_operator.get_general_settings(db)
 
 
+@router.get("/subscription/rules/stats", response_model=SubRulesStats)
+async def get_subscription_rules_stats(_=Depends(check_sudo_admin)):
+    return await settings_operator.get_subscription_rules_stats()
+
+
 @router.put("", response_model=SettingsSchema)
 async def modify_settings(modify: SettingsSchema, db: AsyncSession = Depends(get_db), _=Depends(check_sudo_admin)):
     return await settings_operator.modify_settings(db, modify)
@@ -29,6 +29,8 @@ async def user_subscription(
         accept_header=request.headers.get("Accept", ""),
         user_agent=user_agent,
         request_url=str(request.url),
+        if_none_match=request.headers.get("If-None-Match", ""),
+        accept_encoding=request.headers.get("Accept-Encoding", ""),
     )
 
 
@@ -59,5 +61,10 @@ async def user_subscription_with_client_type(
 ):
     """Provides a subscription link based on the specified client type (e.g., Clash, V2Ray)."""
     return await subscription_operator.user_subscription_with_client_type(
-        db, token=token, client_type=client_type, request_url=str(request.url)
+        db,
+        token=token,
+        client_type=client_type,
+        request_url=str(request.url),
+        if_none_match=request.headers.get("If-None-Match", ""),
+        accept_encoding=request.headers.get("Accept-Encoding", ""),
     )
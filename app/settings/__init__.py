@@ -3,6 +3,7 @@ from aiocache import cached
 from app.db import GetDB
 from app.db.crud.settings import get_settings
 from app.models import settings
+from app.subscription.client_rules import client_rules
 
 
 @cached()
@@ -66,3 +67,4 @@ async def refresh_caches():
     await notification_settings.cache.clear()
     await notification_enable.cache.clear()
     await subscription_settings.cache.clear()
+    client_rules.clear()
@@ -1,26 +1,25 @@
 import json
 
-from app.templates import render_template
+from app.templates import template_artifact
 from config import GRPC_USER_AGENT_TEMPLATE, USER_AGENT_TEMPLATE
 
 
+def parse_user_agent_list(rendered: str) -> tuple[str, ...]:
+    user_agent_data = json.loads(rendered)
+    if "list" in user_agent_data and isinstance(user_agent_data["list"], list):
+        return tuple(user_agent_data["list"])
+    return ()
+
+
 class BaseSubscription:
     def __init__(self):
         self.proxy_remarks = []
-        user_agent_data = json.loads(render_template(USER_AGENT_TEMPLATE))
-        if "list" in user_agent_data and isinstance(user_agent_data["list"], list):
-            self.user_agent_list = user_agent_data["list"]
-        else:
-            self.user_agent_list = []
-
-        grpc_user_agent_data = json.loads(render_template(GRPC_USER_AGENT_TEMPLATE))
-
-        if "list" in grpc_user_agent_data and isinstance(grpc_user_agent_data["list"], list):
-            self.grpc_user_agent_data = grpc_user_agent_data["list"]
-        else:
-            self.grpc_user_agent_data = []
+        self.user_agent_list = template_artifact(USER_AGENT_TEMPLATE, parse_user_agent_list)
+        self.grpc_user_agent_data = template_artifact(GRPC_USER_AGENT_TEMPLATE, parse_user_agent_list)
 
-        del user_agent_data, grpc_user_agent_data
+    def render_chunks(self, reverse=False):
+        """The rendered config in chunks, formats that can't render incrementally give a single one."""
+        yield self.render(reverse=reverse)
 
     def _remark_validation(self, remark):
         if remark not in self.proxy_remarks:
@@ -0,0 +1,146 @@
+import hashlib
+import time
+from collections import OrderedDict
+
+from app.subscription.streaming import compress
+from config import SUBSCRIPTION_CACHE_MAX_BYTES, SUBSCRIPTION_CACHE_SIZE, SUBSCRIPTION_CACHE_TTL
+
+
+class CachedSubscription:
+    __slots__ = ("config", "media_type", "etag", "created_at", "bodies", "size", "_cache", "_key")
+
+    def __init__(
+        self,
+        config: str,
+        media_type: str,
+        etag: str,
+        created_at: float,
+        cache: "SubscriptionCache | None" = None,
+        key: tuple | None = None,
+    ):
+        self.config = config
+        self.media_type = media_type
+        self.etag = etag
+        self.created_at = created_at
+        # content-encoding -> compressed config, compressed once per entry
+        self.bodies: dict[str, bytes] = {}
+        # approximate memory held by the entry, the config plus its compressed bodies
+        self.size = len(config)
+        self._cache = cache
+        self._key = key
+
+    def body(self, encoding: str = "identity") -> bytes:
+        if encoding == "identity":
+            return self.config.encode()
+        if (body := self.bodies.get(encoding)) is None:
+            body = self.bodies[encoding] = compress(self.config.encode(), encoding)
+            self.size += len(body)
+            if self._cache is not None:
+                self._cache.grown(self._key, self, len(body))
+        return body
+
+    def encoded_etag(self, encoding: str = "identity") -> str:
+        """Each content-encoding is a different representation and gets its own etag."""
+        return self.etag if encoding == "identity" else f'{self.etag[:-1]}-{encoding}"'
+
+
+def make_etag(config: str) -> str:
+    return f'"{hashlib.blake2b(config.encode(), digest_size=16).hexdigest()}"'
+
+
+def etag_matches(etag: str, if_none_match: str) -> bool:
+    if not if_none_match:
+        return False
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*" or candidate.removeprefix("W/") == etag:
+            return True
+    return False
+
+
+class SubscriptionCache:
+    """
+    LRU of rendered subscriptions, bounded by the number of entries and by the bytes they hold.
+
+    Keys start with the user id, the rest of the key is built by the caller from everything the rendered
+    config depends on, so stale entries are never hit and only wait to be evicted. Entries also expire after
+    ``ttl`` seconds because time based format variables (days/time left) are rendered into the config.
+    The compressed bodies added to an entry after it is cached count towards ``maxbytes`` too.
+    """
+
+    def __init__(
+        self,
+        maxsize: int = SUBSCRIPTION_CACHE_SIZE,
+        ttl: int = SUBSCRIPTION_CACHE_TTL,
+        maxbytes: int = SUBSCRIPTION_CACHE_MAX_BYTES,
+    ):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.maxbytes = maxbytes
+        self.size = 0
+        self._entries: OrderedDict[tuple, CachedSubscription] = OrderedDict()
+        self._user_keys: dict[int, set[tuple]] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: tuple) -> CachedSubscription | None:
+        entry = self._entries.get(key)
+        if entry is None or time.monotonic() - entry.created_at > self.ttl:
+            if entry is not None:
+                self._pop(key)
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry
+
+    def set(self, key: tuple, config: str, media_type: str) -> CachedSubscription:
+        if self.maxsize <= 0:
+            return CachedSubscription(config, media_type, make_etag(config), time.monotonic())
+
+        entry = CachedSubscription(config, media_type, make_etag(config), time.monotonic(), self, key)
+        self._pop(key)
+        self._entries[key] = entry
+        self.size += entry.size
+        self._user_keys.setdefault(key[0], set()).add(key)
+        while len(self._entries) > self.maxsize:
+            self._pop(next(iter(self._entries)))
+        self._evict()
+        return entry
+
+    def grown(self, key: tuple, entry: CachedSubscription, size: int) -> None:
+        """Counts a body added to a cached entry, entries already evicted or replaced are not counted."""
+        if self._entries.get(key) is entry:
+            self.size += size
+            self._evict()
+
+    def invalidate_users(self, user_ids) -> None:
+        for user_id in user_ids:
+            for key in self._user_keys.pop(user_id, ()):
+                if (entry := self._entries.pop(key, None)) is not None:
+                    self.size -= entry.size
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._user_keys.clear()
+        self.size = 0
+
+    def _evict(self) -> None:
+        while self.size > self.maxbytes and self._entries:
+            self._pop(next(iter(self._entries)))
+
+    def _pop(self, key: tuple) -> None:
+        if (entry := self._entries.pop(key, None)) is not None:
+            self.size -= entry.size
+        keys = self._user_keys.get(key[0])
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._user_keys[key[0]]
+
+
+subscription_cache = SubscriptionCache()
@@ -1,10 +1,11 @@
+import re
 from random import choice
 from uuid import UUID
 
 import yaml
 
 from app.subscription.funcs import detect_shadowsocks_2022, get_grpc_gun
-from app.templates import render_template
+from app.templates import render_template, template_artifact
 from app.utils.helpers import yml_uuid_representer
 from config import (
     CLASH_SUBSCRIPTION_TEMPLATE,
@@ -12,6 +13,134 @@ from config import (
 
 from . import BaseSubscription
 
+try:
+    from yaml import CSafeDumper as FastDumper, CSafeLoader as FastLoader
+except ImportError:  # PyYAML built without libyaml
+    from yaml import SafeDumper as FastDumper, SafeLoader as FastLoader
+
+# used by the template's yaml filter
+yaml.add_representer(UUID, yml_uuid_representer)
+
+SLOT_MARKER = "__pasarguard_slot_"
+PROXIES_SLOT = [{"name": f"{SLOT_MARKER}proxy_{i}__"} for i in range(2)]
+REMARKS_SLOT = [f"{SLOT_MARKER}remark_{i}__" for i in range(2)]
+# longer placeholders, a template that renders differently with them depends on the number of proxies
+PROXIES_PROBE = [{"name": f"{SLOT_MARKER}proxy_{i}__"} for i in range(100)]
+REMARKS_PROBE = [f"{SLOT_MARKER}remark_{i}__" for i in range(100)]
+
+
+def _plain(obj, memo: dict):
+    """
+    Returns ``obj`` as the yaml filter dump and a safe load would: mapping keys sorted, UUIDs as strings and
+    objects that appear more than once still shared, so they get the same anchors.
+    """
+    if isinstance(obj, dict):
+        if id(obj) not in memo:
+            memo[id(obj)] = {key: _plain(obj[key], memo) for key in sorted(obj)}
+        return memo[id(obj)]
+    if isinstance(obj, list):
+        if id(obj) not in memo:
+            memo[id(obj)] = [_plain(item, memo) for item in obj]
+        return memo[id(obj)]
+    if isinstance(obj, UUID):
+        return str(obj)
+    return obj
+
+
+# characters libyaml escapes while the python emitter writes them as they are, emojis among them
+LIBYAML_ESCAPED = re.compile("[\r\x85\U00010000-\U0010ffff]")
+
+
+def _dumper(document) -> type[yaml.SafeDumper]:
+    """The libyaml dumper, unless its output would differ from the python one."""
+    stack = [document]
+    while stack:
+        obj = stack.pop()
+        if isinstance(obj, dict):
+            stack.extend(obj.keys())
+            stack.extend(obj.values())
+        elif isinstance(obj, list):
+            stack.extend(obj)
+        elif isinstance(obj, str) and not obj.isascii() and LIBYAML_ESCAPED.search(obj):
+            return yaml.SafeDumper
+    return FastDumper
+
+
+def _probe_slots(obj):
+    """``obj`` with the probe placeholder lists replaced by the regular ones."""
+    if isinstance(obj, dict):
+        return {key: _probe_slots(value) for key, value in obj.items()}
+    if isinstance(obj, list):
+        if obj == PROXIES_PROBE:
+            return PROXIES_SLOT
+        if obj == REMARKS_PROBE:
+            return REMARKS_SLOT
+        return [_probe_slots(item) for item in obj]
+    return obj
+
+
+def _has_marker(obj) -> bool:
+    if isinstance(obj, dict):
+        return any(_has_marker(key) or _has_marker(value) for key, value in obj.items())
+    if isinstance(obj, list):
+        if obj == PROXIES_SLOT or obj == REMARKS_SLOT:
+            return False
+        return any(_has_marker(item) for item in obj)
+    return isinstance(obj, str) and SLOT_MARKER in obj
+
+
+class ClashTemplate:
+    """
+    The clash template rendered and parsed once, with placeholder lists in place of the proxies and remarks.
+
+    Rendering a subscription puts the real lists in the placeholders' place, instead of rendering the
+    template and parsing the generated yaml again for every user. ``document`` is None for templates that use
+    the proxies or remarks for more than dumping them whole, those keep the full render. Such use is caught
+    when a placeholder ends up outside its list, or once ``verify`` finds the template renders differently
+    with longer placeholder lists (e.g. ``conf.proxies|length``).
+    """
+
+    __slots__ = ("document", "verified")
+
+    context = {"conf": {"proxies": PROXIES_SLOT, "proxy-groups": [], "rules": []}, "proxy_remarks": REMARKS_SLOT}
+    probe_context = {
+        "conf": {"proxies": PROXIES_PROBE, "proxy-groups": [], "rules": []},
+        "proxy_remarks": REMARKS_PROBE,
+    }
+
+    def __init__(self, rendered: str):
+        document = yaml.load(rendered, Loader=FastLoader)
+        self.document = None if _has_marker(document) else document
+        self.verified = self.document is None
+
+    def verify(self, probe_rendered: str) -> None:
+        """Drops the document unless the template rendered with ``probe_context`` only differs in the slots."""
+        if _probe_slots(yaml.load(probe_rendered, Loader=FastLoader)) != self.document:
+            self.document = None
+        self.verified = True
+
+    def fill(self, proxies: list, remarks: list):
+        memo = {}
+
+        def fill(node):
+            if id(node) in memo:
+                return memo[id(node)]
+            if isinstance(node, dict):
+                result = {key: fill(value) for key, value in node.items()}
+            elif isinstance(node, list):
+                # every dump in the template is loaded apart, so each placeholder gets its own copy
+                if node == PROXIES_SLOT:
+                    return _plain(proxies, {})
+                if node == REMARKS_SLOT:
+                    return _plain(remarks, {})
+                result = [fill(item) for item in node]
+            else:
+                return node
+            memo[id(node)] = result
+            return result
+
+        return fill(self.document)
+
 
 class ClashConfiguration(BaseSubscription):
     def __init__(self):
@@ -27,15 +156,24 @@ class ClashConfiguration(BaseSubscription):
         if reverse:
             self.data["proxies"].reverse()
 
-        yaml.add_representer(UUID, yml_uuid_representer)
-        return yaml.dump(
-            yaml.load(
+        template = template_artifact(CLASH_SUBSCRIPTION_TEMPLATE, ClashTemplate, ClashTemplate.context)
+        if not template.verified:
+            template.verify(render_template(CLASH_SUBSCRIPTION_TEMPLATE, ClashTemplate.probe_context))
+        # the yaml filter renders empty lists as nothing, leave those to the template
+        if (
+            template.document is not None
+            and self.data["proxies"]
+            and self.proxy_remarks
+            and not self.data["proxy-groups"]
+            and not self.data["rules"]
+        ):
+            document = template.fill(self.data["proxies"], self.proxy_remarks)
+        else:
+            document = yaml.load(
                 render_template(CLASH_SUBSCRIPTION_TEMPLATE, {"conf": self.data, "proxy_remarks": self.proxy_remarks}),
-                Loader=yaml.SafeLoader,
-            ),
-            sort_keys=False,
-            allow_unicode=True,
-        )
+                Loader=FastLoader,
+            )
+        return yaml.dump(document, Dumper=_dumper(document), sort_keys=False, allow_unicode=True)
 
     def __str__(self) -> str:
         return self.render()
@@ -0,0 +1,102 @@
+import re
+from collections import OrderedDict
+
+from app.models.settings import SubRule
+from app.utils.logger import get_logger
+from config import SUBSCRIPTION_USER_AGENT_CACHE_SIZE
+
+logger = get_logger("subscription")
+
+# numbered groups shift once the patterns are joined, these patterns are matched one by one
+BACKREFERENCE = re.compile(r"\\[1-9]|\(\?P=")
+_MISSING = object()
+
+
+class ClientRuleMatcher:
+    """
+    Picks the subscription client rule for a user agent, the first rule whose pattern matches from the start
+    of the user agent wins.
+
+    The rules are compiled into a single alternation, one named group per rule, so a user agent is matched
+    in one pass. Patterns that can not be joined (backreferences, global inline flags, clashing group names)
+    make it fall back to one compiled pattern per rule. The results are kept in a bounded LRU since clients
+    send a handful of distinct user agents, and every rule counts its hits for operators.
+    """
+
+    def __init__(self, maxsize: int = SUBSCRIPTION_USER_AGENT_CACHE_SIZE):
+        self.maxsize = maxsize
+        self.clear()
+
+    def clear(self) -> None:
+        """Forgets the compiled rules, the cached user agents and the counters."""
+        self._rules: list[SubRule] | None = None
+        self._combined: re.Pattern | None = None
+        self._patterns: list[re.Pattern | None] = []
+        self._results: OrderedDict[str, int | None] = OrderedDict()
+        self.hits: list[int] = []
+        self.unmatched = 0
+
+    def compile(self, rules: list[SubRule]) -> None:
+        self.clear()
+        self._rules = rules
+        self.hits = [0] * len(rules)
+        for rule in rules:
+            try:
+                self._patterns.append(re.compile(rule.pattern))
+            except re.error as err:
+                logger.warning(f'Subscription rule "{rule.pattern}" is not a valid pattern and never matches: {err}')
+                self._patterns.append(None)
+
+        valid = [(index, pattern) for index, pattern in enumerate(self._patterns) if pattern is not None]
+        if not any(BACKREFERENCE.search(pattern.pattern) for _, pattern in valid):
+            try:
+                self._combined = re.compile(
+                    "|".join(f"(?P<_rule_{index}>{pattern.pattern})" for index, pattern in valid)
+                )
+            except re.error:
+                self._combined = None
+
+    def _match(self, user_agent: str) -> int | None:
+        if self._combined is not None:
+            if match := self._combined.match(user_agent):
+                # the rule's group encloses any group of the pattern, so it is the last one closed
+                return int(match.lastgroup.removeprefix("_rule_"))
+            return None
+
+        for index, pattern in enumerate(self._patterns):
+            if pattern is not None and pattern.match(user_agent):
+                return index
+        return None
+
+    def match(self, user_agent: str, rules: list[SubRule]) -> SubRule | None:
+        # cached settings hand out the same list until they change
+        if rules is not self._rules:
+            self.compile(rules)
+
+        index = self._results.get(user_agent, _MISSING)
+        if index is _MISSING:
+            index = self._match(user_agent)
+            if self.maxsize > 0:
+                self._results[user_agent] = index
+                if len(self._results) > self.maxsize:
+                    self._results.popitem(last=False)
+        else:
+            self._results.move_to_end(user_agent)
+
+        if index is None:
+            self.unmatched += 1
+            return None
+        self.hits[index] += 1
+        return rules[index]
+
+    def stats(self, rules: list[SubRule]) -> list[tuple[SubRule, int]]:
+        if rules is not self._rules:
+            self.compile(rules)
+        return list(zip(rules, self.hits))
+
+    @property
+    def cached_user_agents(self) -> int:
+        return len(self._results)
+
+
+client_rules = ClientRuleMatcher()
@@ -8,6 +8,7 @@ from urllib.parse import quote
 from uuid import UUID
 
 from app.subscription.funcs import detect_shadowsocks_2022, get_grpc_gun, get_grpc_multi
+from app.subscription.streaming import join_chunks
 from config import EXTERNAL_CONFIG
 
 from . import BaseSubscription
@@ -21,12 +22,15 @@ class StandardLinks(BaseSubscription):
     def add_link(self, link):
         self.links.append(link)
 
-    def render(self, reverse=False):
+    def render_chunks(self, reverse=False):
         if EXTERNAL_CONFIG:
             self.links.append(EXTERNAL_CONFIG)
         if reverse:
             self.links.reverse()
-        return "\n".join((self.links))
+        return join_chunks(self.links, "\n")
+
+    def render(self, reverse=False):
+        return "".join(self.render_chunks(reverse))
 
     def add(self, remark: str, address: str, inbound: dict, settings: dict):
         net = inbound["network"]
@@ -1,10 +1,12 @@
-import json
+from app.utils.serializer import json_dumps
+
 from .funcs import detect_shadowsocks_2022
 
 
 class OutlineConfiguration:
-    def __init__(self):
+    def __init__(self, compact: bool = False):
         self.config = {}
+        self.indent = None if compact else 0
 
     def add_directly(self, data: dict):
         self.config.update(data)
@@ -14,7 +16,7 @@ class OutlineConfiguration:
             items = list(self.config.items())
             items.reverse()
             self.config = dict(items)
-        return json.dumps(self.config, indent=0)
+        return json_dumps(self.config, indent=self.indent)
 
     def make_outbound(self, remark: str, address: str, port: int, password: str, method: str):
         config = {
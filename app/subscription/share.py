@@ -1,17 +1,21 @@
 import base64
+import pickle
 import random
 import secrets
 from collections import defaultdict
 from datetime import datetime as dt, timedelta, timezone
+from typing import Iterator, Mapping, NamedTuple
 
 from jdatetime import date as jd
 
 from app.core.hosts import hosts as hosts_storage
-from app.core.manager import core_manager
+from app.core.manager import core_manager, thaw
 from app.db.models import UserStatus
 from app.models.user import UsersResponseWithInbounds
 from app.settings import subscription_settings
-from app.utils.system import get_public_ip, get_public_ipv6, readable_size
+from app.subscription.streaming import b64encode_chunks
+from app.utils.public_ip import public_ip
+from app.utils.system import readable_size
 
 from . import (
     ClashConfiguration,
@@ -22,9 +26,6 @@ from . import (
     XrayConfiguration,
 )
 
-SERVER_IP = get_public_ip()
-SERVER_IPV6 = get_public_ipv6()
-
 STATUS_EMOJIS = {
     "active": "✅",
     "expired": "⌛️",
@@ -34,25 +35,27 @@ STATUS_EMOJIS = {
 }
 
 
-async def generate_subscription(
-    user: UsersResponseWithInbounds, config_format: str, as_base64: bool, reverse: bool = False
-) -> str:
-    conf = None
+def subscription_config(config_format: str, compact: bool = False):
+    """``compact`` drops the indentation of the json formats."""
     if config_format == "links":
-        conf = StandardLinks()
+        return StandardLinks()
     elif config_format == "clash-meta":
-        conf = ClashMetaConfiguration()
+        return ClashMetaConfiguration()
     elif config_format == "clash":
-        conf = ClashConfiguration()
+        return ClashConfiguration()
     elif config_format == "sing-box":
-        conf = SingBoxConfiguration()
+        return SingBoxConfiguration(compact=compact)
     elif config_format == "outline":
-        conf = OutlineConfiguration()
+        return OutlineConfiguration(compact=compact)
     elif config_format == "xray":
-        conf = XrayConfiguration()
-    else:
-        raise ValueError(f'Unsupported format "{config_format}"')
+        return XrayConfiguration(compact=compact)
+    raise ValueError(f'Unsupported format "{config_format}"')
 
+
+async def generate_subscription(
+    user: UsersResponseWithInbounds, config_format: str, as_base64: bool, reverse: bool = False, compact: bool = False
+) -> str:
+    conf = subscription_config(config_format, compact)
     format_variables = setup_format_variables(user)
 
     config = await process_inbounds_and_tags(user, format_variables, conf, reverse)
@@ -63,6 +66,20 @@ async def generate_subscription(
     return config
 
 
+async def generate_subscription_chunks(
+    user: UsersResponseWithInbounds, config_format: str, as_base64: bool, reverse: bool = False, compact: bool = False
+) -> Iterator[str]:
+    """
+    Same output as ``generate_subscription`` in chunks. The hosts are added right away, the returned iterator
+    serializes them (and base64 encodes them) as it is consumed.
+    """
+    conf = subscription_config(config_format, compact)
+    await add_hosts(user, setup_format_variables(user), conf)
+
+    chunks = conf.render_chunks(reverse=reverse)
+    return b64encode_chunks(chunks) if as_base64 else chunks
+
+
 def format_time_left(seconds_left: int) -> str:
     if not seconds_left or seconds_left <= 0:
         return "∞"
@@ -145,8 +162,8 @@ def setup_format_variables(user: UsersResponseWithInbounds) -> dict:
     format_variables = defaultdict(
         lambda: "<missing>",
         {
-            "SERVER_IP": SERVER_IP,
-            "SERVER_IPV6": SERVER_IPV6,
+            "SERVER_IP": public_ip.ipv4,
+            "SERVER_IPV6": public_ip.ipv6,
             "USERNAME": user.username,
             "DATA_USAGE": readable_size(user.used_traffic),
             "DATA_LIMIT": data_limit,
@@ -164,73 +181,45 @@ def setup_format_variables(user: UsersResponseWithInbounds) -> dict:
     return format_variables
 
 
-async def filter_hosts(hosts: list, user_status: UserStatus) -> list:
-    if not (await subscription_settings()).host_status_filter:
-        return hosts
+class CompiledHost(NamedTuple):
+    """User independent part of a host, merged with its core inbound."""
 
-    return [host for host in hosts if not host["status"] or user_status in host["status"]]
-
-
-async def process_host(
-    host: dict, format_variables: dict, inbounds: list[str], proxies: dict, conf
-) -> tuple[dict, dict, str]:
-    tag = host["inbound_tag"]
+    remark: str
+    inbound_tag: str
+    protocol: str
+    network: str
+    status: list | None
+    flow: tuple | None  # (inbound flow,) when the inbound defines one
+    address: list[str]
+    sni: list[str]
+    host: list[str]
+    sids: list[str]
+    path: str
+    use_sni_as_host: bool
+    inbound: bytes  # pickled merged inbound, loaded once per use as a cheap deep copy
+    overrides: dict  # transport settings that override per request fields
+    download: "CompiledHost | None"
 
-    if tag not in inbounds:
-        return
 
-    host_inbound: dict = await core_manager.get_inbound_by_tag(tag)
-    protocol = host_inbound["protocol"]
+# fields filled in per request, transport settings still have the last word on them
+REQUEST_FIELDS = ("sni", "host", "path", "sid")
 
-    settings = proxies.get(protocol)
-    if not settings:
-        return
+_compiled_hosts: tuple[tuple[int, int], list[CompiledHost]] = ((-1, -1), [])
 
-    if "flow" in host_inbound:
-        if settings["flow"] == "":
-            settings["flow"] = "" if host_inbound["flow"] == "none" else host_inbound["flow"]
-
-    format_variables.update({"PROTOCOL": protocol})
-    format_variables.update({"TRANSPORT": host_inbound["network"]})
-    sni = ""
-    sni_list = host["sni"] or host_inbound["sni"]
-    if sni_list:
-        salt = secrets.token_hex(8)
-        sni = random.choice(sni_list).replace("*", salt)
-
-    req_host = ""
-    req_host_list = host["host"] or host_inbound["host"]
-    if req_host_list:
-        salt = secrets.token_hex(8)
-        req_host = random.choice(req_host_list).replace("*", salt)
-
-    address = ""
-    address_list = host["address"]
-    if host["address"]:
-        salt = secrets.token_hex(8)
-        address = random.choice(address_list).replace("*", salt)
-
-    if sids := host_inbound.get("sids"):
-        host_inbound["sid"] = random.choice(sids)
-
-    if host["path"] is not None:
-        path = host["path"].format_map(format_variables)
-    else:
-        path = host_inbound.get("path", "").format_map(format_variables)
 
-    if host.get("use_sni_as_host", False) and sni:
-        req_host = sni
+def compile_host(host: dict, inbounds_by_tag: Mapping[str, Mapping]) -> CompiledHost | None:
+    inbound = inbounds_by_tag.get(host["inbound_tag"])
+    if inbound is None:
+        return None
 
+    host_inbound = thaw(inbound)
     host_inbound.update(
         {
-            "port": host["port"] or host_inbound["port"],
-            "sni": sni,
-            "host": req_host,
-            "tls": host_inbound["tls"] if host["tls"] is None else host["tls"],
+            "port": host["port"] or inbound["port"],
+            "tls": inbound["tls"] if host["tls"] is None else host["tls"],
             "alpn": host["alpn"] if host["alpn"] else None,
-            "path": path,
-            "fp": host["fingerprint"] or host_inbound.get("fp", ""),
-            "ais": host["allowinsecure"] or host_inbound.get("allowinsecure", ""),
+            "fp": host["fingerprint"] or inbound.get("fp", ""),
+            "ais": host["allowinsecure"] or inbound.get("allowinsecure", ""),
             "fragment_settings": host["fragment_settings"],
             "noise_settings": host["noise_settings"],
             "random_user_agent": host["random_user_agent"],
@@ -239,15 +228,98 @@ async def process_host(
             "ech_config_list": host["ech_config_list"],
         },
     )
+    overrides = {}
     if ts := host["transport_settings"]:
         for v in ts.values():
             if v:
+                v = dict(v)
                 if "type" in v:
                     v["header_type"] = v["type"]
                 host_inbound.update(v)
+                overrides.update({key: v[key] for key in REQUEST_FIELDS if key in v})
 
+    download = None
     if host.get("downloadSettings"):
-        ds_data = await process_host(host["downloadSettings"], format_variables, inbounds, proxies, conf)
+        download = compile_host(host["downloadSettings"], inbounds_by_tag)
+
+    return CompiledHost(
+        remark=host["remark"],
+        inbound_tag=host["inbound_tag"],
+        protocol=inbound["protocol"],
+        network=inbound["network"],
+        status=host["status"],
+        flow=(inbound["flow"],) if "flow" in inbound else None,
+        address=host["address"],
+        sni=host["sni"] or thaw(inbound["sni"]),
+        host=host["host"] or thaw(inbound["host"]),
+        sids=thaw(inbound.get("sids")) or [],
+        path=host["path"] if host["path"] is not None else inbound.get("path", ""),
+        use_sni_as_host=host.get("use_sni_as_host", False),
+        inbound=pickle.dumps(host_inbound, protocol=pickle.HIGHEST_PROTOCOL),
+        overrides=overrides,
+        download=download,
+    )
+
+
+async def get_compiled_hosts() -> list[CompiledHost]:
+    """Compiled hosts, rebuilt on first use after the hosts storage or the cores change."""
+    global _compiled_hosts
+    version = (hosts_storage.version, core_manager.version)
+    if _compiled_hosts[0] != version:
+        inbounds_by_tag = await core_manager.get_inbounds_by_tag()
+        compiled = [compile_host(host, inbounds_by_tag) for host in hosts_storage.values()]
+        _compiled_hosts = (version, [host for host in compiled if host is not None])
+    return _compiled_hosts[1]
+
+
+async def filter_hosts(hosts: list[CompiledHost], user_status: UserStatus) -> list[CompiledHost]:
+    if not (await subscription_settings()).host_status_filter:
+        return hosts
+
+    return [host for host in hosts if not host.status or user_status in host.status]
+
+
+def _random_choice(values: list[str]) -> str:
+    if not values:
+        return ""
+    value = random.choice(values)
+    if "*" in value:
+        value = value.replace("*", secrets.token_hex(8))
+    return value
+
+
+def process_host(
+    host: CompiledHost, format_variables: dict, inbounds: list[str], proxies: dict, conf
+) -> tuple[dict, dict, str]:
+    if host.inbound_tag not in inbounds:
+        return
+
+    settings = proxies.get(host.protocol)
+    if not settings:
+        return
+
+    if host.flow is not None:
+        if settings["flow"] == "":
+            settings["flow"] = "" if host.flow[0] == "none" else host.flow[0]
+
+    format_variables.update({"PROTOCOL": host.protocol})
+    format_variables.update({"TRANSPORT": host.network})
+    sni = _random_choice(host.sni)
+    req_host = _random_choice(host.host)
+    address = _random_choice(host.address)
+
+    host_inbound: dict = pickle.loads(host.inbound)
+    if host.sids:
+        host_inbound["sid"] = random.choice(host.sids)
+
+    if host.use_sni_as_host and sni:
+        req_host = sni
+
+    host_inbound.update({"sni": sni, "host": req_host, "path": host.path.format_map(format_variables)})
+    host_inbound.update(host.overrides)
+
+    if host.download:
+        ds_data = process_host(host.download, format_variables, inbounds, proxies, conf)
         if ds_data and ds_data[0]:
             ds_data[0]["address"] = ds_data[2].format_map(format_variables)
             if isinstance(conf, StandardLinks):
@@ -270,23 +342,35 @@ async def process_inbounds_and_tags(
     | OutlineConfiguration,
     reverse=False,
 ) -> list | str:
+    await add_hosts(user, format_variables, conf)
+    return conf.render(reverse=reverse)
+
+
+async def add_hosts(
+    user: UsersResponseWithInbounds,
+    format_variables: dict,
+    conf: StandardLinks
+    | XrayConfiguration
+    | SingBoxConfiguration
+    | ClashConfiguration
+    | ClashMetaConfiguration
+    | OutlineConfiguration,
+) -> None:
     proxy_settings = user.proxy_settings.dict()
-    for host in await filter_hosts(hosts_storage.values(), user.status):
-        host_data = await process_host(host, format_variables, user.inbounds, proxy_settings, conf)
+    for host in await filter_hosts(await get_compiled_hosts(), user.status):
+        host_data = process_host(host, format_variables, user.inbounds, proxy_settings, conf)
         if not host_data:
             continue
         host_inbound, settings, address = host_data
 
         if host_inbound:
             conf.add(
-                remark=host["remark"].format_map(format_variables),
+                remark=host.remark.format_map(format_variables),
                 address=address.format_map(format_variables),
                 inbound=host_inbound,
                 settings=settings,
             )
 
-    return conf.render(reverse=reverse)
-
 
 def encode_title(text: str) -> str:
     return f"base64:{base64.b64encode(text.encode()).decode()}"
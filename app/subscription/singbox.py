@@ -1,23 +1,23 @@
-import json
 from random import choice
 
 from app.subscription.funcs import detect_shadowsocks_2022, get_grpc_gun
-from app.templates import render_template
-from app.utils.helpers import UUIDEncoder
+from app.templates import render_json_template
+from app.utils.serializer import json_chunks
 from config import SINGBOX_SUBSCRIPTION_TEMPLATE
 
 from . import BaseSubscription
 
 
 class SingBoxConfiguration(BaseSubscription):
-    def __init__(self):
+    def __init__(self, compact: bool = False):
         super().__init__()
-        self.config = json.loads(render_template(SINGBOX_SUBSCRIPTION_TEMPLATE))
+        self.indent = None if compact else 4
+        self.config = render_json_template(SINGBOX_SUBSCRIPTION_TEMPLATE)
 
     def add_outbound(self, outbound_data):
         self.config["outbounds"].append(outbound_data)
 
-    def render(self, reverse=False):
+    def render_chunks(self, reverse=False):
         urltest_types = ["vmess", "vless", "trojan", "shadowsocks", "hysteria2", "tuic", "http", "ssh"]
         urltest_tags = [outbound["tag"] for outbound in self.config["outbounds"] if outbound["type"] in urltest_types]
         selector_types = ["vmess", "vless", "trojan", "shadowsocks", "hysteria2", "tuic", "http", "ssh", "urltest"]
@@ -33,7 +33,10 @@ class SingBoxConfiguration(BaseSubscription):
 
         if reverse:
             self.config["outbounds"].reverse()
-        return json.dumps(self.config, indent=4, cls=UUIDEncoder)
+        return json_chunks(self.config, indent=self.indent)
+
+    def render(self, reverse=False):
+        return "".join(self.render_chunks(reverse))
 
     def tls_config(
         self, sni=None, fp=None, tls=None, pbk=None, sid=None, alpn=None, ais=None, fragment=None, ech_config_list=None
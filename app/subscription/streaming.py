@@ -0,0 +1,94 @@
+"""Chunked rendering helpers and content-encoding of subscription responses."""
+
+import base64
+import zlib
+from typing import Iterable, Iterator
+
+try:
+    import brotli
+except ImportError:  # optional, only gzip is offered without it
+    brotli = None
+
+CHUNK_SIZE = 16384
+# smaller bodies are sent as is, compression would barely shrink them
+MIN_COMPRESS_SIZE = 512
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+
+
+def join_chunks(items: Iterable[str], separator: str, chunk_size: int = CHUNK_SIZE) -> Iterator[str]:
+    """Yields ``separator.join(items)`` in chunks of about ``chunk_size`` characters."""
+    buffer, size, first = [], 0, True
+    for item in items:
+        if not first:
+            buffer.append(separator)
+        buffer.append(item)
+        first = False
+        size += len(item) + len(separator)
+        if size >= chunk_size:
+            yield "".join(buffer)
+            buffer, size = [], 0
+    if buffer:
+        yield "".join(buffer)
+
+
+def b64encode_chunks(chunks: Iterable[str]) -> Iterator[str]:
+    """Base64 of the concatenated chunks, only whole 3 byte groups are encoded until the last chunk."""
+    rest = b""
+    for chunk in chunks:
+        data = rest + chunk.encode()
+        cut = len(data) - len(data) % 3
+        rest = data[cut:]
+        if cut:
+            yield base64.b64encode(data[:cut]).decode()
+    if rest:
+        yield base64.b64encode(rest).decode()
+
+
+def supported_encodings() -> tuple[str, ...]:
+    return ("br", "gzip") if brotli is not None else ("gzip",)
+
+
+def negotiate_encoding(accept_encoding: str) -> str:
+    """Picks the content-encoding for an Accept-Encoding header, brotli is preferred on equal weights."""
+    weights = {}
+    for part in accept_encoding.lower().split(","):
+        coding, _, params = part.strip().partition(";")
+        weight = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                weight = float(params[2:])
+            except ValueError:
+                continue
+        weights[coding.strip()] = weight
+
+    best, best_weight = "identity", 0.0
+    for coding in supported_encodings():
+        weight = weights.get(coding, weights.get("*", 0.0))
+        if weight > best_weight:
+            best, best_weight = coding, weight
+    return best
+
+
+def compress_chunks(chunks: Iterable[str | bytes], encoding: str) -> Iterator[bytes]:
+    """Encodes the chunks as they come, peak memory is bound by the compressor window."""
+    if encoding == "br":
+        compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+        compress, finish = compressor.process, compressor.finish
+    elif encoding == "gzip":
+        compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)
+        compress, finish = compressor.compress, compressor.flush
+    else:
+        for chunk in chunks:
+            yield chunk.encode() if isinstance(chunk, str) else chunk
+        return
+
+    for chunk in chunks:
+        if data := compress(chunk.encode() if isinstance(chunk, str) else chunk):
+            yield data
+    yield finish()
+
+
+def compress(data: bytes, encoding: str) -> bytes:
+    return b"".join(compress_chunks((data,), encoding))
@@ -0,0 +1,113 @@
+import asyncio
+from collections import OrderedDict
+from datetime import datetime as dt, timezone as tz
+
+from sqlalchemy.exc import IntegrityError
+
+from app.db import AsyncSession, GetDB
+from app.db.crud.user import add_user_sub_updates, get_existing_user_ids, trim_user_sub_updates
+from app.utils.logger import get_logger
+from config import SUBSCRIPTION_UPDATES_QUEUE_SIZE, USER_SUBSCRIPTION_CLIENTS_LIMIT
+
+logger = get_logger("subscription")
+
+USER_AGENT_MAX_LENGTH = 512
+
+
+class SubscriptionUpdateQueue:
+    """
+    Write-behind queue for subscription fetches.
+
+    Requests only record (user, user agent) in memory, repeated fetches of the same pair are coalesced into
+    the latest one until the next flush writes the whole queue in a single bulk insert. The queue is bounded,
+    when it is full the oldest entries are dropped. The per user cap of USER_SUBSCRIPTION_CLIENTS_LIMIT is
+    applied to the batch and to the stored rows of the flushed users.
+    """
+
+    def __init__(self, maxsize: int = SUBSCRIPTION_UPDATES_QUEUE_SIZE, limit: int = USER_SUBSCRIPTION_CLIENTS_LIMIT):
+        self.maxsize = maxsize
+        self.limit = limit
+        self._pending: OrderedDict[tuple[int, str], dt] = OrderedDict()
+        self._lock = asyncio.Lock()
+        self.recorded = 0
+        self.coalesced = 0
+        self.dropped = 0
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    def record(self, user_id: int, user_agent: str) -> None:
+        key = (user_id, user_agent[:USER_AGENT_MAX_LENGTH])
+        self.recorded += 1
+        if key in self._pending:
+            self.coalesced += 1
+            self._pending.move_to_end(key)
+        elif len(self._pending) >= self.maxsize:
+            self._pending.popitem(last=False)
+            self.dropped += 1
+        self._pending[key] = dt.now(tz.utc)
+
+    def discard_users(self, user_ids: list[int]) -> None:
+        """Drop entries of removed users so the flush doesn't insert rows for them."""
+        user_ids = set(user_ids)
+        for key in [key for key in self._pending if key[0] in user_ids]:
+            del self._pending[key]
+
+    def _batch(self, pending: OrderedDict[tuple[int, str], dt]) -> list[dict]:
+        """Rows to insert, only the newest `limit` user agents of each user are kept."""
+        rows, per_user = [], {}
+        # newest first, the queue is ordered by the last fetch
+        for (user_id, user_agent), created_at in reversed(pending.items()):
+            if self.limit > 0:
+                if per_user.get(user_id, 0) >= self.limit:
+                    continue
+                per_user[user_id] = per_user.get(user_id, 0) + 1
+            rows.append({"user_id": user_id, "user_agent": user_agent, "created_at": created_at})
+        rows.reverse()
+        return rows
+
+    async def _write(self, db: AsyncSession, rows: list[dict]) -> None:
+        try:
+            await add_user_sub_updates(db, rows)
+        except IntegrityError:
+            # users removed while their fetch was queued
+            await db.rollback()
+            existing = await get_existing_user_ids(db, list({row["user_id"] for row in rows}))
+            rows = [row for row in rows if row["user_id"] in existing]
+            if rows:
+                await add_user_sub_updates(db, rows)
+
+        if self.limit > 0 and rows:
+            await trim_user_sub_updates(db, list({row["user_id"] for row in rows}), self.limit)
+        await db.commit()
+
+    async def flush(self, db: AsyncSession | None = None) -> None:
+        """
+        Write the queue to the database, on failure the entries go back to the queue for the next flush.
+        Uses and commits ``db`` when given, a new session otherwise.
+        """
+        if db is None:
+            async with GetDB() as db:
+                return await self.flush(db)
+
+        async with self._lock:
+            if not self._pending:
+                return
+
+            pending, self._pending = self._pending, OrderedDict()
+            try:
+                await self._write(db, self._batch(pending))
+            except Exception as e:
+                await db.rollback()
+                logger.error(f"Failed to flush subscription updates, will retry on next flush, error: {e}")
+                # newer fetches recorded during the flush win
+                for key, created_at in self._pending.items():
+                    pending[key] = created_at
+                    pending.move_to_end(key)
+                self._pending = pending
+                while len(self._pending) > self.maxsize:
+                    self._pending.popitem(last=False)
+                    self.dropped += 1
+
+
+subscription_updates = SubscriptionUpdateQueue()
@@ -1,32 +1,35 @@
-import json
 from enum import Enum
 from random import choice
 from typing import Union
 
 from app.subscription.funcs import detect_shadowsocks_2022, get_grpc_gun, get_grpc_multi
-from app.templates import render_template
-from app.utils.helpers import UUIDEncoder
+from app.templates import JsonTemplate, template_artifact
+from app.utils.serializer import json_chunks
 from config import XRAY_SUBSCRIPTION_TEMPLATE
 
 from . import BaseSubscription
 
 
 class XrayConfiguration(BaseSubscription):
-    def __init__(self):
+    def __init__(self, compact: bool = False):
         super().__init__()
+        self.indent = None if compact else 4
         self.config = []
-        self.template = render_template(XRAY_SUBSCRIPTION_TEMPLATE)
+        self.template = template_artifact(XRAY_SUBSCRIPTION_TEMPLATE, JsonTemplate)
 
     def add_config(self, remarks, outbounds):
-        json_template = json.loads(self.template)
+        json_template = self.template.copy()
         json_template["remarks"] = remarks
         json_template["outbounds"] = outbounds + json_template["outbounds"]
         self.config.append(json_template)
 
-    def render(self, reverse=False):
+    def render_chunks(self, reverse=False):
         if reverse:
             self.config.reverse()
-        return json.dumps(self.config, indent=4, cls=UUIDEncoder)
+        return json_chunks(self.config, indent=self.indent)
+
+    def render(self, reverse=False):
+        return "".join(self.render_chunks(reverse))
 
     def tls_config(self, sni=None, fp=None, alpn=None, ais=False, ech_config_list=None) -> dict:
         tls_settings = {
@@ -25,7 +25,7 @@ async def get_user(event: Message, db: AsyncSession):
         db_user = await user_operations.get_validated_sub(db, token)
         user = await user_operations.validate_user(db_user)
         user_with_inbounds = await subscription_operations.validated_user(db_user)
-        configs = (await subscription_operations.fetch_config(user_with_inbounds, ConfigFormat.links))[0]
+        configs = (await subscription_operations.fetch_config(user_with_inbounds, ConfigFormat.links)).config
     except ValueError:
         return await event.reply(Texts.user_not_found)
 
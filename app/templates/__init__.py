@@ -1,7 +1,10 @@
+import json
+import pickle
 from datetime import datetime as dt, timezone as tz
-from typing import Union
+from typing import Any, Callable, Union
 
 import jinja2
+from jinja2 import meta, nodes
 
 from config import CUSTOM_TEMPLATES_DIRECTORY
 
@@ -16,6 +19,83 @@ env = jinja2.Environment(loader=jinja2.FileSystemLoader(template_directories))
 env.filters.update(CUSTOM_FILTERS)
 env.globals["now"] = lambda: dt.now(tz.utc)
 
+# globals whose value changes between renders, templates using them are never cached
+VOLATILE_GLOBALS = frozenset({"now"})
+
 
 def render_template(template: str, context: Union[dict, None] = None) -> str:
     return env.get_template(template).render(context or {})
+
+
+# marks templates rendered on every call
+_VOLATILE = object()
+
+# template name, parser -> (the jinja templates the artifact was built from, parsed artifact or _VOLATILE)
+_artifacts: dict[tuple[str, Callable], tuple[dict[str, jinja2.Template], Any]] = {}
+
+
+def _walk_template(template: str) -> tuple[list[str], bool]:
+    """
+    Names of a template and of every template it includes, imports or extends, and whether any of them
+    references a global in ``VOLATILE_GLOBALS``.
+    """
+    names, volatile = [], False
+    pending = [template]
+    while pending:
+        name = pending.pop()
+        if name in names:
+            continue
+        names.append(name)
+        source, _, _ = env.loader.get_source(env, name)
+        ast = env.parse(source)
+        # find_undeclared_variables treats env globals as declared, so look at the names themselves
+        volatile = volatile or any(node.name in VOLATILE_GLOBALS for node in ast.find_all(nodes.Name))
+        # dynamic references (None) can't be followed
+        pending.extend(ref for ref in meta.find_referenced_templates(ast) if ref is not None)
+    return names, volatile
+
+
+def uses_volatile_globals(template: str) -> bool:
+    """Whether a template, or one it includes, imports or extends, references a global in ``VOLATILE_GLOBALS``."""
+    return _walk_template(template)[1]
+
+
+def template_artifact(template: str, parse: Callable[[str], Any], context: Union[dict, None] = None) -> Any:
+    """
+    Renders a template once and caches ``parse(rendered)``.
+
+    The context, if any, must be constant for a given parser since it is not part of the cache key.
+    Templates using a volatile global such as ``now()`` are rendered and parsed on every call instead.
+
+    Jinja reloads a template whose file changed on disk (mtime), the artifact is rebuilt when the template
+    or any template it includes, imports or extends was reloaded.
+    The returned artifact is shared, it must be immutable or copied by the caller.
+    """
+    jinja_template = env.get_template(template)
+    cached = _artifacts.get((template, parse))
+    if cached is None or any(env.get_template(name) is not built for name, built in cached[0].items()):
+        names, volatile = _walk_template(template)
+        templates = {name: env.get_template(name) for name in names}
+        artifact = _VOLATILE if volatile else parse(jinja_template.render(context or {}))
+        cached = _artifacts[(template, parse)] = (templates, artifact)
+    if cached[1] is _VOLATILE:
+        return parse(jinja_template.render(context or {}))
+    return cached[1]
+
+
+class JsonTemplate:
+    """Parsed JSON template that hands out fresh, mutable copies."""
+
+    __slots__ = ("_data",)
+
+    def __init__(self, rendered: str):
+        self._data = pickle.dumps(json.loads(rendered), protocol=pickle.HIGHEST_PROTOCOL)
+
+    def copy(self) -> Any:
+        # unpickling is a much cheaper deep copy than json.loads or copy.deepcopy
+        return pickle.loads(self._data)
+
+
+def render_json_template(template: str) -> Any:
+    """Returns a fresh, mutable copy of a parsed context-free JSON template."""
+    return template_artifact(template, JsonTemplate).copy()
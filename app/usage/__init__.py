@@ -0,0 +1,148 @@
+import asyncio
+from collections import defaultdict
+from itertools import repeat
+from datetime import datetime as dt
+
+from app.models.stats import NodeUsageCollectionStats
+from app.usage.columns import UsageColumns
+from app.usage.owners import UserAdminIndex, user_admin_index
+from app.usage.review import UserReview
+
+
+class UsageBatch:
+    """Usage deltas waiting to be written to the database."""
+
+    def __init__(self):
+        self.users: defaultdict[int, int] = defaultdict(int)
+        self.admins: defaultdict[int, int] = defaultdict(int)
+        self.node_users: defaultdict[tuple[int, int, dt], int] = defaultdict(int)
+        self.online_at: dict[int, dt] = {}
+
+    def __bool__(self) -> bool:
+        return bool(self.users or self.admins or self.node_users)
+
+    def merge(self, other: "UsageBatch"):
+        for uid, value in other.users.items():
+            self.users[uid] += value
+        for admin_id, value in other.admins.items():
+            self.admins[admin_id] += value
+        for key, value in other.node_users.items():
+            self.node_users[key] += value
+        for uid, online_at in other.online_at.items():
+            if uid not in self.online_at or self.online_at[uid] < online_at:
+                self.online_at[uid] = online_at
+
+
+class UsageAccumulator:
+    """
+    Write-behind buffer for user traffic.
+
+    Deltas collected by the usage job are kept in memory and written in large batches by the flush job.
+    Readers that need up to date traffic can overlay the pending deltas on top of the database values.
+    Resets hold ``lock`` while they take the deltas of the users or admins they reset, the flush holds it
+    while writing traffic, so pre-reset traffic is never added back on top of a reset.
+    """
+
+    def __init__(self):
+        self._pending = UsageBatch()
+        self._flushing: UsageBatch | None = None
+        self.lock = asyncio.Lock()
+
+    def add_users(self, users_usage: UsageColumns, online_at: dt):
+        users = self._pending.users
+        for uid, value in users_usage:
+            users[uid] += value
+        self._pending.online_at.update(zip(users_usage.uids, repeat(online_at)))
+
+    def add_admins(self, admins_usage: dict[int, int]):
+        admins = self._pending.admins
+        for admin_id, value in admins_usage.items():
+            admins[admin_id] += value
+
+    def add_node_users(self, node_id: int, node_usage: UsageColumns, created_at: dt):
+        """Add usage of a single node, `node_usage` must already have the node coefficient applied."""
+        node_users = self._pending.node_users
+        for uid, value in node_usage:
+            node_users[(node_id, uid, created_at)] += value
+
+    def take(self) -> UsageBatch | None:
+        """Move the pending deltas to the flushing batch, they stay visible to readers until `done` is called."""
+        if self._flushing is not None or not self._pending:
+            return None
+
+        self._flushing, self._pending = self._pending, UsageBatch()
+        return self._flushing
+
+    def done(self, batch: UsageBatch):
+        """Finish a flush, whatever is left in the batch could not be written and goes back to pending."""
+        if batch:
+            batch.merge(self._pending)
+            self._pending = batch
+        self._flushing = None
+
+    def discard_users(self, user_ids: list[int]):
+        """Drop deltas of removed users so the flush doesn't write rows for them."""
+        user_ids = set(user_ids)
+        for batch in filter(None, (self._pending, self._flushing)):
+            for uid in user_ids:
+                batch.users.pop(uid, None)
+                batch.online_at.pop(uid, None)
+            for key in [key for key in batch.node_users if key[1] in user_ids]:
+                del batch.node_users[key]
+
+    def take_users(self, user_ids: list[int]) -> dict[int, int]:
+        """
+        Remove and return the traffic deltas of users being reset, along with their node usage deltas
+        since resets clear the node usage history too.
+        """
+        user_ids = set(user_ids)
+        taken: dict[int, int] = {}
+        for batch in filter(None, (self._pending, self._flushing)):
+            for uid in user_ids:
+                if (value := batch.users.pop(uid, None)) is not None:
+                    taken[uid] = taken.get(uid, 0) + value
+            for key in [key for key in batch.node_users if key[1] in user_ids]:
+                del batch.node_users[key]
+        return taken
+
+    def take_admins(self, admin_ids: list[int]) -> dict[int, int]:
+        """Remove and return the traffic deltas of admins being reset."""
+        taken: dict[int, int] = {}
+        for batch in filter(None, (self._pending, self._flushing)):
+            for admin_id in admin_ids:
+                if (value := batch.admins.pop(admin_id, None)) is not None:
+                    taken[admin_id] = taken.get(admin_id, 0) + value
+        return taken
+
+    def pending_user_usage(self, user_id: int) -> int:
+        value = self._pending.users.get(user_id, 0)
+        if self._flushing is not None:
+            value += self._flushing.users.get(user_id, 0)
+        return value
+
+    def pending_users_usage(self) -> dict[int, int]:
+        users = dict(self._pending.users)
+        if self._flushing is not None:
+            for uid, value in self._flushing.users.items():
+                users[uid] = users.get(uid, 0) + value
+        return users
+
+
+usage_accumulator: UsageAccumulator = UsageAccumulator()
+user_review: UserReview = UserReview(usage_accumulator)
+
+# latest user stats collection of each node, keyed by node id
+node_collection_stats: dict[int, NodeUsageCollectionStats] = {}
+
+
+__all__ = [
+    "UsageAccumulator",
+    "UsageBatch",
+    "UsageColumns",
+    "UserAdminIndex",
+    "UserReview",
+    "node_collection_stats",
+    "usage_accumulator",
+    "user_admin_index",
+    "user_review",
+]
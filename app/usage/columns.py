@@ -0,0 +1,35 @@
+from array import array
+from itertools import repeat
+from operator import mul
+from typing import Iterator
+
+
+class UsageColumns:
+    """
+    Per-user usage stored as two parallel `array('q')` columns.
+
+    Index `i` of `uids` and `values` belongs to the same user, this keeps large node stats as two
+    contiguous int64 buffers instead of one dict per user.
+    """
+
+    __slots__ = ("uids", "values")
+
+    def __init__(self, uids: array | None = None, values: array | None = None):
+        self.uids = uids if uids is not None else array("q")
+        self.values = values if values is not None else array("q")
+
+    @classmethod
+    def from_dict(cls, usages: dict[int, int]) -> "UsageColumns":
+        return cls(array("q", usages.keys()), array("q", usages.values()))
+
+    def __len__(self) -> int:
+        return len(self.uids)
+
+    def __iter__(self) -> Iterator[tuple[int, int]]:
+        return zip(self.uids, self.values)
+
+    def scale(self, coefficient: float) -> "UsageColumns":
+        """Apply a usage coefficient to every value, the uid column is shared with the result."""
+        if coefficient == 1:
+            return self
+        return UsageColumns(self.uids, array("q", map(int, map(mul, self.values, repeat(coefficient)))))
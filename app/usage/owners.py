@@ -0,0 +1,62 @@
+from typing import Iterable
+
+from sqlalchemy import select
+
+from app.db import AsyncSession
+from app.db.models import User
+
+
+class UserAdminIndex:
+    """
+    In-process uid -> admin_id index used to attribute user traffic to admins.
+
+    Kept up to date by user operations that change ownership and fully resynced from
+    the database periodically as a safety net.
+    """
+
+    def __init__(self):
+        self._admins: dict[int, int | None] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._admins)
+
+    def set(self, user_id: int, admin_id: int | None):
+        self._admins[user_id] = admin_id
+
+    def remove(self, user_ids: Iterable[int]):
+        for user_id in user_ids:
+            self._admins.pop(user_id, None)
+
+    async def resync(self, db: AsyncSession):
+        result = await db.execute(select(User.id, User.admin_id))
+        self._admins = {user_id: admin_id for user_id, admin_id in result.all()}
+
+    async def get_many(self, db: AsyncSession, user_ids: Iterable[int]) -> dict[int, int | None]:
+        """Resolve admin ids of the given users, only users missing from the index are loaded from the database."""
+        admins = {}
+        missing = []
+        for user_id in user_ids:
+            try:
+                admins[user_id] = self._admins[user_id]
+            except KeyError:
+                missing.append(user_id)
+
+        self.hits += len(admins)
+        self.misses += len(missing)
+
+        if missing:
+            result = await db.execute(select(User.id, User.admin_id).where(User.id.in_(missing)))
+            found = dict(result.all())
+            # unknown users are cached as ownerless until the next resync to avoid querying them every tick
+            for user_id in missing:
+                self._admins[user_id] = admins[user_id] = found.get(user_id)
+
+        return admins
+
+    def stats(self) -> dict[str, int]:
+        return {"size": len(self._admins), "hits": self.hits, "misses": self.misses}
+
+
+user_admin_index: UserAdminIndex = UserAdminIndex()
@@ -0,0 +1,212 @@
+import asyncio
+import heapq
+import time
+from datetime import datetime as dt, timezone as tz
+from typing import Iterable
+
+from sqlalchemy import select
+
+from app.db import AsyncSession
+from app.db.models import User, UserStatus
+from app.usage.columns import UsageColumns
+
+
+def _timestamp(value: dt | int | None) -> float | None:
+    if value is None:
+        return None
+    if isinstance(value, dt):
+        return (value if value.tzinfo else value.replace(tzinfo=tz.utc)).timestamp()
+    return float(value)
+
+
+class DeadlineHeap:
+    """
+    Min-heap of ``(deadline, user_id)`` holding at most one live deadline per user.
+
+    Changing or removing a deadline leaves the old entry in the heap, it is skipped once it reaches the top.
+    """
+
+    def __init__(self):
+        self._heap: list[tuple[float, int]] = []
+        self._deadlines: dict[int, float] = {}
+
+    def __len__(self) -> int:
+        return len(self._deadlines)
+
+    def set(self, user_id: int, deadline: float | None) -> bool:
+        """Sets or removes the deadline of a user, returns whether it is the earliest one now."""
+        if deadline is None:
+            self._deadlines.pop(user_id, None)
+            return False
+        if self._deadlines.get(user_id) == deadline:
+            return False
+        self._deadlines[user_id] = deadline
+        heapq.heappush(self._heap, (deadline, user_id))
+        return self._heap[0] == (deadline, user_id)
+
+    def remove(self, user_ids: Iterable[int]) -> None:
+        for user_id in user_ids:
+            self._deadlines.pop(user_id, None)
+
+    def reset(self, deadlines: dict[int, float]) -> None:
+        self._deadlines = deadlines
+        self._heap = [(deadline, user_id) for user_id, deadline in deadlines.items()]
+        heapq.heapify(self._heap)
+
+    def _prune(self) -> None:
+        while self._heap and self._deadlines.get(self._heap[0][1]) != self._heap[0][0]:
+            heapq.heappop(self._heap)
+        # keep stale entries from piling up when deadlines keep being moved
+        if len(self._heap) > 2 * len(self._deadlines) + 1024:
+            self.reset(self._deadlines)
+
+    def next_deadline(self) -> float | None:
+        self._prune()
+        return self._heap[0][0] if self._heap else None
+
+    def pop_due(self, now: float) -> list[int]:
+        due = []
+        while (deadline := self.next_deadline()) is not None and deadline <= now:
+            _, user_id = heapq.heappop(self._heap)
+            del self._deadlines[user_id]
+            due.append(user_id)
+        return due
+
+
+class UserReview:
+    """
+    Users due for a status change, so the review job handles each one when it is due instead of scanning
+    the users table.
+
+    Expire dates of active users and on hold timeouts are kept in deadline heaps, the data left to active
+    users with a limit is counted down from the usage job and on hold users seen in traffic are noted.
+    Kept up to date by user operations and rebuilt from the database by the periodic reconciliation.
+    """
+
+    def __init__(self, usage_accumulator):
+        self._usage = usage_accumulator
+        self.expires = DeadlineHeap()
+        self.on_hold_timeouts = DeadlineHeap()
+        self._remaining: dict[int, int] = {}
+        self._on_hold: set[int] = set()
+        self._limited: set[int] = set()
+        self._online: set[int] = set()
+        self._stale = True
+        self._wakeup = asyncio.Event()
+
+    @property
+    def stale(self) -> bool:
+        return self._stale
+
+    def invalidate(self) -> None:
+        """Rebuilds from the database before the next review, for bulk changes made without the users at hand."""
+        self._stale = True
+        self._wakeup.set()
+
+    def update(self, user) -> None:
+        """Tracks the deadlines and data limit of a user, ``user`` is a ``User`` or any of its response models."""
+        self.remove([user.id])
+        if user.status is UserStatus.active:
+            wake = self.expires.set(user.id, _timestamp(user.expire))
+            if user.data_limit:
+                remaining = user.data_limit - user.used_traffic - self._usage.pending_user_usage(user.id)
+                self._remaining[user.id] = remaining
+                if remaining <= 0:
+                    self._limited.add(user.id)
+                    wake = True
+        elif user.status is UserStatus.on_hold:
+            self._on_hold.add(user.id)
+            wake = self.on_hold_timeouts.set(user.id, _timestamp(user.on_hold_timeout))
+        else:
+            return
+
+        if wake:
+            self._wakeup.set()
+
+    def remove(self, user_ids: Iterable[int]) -> None:
+        user_ids = set(user_ids)
+        self.expires.remove(user_ids)
+        self.on_hold_timeouts.remove(user_ids)
+        for user_id in user_ids:
+            self._remaining.pop(user_id, None)
+        self._on_hold -= user_ids
+        self._limited -= user_ids
+        self._online -= user_ids
+
+    def add_usage(self, users_usage: UsageColumns) -> None:
+        """Counts down the data left to the users, called with every usage collected from a node."""
+        wake = False
+        remaining = self._remaining
+        for uid, value in users_usage:
+            if uid in remaining:
+                remaining[uid] -= value
+                if remaining[uid] <= 0:
+                    self._limited.add(uid)
+                    wake = True
+            elif uid in self._on_hold:
+                self._online.add(uid)
+                wake = True
+        if wake:
+            self._wakeup.set()
+
+    async def resync(self, db: AsyncSession) -> None:
+        stmt = select(
+            User.id, User.status, User.expire, User.on_hold_timeout, User.data_limit, User.used_traffic
+        ).where(User.status.in_([UserStatus.active, UserStatus.on_hold]))
+        pending = self._usage.pending_users_usage()
+
+        expires, on_hold_timeouts, remaining, on_hold = {}, {}, {}, set()
+        for user_id, status, expire, on_hold_timeout, data_limit, used_traffic in (await db.execute(stmt)).all():
+            if status is UserStatus.active:
+                if expire is not None:
+                    expires[user_id] = _timestamp(expire)
+                if data_limit:
+                    remaining[user_id] = data_limit - used_traffic - pending.get(user_id, 0)
+            else:
+                on_hold.add(user_id)
+                if on_hold_timeout is not None:
+                    on_hold_timeouts[user_id] = _timestamp(on_hold_timeout)
+
+        self.expires.reset(expires)
+        self.on_hold_timeouts.reset(on_hold_timeouts)
+        self._remaining = remaining
+        self._on_hold = on_hold
+        self._limited = {user_id for user_id, left in remaining.items() if left <= 0}
+        self._online.clear()
+        self._stale = False
+        self._wakeup.set()
+
+    async def wait(self) -> None:
+        """Waits until a deadline is due or a user may have to be limited or activated."""
+        deadlines = [d for d in (self.expires.next_deadline(), self.on_hold_timeouts.next_deadline()) if d is not None]
+        timeout = max(min(deadlines) - time.time(), 0) if deadlines else None
+        try:
+            await asyncio.wait_for(self._wakeup.wait(), timeout)
+        except TimeoutError:
+            pass
+        self._wakeup.clear()
+
+    def take_due(self, now: float | None = None) -> tuple[list[int], list[int], list[int]]:
+        """Users to expire, to limit and to activate from on hold, they are tracked again once updated."""
+        now = time.time() if now is None else now
+        expired = self.expires.pop_due(now)
+
+        limited, self._limited = list(self._limited), set()
+        for user_id in limited:
+            self._remaining.pop(user_id, None)
+
+        on_hold = self.on_hold_timeouts.pop_due(now)
+        on_hold.extend(self._online - set(on_hold))
+        self._online = set()
+        self._on_hold.difference_update(on_hold)
+        self.on_hold_timeouts.remove(on_hold)
+
+        return expired, limited, on_hold
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "expires": len(self.expires),
+            "on_hold_timeouts": len(self.on_hold_timeouts),
+            "limits": len(self._remaining),
+            "on_hold": len(self._on_hold),
+        }
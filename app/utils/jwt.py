@@ -8,7 +8,13 @@ from math import ceil
 from aiocache import cached
 from app.db import GetDB
 from app.db.crud.general import get_jwt_secret_key
-from config import JWT_ACCESS_TOKEN_EXPIRE_MINUTES
+from app.utils.ttl_cache import TTLCache
+from config import JWT_ACCESS_TOKEN_EXPIRE_MINUTES, TOKEN_CACHE_SIZE, TOKEN_CACHE_TTL
+
+# verified token -> payload, grouped by username. Password resets and revoked subscriptions are checked
+# against the database by the callers, the caches only save the signature checks.
+admin_tokens = TTLCache(TOKEN_CACHE_SIZE, TOKEN_CACHE_TTL)
+subscription_tokens = TTLCache(TOKEN_CACHE_SIZE, TOKEN_CACHE_TTL)
 
 
 @cached()
@@ -27,7 +33,17 @@ async def create_admin_token(username: str, is_sudo=False) -> str:
     return encoded_jwt
 
 
+def _cache_payload(cache: TTLCache, token: str, payload: dict, expire: int | None = None) -> dict:
+    # an entry never outlives the token
+    ttl = expire - time.time() if expire is not None else None
+    cache.set(token, payload, group=payload["username"], ttl=ttl)
+    return dict(payload)
+
+
 async def get_admin_payload(token: str) -> dict | None:
+    if cached_payload := admin_tokens.get(token):
+        return dict(cached_payload)
+
     try:
         payload = jwt.decode(token, await get_secret_key(), algorithms=["HS256"])
         username: str = payload.get("sub")
@@ -39,7 +55,12 @@ async def get_admin_payload(token: str) -> dict | None:
         except KeyError:
             created_at = None
 
-        return {"username": username, "is_sudo": access == "sudo", "created_at": created_at}
+        return _cache_payload(
+            admin_tokens,
+            token,
+            {"username": username, "is_sudo": access == "sudo", "created_at": created_at},
+            payload.get("exp"),
+        )
     except jwt.exceptions.PyJWTError:
         return
 
@@ -55,6 +76,9 @@ async def create_subscription_token(username: str) -> str:
 
 
 async def get_subscription_payload(token: str) -> dict | None:
+    if cached_payload := subscription_tokens.get(token):
+        return dict(cached_payload)
+
     try:
         if len(token) < 15:
             return
@@ -62,10 +86,15 @@ async def get_subscription_payload(token: str) -> dict | None:
         if token.startswith("eyJhbGciOiJIUzI1NiIsInR5cCI6IkpXVCJ9."):
             payload = jwt.decode(token, await get_secret_key(), algorithms=["HS256"])
             if payload.get("access") == "subscription":
-                return {
-                    "username": payload["sub"],
-                    "created_at": datetime.fromtimestamp(payload["iat"], tz=timezone.utc),
-                }
+                return _cache_payload(
+                    subscription_tokens,
+                    token,
+                    {
+                        "username": payload["sub"],
+                        "created_at": datetime.fromtimestamp(payload["iat"], tz=timezone.utc),
+                    },
+                    payload.get("exp"),
+                )
             else:
                 return
         else:
@@ -86,7 +115,11 @@ async def get_subscription_payload(token: str) -> dict | None:
             if u_signature == u_token_resign:
                 u_username = u_token_dec_str.split(",")[0]
                 u_created_at = int(u_token_dec_str.split(",")[1])
-                return {"username": u_username, "created_at": datetime.fromtimestamp(u_created_at, tz=timezone.utc)}
+                return _cache_payload(
+                    subscription_tokens,
+                    token,
+                    {"username": u_username, "created_at": datetime.fromtimestamp(u_created_at, tz=timezone.utc)},
+                )
             else:
                 return
     except jwt.exceptions.PyJWTError:
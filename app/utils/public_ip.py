@@ -0,0 +1,100 @@
+import asyncio
+import json
+import os
+import tempfile
+import time
+
+from app.utils.logger import get_logger
+from app.utils.system import get_public_ip, get_public_ipv6
+from config import PUBLIC_IP_CACHE_FILE, SERVER_IP, SERVER_IPV6
+
+logger = get_logger("public-ip")
+
+DEFAULT_IPV4 = "127.0.0.1"
+DEFAULT_IPV6 = "[::1]"
+
+
+class PublicIP:
+    """
+    Public addresses of the server for the SERVER_IP and SERVER_IPV6 format variables.
+
+    Addresses set in the environment are used as is. Otherwise the last discovered addresses are read from
+    ``cache_file`` by ``load`` at startup, so a restart serves them right away while ``discover`` refreshes
+    them in the background. Until an address is known the loopback one is used.
+    """
+
+    def __init__(self, cache_file: str = PUBLIC_IP_CACHE_FILE, ipv4: str = SERVER_IP, ipv6: str = SERVER_IPV6):
+        self.cache_file = cache_file
+        self.ipv4_override = ipv4 or None
+        self.ipv6_override = f"[{ipv6.strip('[]')}]" if ipv6 else None
+        self._cached: dict | None = None
+        self._lock = asyncio.Lock()
+
+    def load(self) -> None:
+        """Reads the cached addresses, blocking so it's meant to run in a thread."""
+        cached = {}
+        if self.cache_file:
+            try:
+                with open(self.cache_file) as f:
+                    cached = json.load(f)
+            except FileNotFoundError:
+                pass
+            except (OSError, ValueError) as e:
+                logger.warning(f"Failed to read public ip cache {self.cache_file}: {e}")
+        self._cached = cached if isinstance(cached, dict) else {}
+
+    def _save(self) -> None:
+        if not self.cache_file:
+            return
+        directory = os.path.dirname(os.path.abspath(self.cache_file))
+        try:
+            os.makedirs(directory, exist_ok=True)
+            with tempfile.NamedTemporaryFile("w", dir=directory, delete=False) as f:
+                json.dump(self._cached, f)
+            os.replace(f.name, self.cache_file)
+        except OSError as e:
+            logger.warning(f"Failed to write public ip cache {self.cache_file}: {e}")
+
+    @property
+    def ipv4(self) -> str:
+        return self.ipv4_override or (self._cached or {}).get("ipv4") or DEFAULT_IPV4
+
+    @property
+    def ipv6(self) -> str:
+        return self.ipv6_override or (self._cached or {}).get("ipv6") or DEFAULT_IPV6
+
+    async def discover(self) -> bool:
+        """
+        Looks up the addresses not set in the environment, IPv4 and IPv6 concurrently. Addresses that can't
+        be discovered keep their last known value. Returns whether an address changed.
+        """
+        async with self._lock:
+            lookups = {}
+            if not self.ipv4_override:
+                lookups["ipv4"] = get_public_ip()
+            if not self.ipv6_override:
+                lookups["ipv6"] = get_public_ipv6()
+            if not lookups:
+                return False
+
+            if self._cached is None:
+                # keep the addresses that can't be discovered when the cache wasn't loaded at startup
+                await asyncio.to_thread(self.load)
+            results = await asyncio.gather(*lookups.values())
+            cached = dict(self._cached)
+            for key, ip in zip(lookups, results):
+                if ip:
+                    cached[key] = ip
+                else:
+                    logger.warning(f"Could not discover the public {key} address, keeping {cached.get(key)}")
+
+            changed = any(cached.get(key) != self._cached.get(key) for key in lookups)
+            cached["updated_at"] = int(time.time())
+            self._cached = cached
+            await asyncio.to_thread(self._save)
+            if changed:
+                logger.info(f"Public addresses discovered: {self.ipv4}, {self.ipv6}")
+            return changed
+
+
+public_ip = PublicIP()
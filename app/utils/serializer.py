@@ -0,0 +1,55 @@
+"""JSON serialization for subscriptions and API responses, through orjson when it is installed."""
+
+import json
+from typing import Any, Iterator
+
+from fastapi.responses import JSONResponse as BaseJSONResponse
+
+try:
+    import orjson
+except ImportError:  # optional, the standard library encoder is used without it
+    orjson = None
+
+
+def json_dumps(obj: Any, indent: int | None = 4) -> str:
+    """
+    Serializes data that is already made of JSON types, UUIDs and the like have to be converted beforehand
+    so no encoder has to call back into python.
+
+    ``indent=None`` gives the compact output. orjson only indents by two spaces, any other indent uses that.
+    """
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2 if indent is not None else 0).decode()
+    if indent is None:
+        return json.dumps(obj, separators=(",", ":"))
+    return json.dumps(obj, indent=indent)
+
+
+def json_chunks(obj: Any, indent: int | None = 4, chunk_size: int = 16384) -> Iterator[str]:
+    """
+    ``json_dumps`` output in chunks of about ``chunk_size`` characters, so a large document is never held as
+    one string. orjson can't encode incrementally, with it the document is a single chunk.
+    """
+    if orjson is not None:
+        yield json_dumps(obj, indent=indent)
+        return
+
+    encoder = json.JSONEncoder(indent=indent, separators=(",", ":") if indent is None else None)
+    buffer, size = [], 0
+    for piece in encoder.iterencode(obj):
+        buffer.append(piece)
+        size += len(piece)
+        if size >= chunk_size:
+            yield "".join(buffer)
+            buffer, size = [], 0
+    if buffer:
+        yield "".join(buffer)
+
+
+class JSONResponse(BaseJSONResponse):
+    """API response rendered by orjson when it is installed, the same output as starlette's otherwise."""
+
+    def render(self, content: Any) -> bytes:
+        if orjson is None:
+            return super().render(content)
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
@@ -5,6 +5,7 @@ class DictStorage(dict):
     def __init__(self, update_func):
         super().__init__()
         self.update_func = update_func
+        self.version = 0
 
     def __getitem__(self, key):
         return super().__getitem__(key)
@@ -26,3 +27,4 @@ class DictStorage(dict):
 
     async def update(self, db: AsyncSession):
         await self.update_func(self, db)
+        self.version += 1
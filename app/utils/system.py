@@ -1,3 +1,4 @@
+import asyncio
 import ipaddress
 import math
 import secrets
@@ -45,33 +46,36 @@ def check_port(port: int) -> bool:
         s.close()
 
 
-def get_public_ip():
+IPV4_SERVICES = ("http://api4.ipify.org/", "http://ipv4.icanhazip.com/", "https://ifconfig.io/ip")
+IPV6_SERVICES = ("http://api6.ipify.org/", "http://ipv6.icanhazip.com/")
+PUBLIC_IP_TIMEOUT = 5
+
+
+async def _fetch_global_ip(client: httpx.AsyncClient, url: str, address_class) -> str | None:
     try:
-        resp = httpx.get("http://api4.ipify.org/", timeout=5).text.strip()
-        if ipaddress.IPv4Address(resp).is_global:
+        resp = (await client.get(url)).text.strip()
+        if address_class(resp).is_global:
             return resp
     except Exception:
         pass
 
+
+async def _first_global_ip(client: httpx.AsyncClient, urls: tuple[str, ...], address_class) -> str | None:
+    """Queries every service at once and returns the first global address, the other requests are cancelled."""
+    tasks = [asyncio.create_task(_fetch_global_ip(client, url, address_class)) for url in urls]
     try:
-        resp = httpx.get("http://ipv4.icanhazip.com/", timeout=5).text.strip()
-        if ipaddress.IPv4Address(resp).is_global:
-            return resp
-    except Exception:
-        pass
+        for task in asyncio.as_completed(tasks):
+            if ip := await task:
+                return ip
+    finally:
+        for task in tasks:
+            task.cancel()
 
-    # Disable IPv6 for this request
-    transport = httpx.HTTPTransport(local_address="0.0.0.0")
-    with httpx.Client(transport=transport) as client:
-        try:
-            resp = client.get("https://ifconfig.io/ip", timeout=5).text.strip()
-            if ipaddress.IPv4Address(resp).is_global:
-                return resp
-        except httpx.RequestError:
-            pass
 
+def get_local_ip() -> str | None:
+    """Address of the interface routing to the internet, a UDP connect sends no packets."""
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
     try:
-        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
         sock.connect(("8.8.8.8", 80))
         resp = sock.getsockname()[0]
         if ipaddress.IPv4Address(resp).is_global:
@@ -81,25 +85,21 @@ def get_public_ip():
     finally:
         sock.close()
 
-    return "127.0.0.1"
 
+async def get_public_ip() -> str | None:
+    # Disable IPv6 for these requests
+    transport = httpx.AsyncHTTPTransport(local_address="0.0.0.0")
+    async with httpx.AsyncClient(transport=transport, timeout=PUBLIC_IP_TIMEOUT) as client:
+        if ip := await _first_global_ip(client, IPV4_SERVICES, ipaddress.IPv4Address):
+            return ip
 
-def get_public_ipv6():
-    try:
-        resp = httpx.get("http://api6.ipify.org/", timeout=5).text.strip()
-        if ipaddress.IPv6Address(resp).is_global:
-            return "[%s]" % resp
-    except Exception:
-        pass
+    return get_local_ip()
 
-    try:
-        resp = httpx.get("http://ipv6.icanhazip.com/", timeout=5).text.strip()
-        if ipaddress.IPv6Address(resp).is_global:
-            return "[%s]" % resp
-    except Exception:
-        pass
 
-    return "[::1]"
+async def get_public_ipv6() -> str | None:
+    async with httpx.AsyncClient(timeout=PUBLIC_IP_TIMEOUT) as client:
+        if ip := await _first_global_ip(client, IPV6_SERVICES, ipaddress.IPv6Address):
+            return "[%s]" % ip
 
 
 def readable_size(size_bytes):
@@ -0,0 +1,74 @@
+import time
+from collections import OrderedDict
+from typing import Any, Hashable, NamedTuple
+
+_MISSING = object()
+
+
+class _Entry(NamedTuple):
+    value: Any
+    group: Hashable
+    expires_at: float
+
+
+class TTLCache:
+    """
+    Bounded LRU whose entries expire after ``ttl`` seconds, or earlier when ``set`` is given a shorter
+    lifetime. Every entry belongs to a group (e.g. a username) so all entries of an account can be dropped
+    at once when it changes. A ``maxsize`` or ``ttl`` of 0 disables the cache.
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries: OrderedDict[Hashable, _Entry] = OrderedDict()
+        self._groups: dict[Hashable, set[Hashable]] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: Hashable, default=None):
+        entry = self._entries.get(key)
+        if entry is None or entry.expires_at <= time.monotonic():
+            if entry is not None:
+                self._pop(key)
+            self.misses += 1
+            return default
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry.value
+
+    def set(self, key: Hashable, value, group: Hashable = None, ttl: float | None = None) -> None:
+        ttl = self.ttl if ttl is None else min(ttl, self.ttl)
+        if self.maxsize <= 0 or ttl <= 0:
+            return
+
+        if key in self._entries:
+            self._pop(key)
+        self._entries[key] = _Entry(value, group, time.monotonic() + ttl)
+        self._groups.setdefault(group, set()).add(key)
+        while len(self._entries) > self.maxsize:
+            self._pop(next(iter(self._entries)))
+
+    def invalidate(self, *groups: Hashable) -> None:
+        """Drops every entry of the given groups."""
+        for group in groups:
+            for key in self._groups.pop(group, ()):
+                self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._groups.clear()
+
+    def _pop(self, key: Hashable) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        keys = self._groups.get(entry.group)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._groups[entry.group]
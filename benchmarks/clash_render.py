@@ -0,0 +1,89 @@
+"""
+Compare clash / clash-meta rendering through the template and a yaml load / dump round trip with the
+placeholder filled, pre-parsed template.
+
+Run from the project root:
+    uv run python -m benchmarks.clash_render
+"""
+
+import time
+from uuid import UUID
+
+import yaml
+
+from app.subscription.clash import ClashConfiguration, ClashMetaConfiguration
+from app.templates import render_template
+from config import CLASH_SUBSCRIPTION_TEMPLATE
+
+HOST_COUNTS = (10, 100, 500)
+ROUNDS = 5
+NETWORKS = ("ws", "grpc", "tcp", "httpupgrade")
+PROTOCOLS = ("vmess", "vless", "trojan", "shadowsocks")
+
+
+def build(config_class, hosts: int, flags: bool):
+    conf = config_class()
+    settings = {
+        "id": UUID("1a5d4f82-8e3b-4a8b-9c2e-5f0a1b2c3d4e"),
+        "password": "password",
+        "method": "chacha20-ietf-poly1305",
+        "flow": "",
+    }
+    for i in range(hosts):
+        conf.add(
+            remark=f"{'🇩🇪 ' if flags else ''}server {i} [{PROTOCOLS[i % 4]} - {NETWORKS[i % 4]}]",
+            address=f"{i}.example.com",
+            inbound={
+                "protocol": PROTOCOLS[i % 4],
+                "network": NETWORKS[(i // 4) % 4],
+                "port": 443,
+                "tls": "tls",
+                "sni": f"sni-{i}.example.com",
+                "host": f"host-{i}.example.com",
+                "path": f"/path-{i}",
+                "header_type": "none",
+                "alpn": ["h2", "http/1.1"],
+            },
+            settings=settings,
+        )
+    return conf
+
+
+def legacy_render(conf) -> str:
+    return yaml.dump(
+        yaml.load(
+            render_template(CLASH_SUBSCRIPTION_TEMPLATE, {"conf": conf.data, "proxy_remarks": conf.proxy_remarks}),
+            Loader=yaml.SafeLoader,
+        ),
+        sort_keys=False,
+        allow_unicode=True,
+    )
+
+
+def measure(config_class, hosts: int, flags: bool, render) -> tuple[float, str]:
+    configs = [build(config_class, hosts, flags) for _ in range(ROUNDS)]
+    start = time.perf_counter()
+    outputs = [render(conf) for conf in configs]
+    elapsed = (time.perf_counter() - start) / ROUNDS
+    assert len(set(outputs)) == 1
+    return elapsed, outputs[0]
+
+
+def main():
+    print(f"libyaml: {yaml.__with_libyaml__}")
+    print(f"{'format':>11} {'hosts':>6} {'remarks':>8} {'legacy':>10} {'new':>10} {'speedup':>8}")
+    for name, config_class in (("clash", ClashConfiguration), ("clash-meta", ClashMetaConfiguration)):
+        for hosts in HOST_COUNTS:
+            for flags in (False, True):
+                legacy_time, legacy = measure(config_class, hosts, flags, legacy_render)
+                new_time, new = measure(config_class, hosts, flags, lambda conf: conf.render())
+                assert legacy == new, "rendered differently"
+                remarks = "emoji" if flags else "ascii"
+                print(
+                    f"{name:>11} {hosts:>6} {remarks:>8} {legacy_time * 1e3:>8.2f}ms {new_time * 1e3:>8.2f}ms"
+                    f" {legacy_time / new_time:>7.1f}x"
+                )
+
+
+if __name__ == "__main__":
+    main()
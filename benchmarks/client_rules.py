@@ -0,0 +1,69 @@
+"""
+Compare client detection through re.match over every rule with the compiled rule matcher, with and without
+its user agent cache, on the default rules.
+
+Run from the project root:
+    uv run python -m benchmarks.client_rules
+"""
+
+import re
+import time
+
+from app.models.settings import SubRule
+from app.subscription.client_rules import ClientRuleMatcher
+
+ROUNDS = 20000
+RULES = [
+    SubRule(pattern=pattern, target=target)
+    for pattern, target in (
+        (r"^([Cc]lash[\-\.]?[Vv]erge|[Cc]lash[\-\.]?[Mm]eta|[Ff][Ll][Cc]lash|[Mm]ihomo)", "clash_meta"),
+        (r"^([Cc]lash|[Ss]tash)", "clash"),
+        (r"^(SFA|SFI|SFM|SFT|[Kk]aring|[Hh]iddify[Nn]ext)|.*[Ss]ing[\-b]?ox.*", "sing_box"),
+        (r"^(SS|SSR|SSD|SSS|Outline|Shadowsocks|SSconf)", "outline"),
+        (r"^(v2rayNG|v2rayN|Streisand|Happ|ktor\-client)", "xray"),
+        (r"^.*", "links_base64"),
+    )
+]
+USER_AGENTS = (
+    "ClashMetaForAndroid/2.10.1.Meta",
+    "SFA/1.9.3 (android)",
+    "v2rayNG/1.9.46",
+    "Happ/2.0.1/Android/1739355813",
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/126.0",
+)
+
+
+def legacy(user_agent: str) -> SubRule | None:
+    for rule in RULES:
+        if re.match(rule.pattern, user_agent):
+            return rule
+
+
+def measure(detect) -> float:
+    start = time.perf_counter()
+    for _ in range(ROUNDS):
+        for user_agent in USER_AGENTS:
+            detect(user_agent)
+    return (time.perf_counter() - start) / (ROUNDS * len(USER_AGENTS))
+
+
+def main():
+    uncached = ClientRuleMatcher(maxsize=0)
+    cached = ClientRuleMatcher()
+    for user_agent in USER_AGENTS:
+        assert legacy(user_agent) is uncached.match(user_agent, RULES) is cached.match(user_agent, RULES)
+
+    legacy_time = measure(legacy)
+    print(f"{'detection':>18} {'per request':>12} {'speedup':>8}")
+    for name, detect in (
+        ("re.match loop", legacy),
+        ("combined pattern", lambda user_agent: uncached.match(user_agent, RULES)),
+        ("with ua cache", lambda user_agent: cached.match(user_agent, RULES)),
+    ):
+        elapsed = measure(detect)
+        print(f"{name:>18} {elapsed * 1e6:>10.2f}us {legacy_time / elapsed:>7.1f}x")
+    print("hits:", ", ".join(f"{rule.target.value}={hits}" for rule, hits in cached.stats(RULES)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""
+Compare the old CoreManager inbound lookups (reader lock and deepcopy on every call) with the immutable
+snapshots, for single lookups, inbound tag validation and cold subscription rendering.
+
+Run from the project root:
+    uv run python -m benchmarks.core_inbounds
+"""
+
+import asyncio
+import time
+from copy import deepcopy
+from types import SimpleNamespace
+
+from aiocache import cached
+from aiorwlock import RWLock
+
+from app.core.hosts import hosts as hosts_storage
+from app.core.manager import core_manager, thaw
+from app.subscription import share
+from benchmarks.subscription_hosts import CORE_CONFIG, make_host
+
+HOSTS = 200
+TAGS = 50
+ROUNDS = 200
+
+
+class LegacyCoreManager:
+    """The inbound getters as they were before the snapshots, fed from the same inbounds."""
+
+    def __init__(self, inbounds_by_tag: dict[str, dict]):
+        self._lock = RWLock(fast=True)
+        self._inbounds_by_tag = inbounds_by_tag
+        self._inbounds = list(self._inbounds_by_tag.keys())
+        self.version = core_manager.version
+
+    @cached()
+    async def get_inbounds(self) -> list[str]:
+        async with self._lock.reader_lock:
+            return deepcopy(self._inbounds)
+
+    @cached()
+    async def get_inbounds_by_tag(self) -> dict:
+        async with self._lock.reader_lock:
+            return deepcopy(self._inbounds_by_tag)
+
+    async def get_inbound_by_tag(self, tag) -> dict:
+        async with self._lock.reader_lock:
+            inbound = self._inbounds_by_tag.get(tag, None)
+            if not inbound:
+                return None
+            return deepcopy(inbound)
+
+
+async def measure(func, rounds: int = ROUNDS) -> float:
+    await func()  # warm up
+    start = time.perf_counter()
+    for _ in range(rounds):
+        await func()
+    return (time.perf_counter() - start) / rounds
+
+
+async def main():
+    async def subscription_settings():
+        return SimpleNamespace(host_status_filter=False)
+
+    share.subscription_settings = subscription_settings
+
+    await core_manager.update_core(
+        SimpleNamespace(id=1, config=CORE_CONFIG, exclude_inbound_tags=set(), fallbacks_inbound_tags=set())
+    )
+    inbound_tags = list(await core_manager.get_inbounds())
+    for i in range(HOSTS):
+        hosts_storage[i] = make_host(i, inbound_tags[i % len(inbound_tags)])
+    legacy_manager = LegacyCoreManager(thaw(await core_manager.get_inbounds_by_tag()))
+    tags = [inbound_tags[i % len(inbound_tags)] for i in range(TAGS)]
+
+    def lookups(manager):
+        async def run():
+            for i in range(HOSTS):
+                await manager.get_inbound_by_tag(inbound_tags[i % len(inbound_tags)])
+
+        return run
+
+    async def legacy_check_tags():
+        for tag in tags:
+            if tag not in await legacy_manager.get_inbounds():
+                raise ValueError(tag)
+
+    async def check_tags():
+        inbounds = await core_manager.get_inbounds()
+        for tag in tags:
+            if tag not in inbounds:
+                raise ValueError(tag)
+
+    async def cold_compile():
+        # every round starts after a hosts change, so the hosts are compiled again
+        hosts_storage.version += 1
+        await share.get_compiled_hosts()
+
+    async def legacy_cold_compile():
+        share.core_manager = legacy_manager
+        try:
+            await cold_compile()
+        finally:
+            share.core_manager = core_manager
+
+    cases = (
+        (f"{HOSTS} get_inbound_by_tag", lookups(legacy_manager), lookups(core_manager)),
+        (f"check {TAGS} tags", legacy_check_tags, check_tags),
+        (f"compile {HOSTS} hosts", legacy_cold_compile, cold_compile),
+    )
+    print(f"{'case':>24} {'legacy':>10} {'snapshot':>10} {'speedup':>8}")
+    for name, legacy, snapshot in cases:
+        legacy_time = await measure(legacy)
+        snapshot_time = await measure(snapshot)
+        print(
+            f"{name:>24} {legacy_time * 1e6:>8.1f}us {snapshot_time * 1e6:>8.1f}us {legacy_time / snapshot_time:>7.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,88 @@
+"""
+Compare per-user inbound resolution through User.inbounds() with the group -> tags index.
+
+Run from the project root:
+    uv run python -m benchmarks.group_inbounds
+"""
+
+import asyncio
+import random
+import time
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import selectinload
+
+from app.core.groups import GroupInboundIndex
+from app.db.base import Base
+from app.db.models import Admin, Group, ProxyInbound, User
+
+GROUP_COUNTS = (10, 100, 1000)
+INBOUNDS = 50
+INBOUNDS_PER_GROUP = 3
+ROUNDS = 200
+
+
+async def run(groups: int) -> tuple[float, float, float]:
+    engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    session = async_sessionmaker(engine, expire_on_commit=False)
+
+    async with session() as db:
+        inbounds = [ProxyInbound(tag=f"inbound-{i}") for i in range(INBOUNDS)]
+        db_groups = [
+            Group(name=f"group-{i}", inbounds=random.sample(inbounds, INBOUNDS_PER_GROUP)) for i in range(groups)
+        ]
+        admin = Admin(username="admin", hashed_password="-")
+        db.add_all([*inbounds, *db_groups, admin])
+        await db.flush()
+        user = User(username="user", proxy_settings={}, admin_id=admin.id)
+        user.groups = db_groups
+        db.add(user)
+        await db.commit()
+        user_id = user.id
+
+    index = GroupInboundIndex()
+    async with session() as db:
+        await index.refresh(db)
+
+    stmt = select(User).where(User.id == user_id)
+
+    # legacy, inbounds preloaded as core_users used to do
+    async with session() as db:
+        db_user = (await db.execute(stmt.options(selectinload(User.groups).selectinload(Group.inbounds)))).scalar_one()
+        start = time.perf_counter()
+        for _ in range(ROUNDS):
+            legacy = await db_user.inbounds()
+        preloaded = (time.perf_counter() - start) / ROUNDS
+
+    # legacy, inbounds lazy loaded per group as the subscription path does
+    start = time.perf_counter()
+    for _ in range(ROUNDS // 20):
+        async with session() as db:
+            db_user = (await db.execute(stmt.options(selectinload(User.groups)))).scalar_one()
+            await db_user.inbounds()
+    lazy = (time.perf_counter() - start) / (ROUNDS // 20)
+
+    async with session() as db:
+        db_user = (await db.execute(stmt.options(selectinload(User.groups)))).scalar_one()
+        start = time.perf_counter()
+        for _ in range(ROUNDS):
+            indexed = await index.user_inbounds(db_user)
+        indexed_time = (time.perf_counter() - start) / ROUNDS
+
+    assert sorted(legacy) == sorted(indexed)
+    await engine.dispose()
+    return preloaded, lazy, indexed_time
+
+
+async def main():
+    print(f"{'groups':>7} {'preloaded':>12} {'lazy load':>12} {'index':>12}")
+    for groups in GROUP_COUNTS:
+        preloaded, lazy, indexed = await run(groups)
+        print(f"{groups:>7} {preloaded * 1e6:>10.1f}us {lazy * 1e6:>10.1f}us {indexed * 1e6:>10.1f}us")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,98 @@
+"""
+Compare the sing-box, xray and outline serialization through json.dumps with the UUID encoder class against
+the serializer layer, indented and compact, for 1, 50 and 500 outbounds. Uses orjson when it is installed.
+
+Run from the project root:
+    uv run python -m benchmarks.json_serializer
+"""
+
+import asyncio
+import json
+import time
+from datetime import datetime as dt, timedelta, timezone
+from types import SimpleNamespace
+
+from app.core.hosts import hosts as hosts_storage
+from app.core.manager import core_manager
+from app.db.models import UserStatus
+from app.models.user import UsersResponseWithInbounds
+from app.subscription import share
+from app.subscription.outline import OutlineConfiguration
+from app.subscription.singbox import SingBoxConfiguration
+from app.subscription.xray import XrayConfiguration
+from app.utils import serializer
+from app.utils.helpers import UUIDEncoder
+from app.utils.serializer import json_dumps
+from benchmarks.subscription_hosts import CORE_CONFIG, make_host
+
+OUTBOUNDS = (1, 50, 500)
+ROUNDS = 20
+FORMATS = (
+    ("sing-box", SingBoxConfiguration, 4),
+    ("xray", XrayConfiguration, 4),
+    ("outline", OutlineConfiguration, 0),
+)
+
+
+def measure(func) -> float:
+    func()
+    start = time.perf_counter()
+    for _ in range(ROUNDS):
+        func()
+    return (time.perf_counter() - start) / ROUNDS
+
+
+async def build(conf_class, user):
+    conf = conf_class()
+    await share.process_inbounds_and_tags(user, share.setup_format_variables(user), conf)
+    return conf.config
+
+
+async def main():
+    async def subscription_settings():
+        return SimpleNamespace(host_status_filter=False)
+
+    share.subscription_settings = subscription_settings
+
+    await core_manager.update_core(
+        SimpleNamespace(id=1, config=CORE_CONFIG, exclude_inbound_tags=set(), fallbacks_inbound_tags=set())
+    )
+    inbound_tags = list(await core_manager.get_inbounds())
+    user = UsersResponseWithInbounds(
+        id=1,
+        username="benchmark",
+        status=UserStatus.active,
+        used_traffic=0,
+        lifetime_used_traffic=0,
+        created_at=dt.now(timezone.utc),
+        expire=dt.now(timezone.utc) + timedelta(days=30),
+        inbounds=inbound_tags,
+    )
+
+    print(f"backend: {'orjson' if serializer.orjson else 'json'}")
+    legacy_settings = measure(lambda: json.loads(user.proxy_settings.model_dump_json()))
+    settings = measure(lambda: user.proxy_settings.dict())
+    print(f"proxy settings to plain types: {legacy_settings * 1e6:.1f}us -> {settings * 1e6:.1f}us")
+
+    print(f"{'format':>9} {'outbounds':>10} {'legacy':>10} {'indented':>10} {'compact':>10} {'size':>16}")
+    for outbounds in OUTBOUNDS:
+        hosts_storage.clear()
+        for i in range(outbounds):
+            hosts_storage[i] = make_host(i, inbound_tags[i % len(inbound_tags)])
+        hosts_storage.version += 1
+
+        for name, conf_class, indent in FORMATS:
+            config = await build(conf_class, user)
+            legacy_time = measure(lambda: json.dumps(config, indent=indent, cls=UUIDEncoder))
+            indented_time = measure(lambda: json_dumps(config, indent=indent))
+            compact_time = measure(lambda: json_dumps(config, indent=None))
+            assert json.loads(json_dumps(config, indent=indent)) == json.loads(json_dumps(config, indent=None))
+            sizes = f"{len(json_dumps(config, indent=indent))} -> {len(json_dumps(config, indent=None))}"
+            print(
+                f"{name:>9} {outbounds:>10} {legacy_time * 1e6:>8.1f}us {indented_time * 1e6:>8.1f}us"
+                f" {compact_time * 1e6:>8.1f}us {sizes:>16}"
+            )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
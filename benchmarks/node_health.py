@@ -0,0 +1,74 @@
+"""
+Compare the node health queries of the usage and stats jobs, each taking the manager's reader lock and
+awaiting every node's health one after the other, against the health snapshot, for 100, 500 and 1000
+simulated nodes. The nodes guard their health with a reader lock like the bridge does.
+
+Run from the project root:
+    uv run python -m benchmarks.node_health
+"""
+
+import asyncio
+import random
+import time
+
+from aiorwlock import RWLock
+from PasarGuardNodeBridge import Health
+
+from app.node.health import NodeHealthTable
+
+FLEETS = (100, 500, 1000)
+ROUNDS = 50
+HEALTHS = (Health.HEALTHY,) * 8 + (Health.BROKEN, Health.NOT_CONNECTED)
+
+
+class SimulatedNode:
+    def __init__(self, health: Health):
+        self._health = health
+        self._lock = RWLock()
+
+    async def get_health(self) -> Health:
+        async with self._lock.reader_lock:
+            return self._health
+
+
+async def legacy_buckets(lock: RWLock, nodes: dict[int, SimulatedNode]):
+    async def bucket(health: Health):
+        async with lock.reader_lock:
+            return [(id, node) for id, node in nodes.items() if (await node.get_health() == health)]
+
+    # healthy for the usage/stats jobs, broken and not connected for the health check
+    return await bucket(Health.HEALTHY), await bucket(Health.BROKEN), await bucket(Health.NOT_CONNECTED)
+
+
+async def measure(func, *args) -> float:
+    await func(*args)
+    start = time.perf_counter()
+    for _ in range(ROUNDS):
+        await func(*args)
+    return (time.perf_counter() - start) / ROUNDS
+
+
+async def main():
+    random.seed(1)
+    print(f"{'nodes':>6} {'legacy':>10} {'snapshot':>10} {'poll':>10}")
+    for fleet in FLEETS:
+        nodes = {i: SimulatedNode(random.choice(HEALTHS)) for i in range(fleet)}
+        table = NodeHealthTable(nodes, max_age=60)
+        lock = RWLock(fast=True)
+
+        snapshot = await table.poll()
+        healthy, broken, not_connected = await legacy_buckets(lock, nodes)
+        assert (list(snapshot.healthy), list(snapshot.broken), list(snapshot.not_connected)) == (
+            healthy,
+            broken,
+            not_connected,
+        )
+
+        legacy_time = await measure(legacy_buckets, lock, nodes)
+        snapshot_time = await measure(table.snapshot)
+        poll_time = await measure(table.poll)
+        print(f"{fleet:>6} {legacy_time * 1e6:>8.0f}us {snapshot_time * 1e6:>8.2f}us {poll_time * 1e6:>8.0f}us")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,68 @@
+"""
+Compare starting a fleet of 50 simulated nodes all at once against the reconnection scheduler. Each start
+pays a share of the panel's CPU for the user roster payload, so starts slow down with the number running
+at once, and a start taking over 10 seconds times out like ``connect_node`` does.
+
+Run from the project root:
+    uv run python -m benchmarks.node_reconnect
+"""
+
+import asyncio
+import time
+
+from app.node.reconnect import NodeReconnectScheduler
+
+NODES = 50
+START_TIME = 0.5
+TIMEOUT = 10
+SCALE = 0.01
+
+
+class Panel:
+    """Starts share the panel, each one takes ``START_TIME`` seconds times the starts running with it."""
+
+    def __init__(self):
+        self.running = 0
+        self.max_running = 0
+        self.timeouts = 0
+
+    async def start_node(self, node_id: int) -> bool:
+        self.running += 1
+        self.max_running = max(self.max_running, self.running)
+        duration = START_TIME * self.running
+        try:
+            await asyncio.sleep(min(duration, TIMEOUT) * SCALE)
+        finally:
+            self.running -= 1
+        if duration > TIMEOUT:
+            self.timeouts += 1
+            return False
+        return True
+
+
+async def main():
+    panel = Panel()
+    start = time.perf_counter()
+    await asyncio.gather(*[panel.start_node(node_id) for node_id in range(NODES)])
+    gather_time = (time.perf_counter() - start) / SCALE
+    print(
+        f"gather:    all attempted in {gather_time:>5.1f}s, {panel.max_running:>2} at once, {panel.timeouts} timed out"
+    )
+
+    for concurrency in (5, 10):
+        panel = Panel()
+        scheduler = NodeReconnectScheduler(panel.start_node, concurrency=concurrency)
+        start = time.perf_counter()
+        for node_id in range(NODES):
+            scheduler.schedule(node_id)
+        await scheduler.join()
+        scheduled_time = (time.perf_counter() - start) / SCALE
+        await scheduler.close()
+        print(
+            f"scheduler: all attempted in {scheduled_time:>5.1f}s, {panel.max_running:>2} at once,"
+            f" {panel.timeouts} timed out (concurrency {concurrency})"
+        )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
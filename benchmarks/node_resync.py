@@ -0,0 +1,56 @@
+"""
+Compare resyncing a node with the whole user roster against the delta from its sync ledger, for a roster
+of 20000 users of which 50 changed, 10 were added and 10 removed since the node's last sync.
+Shows the users and bytes sent to the node and the time spent computing the delta.
+
+Run from the project root:
+    uv run python -m benchmarks.node_resync
+"""
+
+import random
+import time
+import uuid
+
+from app.node.sync import NodeSyncLedger
+from app.node.user import serialize_user_for_node
+
+USERS = 20000
+CHANGED = 50
+ADDED = 10
+REMOVED = 10
+
+
+def make_user(user_id: int):
+    settings = {
+        "vless": {"id": str(uuid.uuid4())},
+        "trojan": {"password": uuid.uuid4().hex},
+        "shadowsocks": {"password": uuid.uuid4().hex, "method": "chacha20-ietf-poly1305"},
+    }
+    return serialize_user_for_node(user_id, f"user{user_id}", settings, ["vless", "trojan", "shadowsocks"])
+
+
+def size(users: list) -> int:
+    return sum(user.ByteSize() for user in users)
+
+
+def main():
+    random.seed(1)
+    synced = [make_user(user_id) for user_id in range(USERS)]
+    ledger = NodeSyncLedger()
+    ledger.record(synced)
+
+    roster = synced[REMOVED:] + [make_user(USERS + i) for i in range(ADDED)]
+    for index in random.sample(range(len(roster) - ADDED), CHANGED):
+        roster[index] = make_user(int(roster[index].email.split(".")[0]))
+
+    start = time.perf_counter()
+    changes = ledger.diff(roster)
+    diff_time = time.perf_counter() - start
+
+    print(f"{USERS} users, {CHANGED} changed, {ADDED} added, {REMOVED} removed")
+    print(f"full:  {len(roster):>6} users {size(roster) / 1024:>9.1f}KiB")
+    print(f"delta: {len(changes):>6} users {size(changes) / 1024:>9.1f}KiB, computed in {diff_time * 1e3:.1f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+Compare pushing every user edit to all nodes inline against the per-node change queues, for 1000 edits of
+200 users on 20 simulated nodes, one of them slow. Shows the latency the caller waits for and what the
+nodes receive.
+
+Run from the project root:
+    uv run python -m benchmarks.node_user_changes
+"""
+
+import asyncio
+import random
+import time
+
+from app.node.changes import NodeChangeQueue
+
+NODES = 20
+USERS = 200
+EDITS = 1000
+CALL_LATENCY = 0.002
+SLOW_CALL_LATENCY = 0.05
+
+
+class SimulatedNode:
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.calls = 0
+        self.users = 0
+
+    async def update_user(self, user):
+        self.calls += 1
+        self.users += 1
+        await asyncio.sleep(self.latency)
+
+    async def update_users(self, users: list):
+        self.calls += 1
+        self.users += len(users)
+        await asyncio.sleep(self.latency)
+
+
+def make_nodes() -> list[SimulatedNode]:
+    return [SimulatedNode(SLOW_CALL_LATENCY if i == 0 else CALL_LATENCY) for i in range(NODES)]
+
+
+async def main():
+    random.seed(1)
+    edits = [random.randint(1, USERS) for _ in range(EDITS)]
+
+    nodes = make_nodes()
+    start = time.perf_counter()
+    for user_id in edits:
+        await asyncio.gather(*[node.update_user(user_id) for node in nodes], return_exceptions=True)
+    inline_time = time.perf_counter() - start
+    inline_calls = sum(node.calls for node in nodes)
+    inline_users = sum(node.users for node in nodes)
+
+    nodes = make_nodes()
+    queues = [NodeChangeQueue(i, node, None, delay=0.2) for i, node in enumerate(nodes)]
+    start = time.perf_counter()
+    for user_id in edits:
+        for changes in queues:
+            changes.push(user_id, user_id)
+        # let the workers run between edits like between requests
+        await asyncio.sleep(0)
+    queued_time = time.perf_counter() - start
+    await asyncio.gather(*[changes.close() for changes in queues])
+    drained_time = time.perf_counter() - start
+    queued_calls = sum(node.calls for node in nodes)
+    queued_users = sum(node.users for node in nodes)
+    stats = queues[0].stats()
+
+    latencies = f"{CALL_LATENCY * 1e3:.0f}ms calls, one at {SLOW_CALL_LATENCY * 1e3:.0f}ms"
+    print(f"{EDITS} edits of {USERS} users, {NODES} nodes ({latencies})")
+    print(
+        f"inline: {inline_time / EDITS * 1e6:>9.1f}us per edit, {inline_calls} node calls, {inline_users} users pushed"
+    )
+    print(
+        f"queued: {queued_time / EDITS * 1e6:>9.1f}us per edit, {queued_calls} node calls, {queued_users} users pushed,"
+        f" all shipped after {drained_time * 1e3:.0f}ms"
+    )
+    print(f"per node: {stats.coalesced} edits coalesced, {stats.batches} batches, max {stats.max_pending} pending")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,78 @@
+"""
+Compare the startup time spent on public ip discovery when the lookup services never answer (a firewalled
+host): the blocking sequential lookups done at import time against the concurrent discovery running in the
+background with its on-disk cache. A local server that accepts connections without answering stands in for
+the services, and the lookup timeout is lowered to keep the run short.
+
+Run from the project root:
+    uv run python -m benchmarks.public_ip_startup
+"""
+
+import asyncio
+import socket
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+import httpx
+
+from app.utils import system
+from app.utils.public_ip import PublicIP
+
+TIMEOUT = 1
+
+
+def blackhole() -> str:
+    server = socket.socket()
+    server.bind(("127.0.0.1", 0))
+    server.listen(64)
+    connections = []
+
+    def accept():
+        while True:
+            connections.append(server.accept()[0])
+
+    threading.Thread(target=accept, daemon=True).start()
+    return f"http://127.0.0.1:{server.getsockname()[1]}/"
+
+
+def legacy_lookup(urls: tuple[str, ...]) -> None:
+    for url in urls:
+        try:
+            httpx.get(url, timeout=TIMEOUT)
+        except Exception:
+            pass
+
+
+async def main():
+    url = blackhole()
+    system.IPV4_SERVICES = (url,) * 3
+    system.IPV6_SERVICES = (url,) * 2
+    system.PUBLIC_IP_TIMEOUT = TIMEOUT
+
+    start = time.perf_counter()
+    legacy_lookup(system.IPV4_SERVICES)
+    legacy_lookup(system.IPV6_SERVICES)
+    legacy_time = time.perf_counter() - start
+
+    with tempfile.TemporaryDirectory() as tmp:
+        cache_file = Path(tmp) / "public_ip.json"
+        cache_file.write_text('{"ipv4": "203.0.113.7", "ipv6": "[2001:db8::7]"}')
+        public_ip = PublicIP(cache_file=str(cache_file), ipv4="", ipv6="")
+
+        start = time.perf_counter()
+        discovery = asyncio.create_task(public_ip.discover())
+        addresses = (public_ip.ipv4, public_ip.ipv6)
+        startup_time = time.perf_counter() - start
+        await discovery
+        discovery_time = time.perf_counter() - start
+
+    print(f"5 unanswered lookups, {TIMEOUT}s timeout each")
+    print(f"blocking sequential lookups at import: {legacy_time:>7.3f}s")
+    print(f"background discovery, startup blocked: {startup_time:>7.3f}s, serving {', '.join(addresses)} from cache")
+    print(f"background discovery finished after:   {discovery_time:>7.3f}s")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,85 @@
+"""
+Compare the legacy SELECT/INSERT/UPDATE node user usage recording with the single-statement upsert.
+
+Run from the project root:
+    uv run python -m benchmarks.record_usages
+"""
+
+import asyncio
+import random
+import time
+from datetime import datetime as dt, timezone as tz
+
+from sqlalchemy import and_, bindparam, insert, select, update
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from app.db.base import Base
+from app.db.models import NodeUserUsage
+from app.jobs.record_usages import safe_execute, upsert_node_user_usages
+
+USER_COUNTS = (10_000, 50_000, 100_000)
+TICKS = 3
+NODE_ID = 1
+
+
+async def legacy_record_user_stats(db: AsyncSession, params: list[dict], node_id: int, created_at: dt):
+    select_stmt = select(NodeUserUsage.user_id).where(
+        and_(NodeUserUsage.node_id == node_id, NodeUserUsage.created_at == created_at)
+    )
+    existing_users = set((await db.execute(select_stmt)).scalars().all())
+
+    new_users = [{"uid": p["uid"]} for p in params if p["uid"] not in existing_users]
+    if new_users:
+        insert_stmt = insert(NodeUserUsage).values(
+            user_id=bindparam("uid"), created_at=created_at, node_id=node_id, used_traffic=0
+        )
+        await safe_execute(db, insert_stmt, new_users)
+
+    update_stmt = (
+        update(NodeUserUsage)
+        .values(used_traffic=NodeUserUsage.used_traffic + bindparam("value"))
+        .where(
+            and_(
+                NodeUserUsage.user_id == bindparam("uid"),
+                NodeUserUsage.node_id == node_id,
+                NodeUserUsage.created_at == created_at,
+            )
+        )
+    )
+    await safe_execute(db, update_stmt, params)
+
+
+async def upsert_record_user_stats(db: AsyncSession, params: list[dict], node_id: int, created_at: dt):
+    await upsert_node_user_usages(db, params, node_id, created_at)
+
+
+async def run(record, users: int) -> float:
+    engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+
+    session_maker = async_sessionmaker(bind=engine)
+    created_at = dt.now(tz.utc).replace(minute=0, second=0, microsecond=0)
+    ticks = [[{"uid": uid, "value": random.randint(1, 1 << 20)} for uid in range(1, users + 1)] for _ in range(TICKS)]
+
+    elapsed = 0.0
+    for params in ticks:
+        async with session_maker() as db:
+            start = time.perf_counter()
+            await record(db, params, NODE_ID, created_at)
+            elapsed += time.perf_counter() - start
+
+    await engine.dispose()
+    return elapsed / TICKS
+
+
+async def main():
+    print(f"{'users':>8} {'legacy (s/tick)':>16} {'upsert (s/tick)':>16} {'speedup':>8}")
+    for users in USER_COUNTS:
+        legacy = await run(legacy_record_user_stats, users)
+        upsert = await run(upsert_record_user_stats, users)
+        print(f"{users:>8} {legacy:>16.3f} {upsert:>16.3f} {legacy / upsert:>7.2f}x")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
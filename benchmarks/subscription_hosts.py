@@ -0,0 +1,269 @@
+"""
+Compare per-request host processing (deep copy of the core inbound and host merge per host) with the
+precompiled hosts, on 200 hosts for every subscription format.
+
+Run from the project root:
+    uv run python -m benchmarks.subscription_hosts
+"""
+
+import asyncio
+import random
+import secrets
+import time
+from datetime import datetime as dt, timedelta, timezone
+from types import SimpleNamespace
+
+from app.core.hosts import hosts as hosts_storage
+from app.core.manager import core_manager, thaw
+from app.db.models import UserStatus
+from app.models.user import UsersResponseWithInbounds
+from app.subscription import share
+from app.subscription.share import StandardLinks, XrayConfiguration, generate_subscription
+
+HOSTS = 200
+ROUNDS = 10
+FORMATS = (
+    ("links", False),
+    ("links", True),
+    ("xray", False),
+    ("sing-box", False),
+    ("clash", False),
+    ("clash-meta", False),
+    ("outline", False),
+)
+
+CORE_CONFIG = {
+    "log": {"loglevel": "warning"},
+    "inbounds": [
+        {
+            "tag": "VLESS WS",
+            "listen": "0.0.0.0",
+            "port": 2053,
+            "protocol": "vless",
+            "settings": {"clients": [], "decryption": "none"},
+            "streamSettings": {"network": "ws", "wsSettings": {"path": "/vless"}},
+        },
+        {
+            "tag": "VMess TCP",
+            "listen": "0.0.0.0",
+            "port": 2054,
+            "protocol": "vmess",
+            "settings": {"clients": []},
+            "streamSettings": {"network": "tcp"},
+        },
+        {
+            "tag": "Trojan gRPC",
+            "listen": "0.0.0.0",
+            "port": 2055,
+            "protocol": "trojan",
+            "settings": {"clients": []},
+            "streamSettings": {"network": "grpc", "grpcSettings": {"serviceName": "trojan"}},
+        },
+        {
+            "tag": "Shadowsocks TCP",
+            "listen": "0.0.0.0",
+            "port": 1080,
+            "protocol": "shadowsocks",
+            "settings": {"clients": [], "network": "tcp,udp"},
+        },
+    ],
+    "outbounds": [{"protocol": "freedom", "tag": "DIRECT"}],
+}
+
+
+def make_host(i: int, inbound_tag: str) -> dict:
+    return {
+        "remark": f"{{USERNAME}} {i} [{{PROTOCOL}} - {{TRANSPORT}}]",
+        "inbound_tag": inbound_tag,
+        "address": [f"{i}.example.com", f"{i}.example.net"],
+        "port": None,
+        "path": None,
+        "sni": [f"sni-{i}.example.com"],
+        "host": [],
+        "alpn": [],
+        "fingerprint": "chrome",
+        "tls": None,
+        "allowinsecure": False,
+        "fragment_settings": None,
+        "noise_settings": None,
+        "random_user_agent": False,
+        "use_sni_as_host": False,
+        "http_headers": None,
+        "mux_settings": {},
+        "transport_settings": {},
+        "status": [],
+        "ech_config_list": None,
+        "downloadSettings": None,
+    }
+
+
+async def legacy_process_host(host: dict, format_variables: dict, inbounds: list[str], proxies: dict, conf):
+    tag = host["inbound_tag"]
+    if tag not in inbounds:
+        return
+
+    host_inbound: dict = thaw(await core_manager.get_inbound_by_tag(tag))
+    protocol = host_inbound["protocol"]
+    settings = proxies.get(protocol)
+    if not settings:
+        return
+
+    if "flow" in host_inbound:
+        if settings["flow"] == "":
+            settings["flow"] = "" if host_inbound["flow"] == "none" else host_inbound["flow"]
+
+    format_variables.update({"PROTOCOL": protocol})
+    format_variables.update({"TRANSPORT": host_inbound["network"]})
+    sni = ""
+    if sni_list := host["sni"] or host_inbound["sni"]:
+        sni = random.choice(sni_list).replace("*", secrets.token_hex(8))
+    req_host = ""
+    if req_host_list := host["host"] or host_inbound["host"]:
+        req_host = random.choice(req_host_list).replace("*", secrets.token_hex(8))
+    address = ""
+    if host["address"]:
+        address = random.choice(host["address"]).replace("*", secrets.token_hex(8))
+    if sids := host_inbound.get("sids"):
+        host_inbound["sid"] = random.choice(sids)
+
+    if host["path"] is not None:
+        path = host["path"].format_map(format_variables)
+    else:
+        path = host_inbound.get("path", "").format_map(format_variables)
+    if host.get("use_sni_as_host", False) and sni:
+        req_host = sni
+
+    host_inbound.update(
+        {
+            "port": host["port"] or host_inbound["port"],
+            "sni": sni,
+            "host": req_host,
+            "tls": host_inbound["tls"] if host["tls"] is None else host["tls"],
+            "alpn": host["alpn"] if host["alpn"] else None,
+            "path": path,
+            "fp": host["fingerprint"] or host_inbound.get("fp", ""),
+            "ais": host["allowinsecure"] or host_inbound.get("allowinsecure", ""),
+            "fragment_settings": host["fragment_settings"],
+            "noise_settings": host["noise_settings"],
+            "random_user_agent": host["random_user_agent"],
+            "http_headers": host["http_headers"],
+            "mux_settings": host["mux_settings"],
+            "ech_config_list": host["ech_config_list"],
+        },
+    )
+    if ts := host["transport_settings"]:
+        for v in ts.values():
+            if v:
+                if "type" in v:
+                    v["header_type"] = v["type"]
+                host_inbound.update(v)
+
+    if host.get("downloadSettings"):
+        ds_data = await legacy_process_host(host["downloadSettings"], format_variables, inbounds, proxies, conf)
+        if ds_data and ds_data[0]:
+            ds_data[0]["address"] = ds_data[2].format_map(format_variables)
+            if isinstance(conf, StandardLinks):
+                host_inbound["downloadSettings"] = XrayConfiguration().download_config(ds_data[0], True)
+            else:
+                host_inbound["downloadSettings"] = ds_data[0]
+
+    return host_inbound, settings, address
+
+
+async def legacy_process_inbounds_and_tags(user, format_variables: dict, conf, reverse=False):
+    proxy_settings = user.proxy_settings.dict()
+    for host in hosts_storage.values():
+        host_data = await legacy_process_host(host, format_variables, user.inbounds, proxy_settings, conf)
+        if not host_data:
+            continue
+        host_inbound, settings, address = host_data
+        if host_inbound:
+            conf.add(
+                remark=host["remark"].format_map(format_variables),
+                address=address.format_map(format_variables),
+                inbound=host_inbound,
+                settings=settings,
+            )
+    return conf.render(reverse=reverse)
+
+
+class NullConfiguration:
+    """Drops every host, isolates the host processing cost from the format specific rendering."""
+
+    def add(self, **kwargs):
+        pass
+
+    def render(self, reverse=False):
+        return ""
+
+
+async def render_all(user, seed: int) -> list[str]:
+    random.seed(seed)
+    return [await generate_subscription(user, config_format, as_base64) for config_format, as_base64 in FORMATS]
+
+
+async def measure(user, config_format: str | None, as_base64: bool = False) -> float:
+    start = time.perf_counter()
+    for _ in range(ROUNDS):
+        if config_format is None:
+            await share.process_inbounds_and_tags(user, share.setup_format_variables(user), NullConfiguration())
+        else:
+            await generate_subscription(user, config_format, as_base64)
+    return (time.perf_counter() - start) / ROUNDS
+
+
+async def measure_all(user) -> list[float]:
+    return [await measure(user, None)] + [
+        await measure(user, config_format, as_base64) for config_format, as_base64 in FORMATS
+    ]
+
+
+async def main():
+    async def subscription_settings():
+        return SimpleNamespace(host_status_filter=False)
+
+    share.subscription_settings = subscription_settings
+
+    await core_manager.update_core(
+        SimpleNamespace(id=1, config=CORE_CONFIG, exclude_inbound_tags=set(), fallbacks_inbound_tags=set())
+    )
+    inbound_tags = await core_manager.get_inbounds()
+    for i in range(HOSTS):
+        hosts_storage[i] = make_host(i, inbound_tags[i % len(inbound_tags)])
+    hosts_storage.version += 1
+
+    user = UsersResponseWithInbounds(
+        id=1,
+        username="benchmark",
+        status=UserStatus.active,
+        used_traffic=0,
+        lifetime_used_traffic=0,
+        created_at=dt.now(timezone.utc),
+        expire=dt.now(timezone.utc) + timedelta(days=30),
+        inbounds=inbound_tags,
+    )
+
+    compiled = await render_all(user, seed=1)
+    compiled_times = await measure_all(user)
+
+    compiled_process = share.process_inbounds_and_tags
+    share.process_inbounds_and_tags = legacy_process_inbounds_and_tags
+    legacy = await render_all(user, seed=1)
+    legacy_times = await measure_all(user)
+    share.process_inbounds_and_tags = compiled_process
+
+    assert legacy == compiled, "compiled hosts render differently"
+
+    print(f"{HOSTS} hosts, outputs identical")
+    print(f"{'format':>16} {'legacy':>10} {'compiled':>10} {'speedup':>8}")
+    names = ["hosts only"] + [
+        config_format + (" (base64)" if as_base64 else "") for config_format, as_base64 in FORMATS
+    ]
+    for name, legacy_time, compiled_time in zip(names, legacy_times, compiled_times):
+        print(
+            f"{name:>16} {legacy_time * 1e3:>8.2f}ms {compiled_time * 1e3:>8.2f}ms {legacy_time / compiled_time:>7.2f}x"
+        )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,99 @@
+"""
+Compare rendering a subscription as a whole string (then base64 and encoding it for the response) against
+the chunked rendering consumed chunk by chunk, in time and peak traced memory, and show the response size
+with gzip, for the links, links base64, xray and sing-box formats with 100 and 1000 hosts.
+
+Run from the project root:
+    uv run python -m benchmarks.subscription_streaming
+"""
+
+import asyncio
+import time
+import tracemalloc
+from datetime import datetime as dt, timedelta, timezone
+from types import SimpleNamespace
+
+from app.core.hosts import hosts as hosts_storage
+from app.core.manager import core_manager
+from app.db.models import UserStatus
+from app.models.user import UsersResponseWithInbounds
+from app.subscription import share
+from app.subscription.streaming import compress_chunks
+from benchmarks.subscription_hosts import CORE_CONFIG, make_host
+
+HOSTS = (100, 1000)
+ROUNDS = 5
+FORMATS = (
+    ("links", "links", False),
+    ("links_base64", "links", True),
+    ("xray", "xray", False),
+    ("sing-box", "sing-box", False),
+)
+
+
+async def whole(user, config_format: str, as_base64: bool) -> int:
+    config = await share.generate_subscription(user, config_format, as_base64)
+    return len(config.encode())
+
+
+async def chunked(user, config_format: str, as_base64: bool, encoding: str = "identity") -> int:
+    chunks = await share.generate_subscription_chunks(user, config_format, as_base64)
+    return sum(len(chunk) for chunk in compress_chunks(chunks, encoding))
+
+
+async def measure(func, *args) -> tuple[float, int, int]:
+    size = await func(*args)
+    start = time.perf_counter()
+    for _ in range(ROUNDS):
+        await func(*args)
+    elapsed = (time.perf_counter() - start) / ROUNDS
+
+    tracemalloc.start()
+    await func(*args)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return elapsed, peak, size
+
+
+async def main():
+    async def subscription_settings():
+        return SimpleNamespace(host_status_filter=False)
+
+    share.subscription_settings = subscription_settings
+
+    await core_manager.update_core(
+        SimpleNamespace(id=1, config=CORE_CONFIG, exclude_inbound_tags=set(), fallbacks_inbound_tags=set())
+    )
+    inbound_tags = list(await core_manager.get_inbounds())
+    user = UsersResponseWithInbounds(
+        id=1,
+        username="benchmark",
+        status=UserStatus.active,
+        used_traffic=0,
+        lifetime_used_traffic=0,
+        created_at=dt.now(timezone.utc),
+        expire=dt.now(timezone.utc) + timedelta(days=30),
+        inbounds=inbound_tags,
+    )
+
+    print(f"{'format':>13} {'hosts':>6} {'whole':>18} {'chunked':>18} {'size':>9} {'gzip':>9}")
+    for hosts in HOSTS:
+        hosts_storage.clear()
+        for i in range(hosts):
+            hosts_storage[i] = make_host(i, inbound_tags[i % len(inbound_tags)])
+        hosts_storage.version += 1
+
+        for name, config_format, as_base64 in FORMATS:
+            whole_time, whole_peak, size = await measure(whole, user, config_format, as_base64)
+            chunked_time, chunked_peak, chunked_size = await measure(chunked, user, config_format, as_base64)
+            assert chunked_size == size
+            gzip_size = await chunked(user, config_format, as_base64, "gzip")
+            print(
+                f"{name:>13} {hosts:>6} {whole_time * 1e3:>6.1f}ms {whole_peak / 1024:>6.0f}KiB"
+                f" {chunked_time * 1e3:>6.1f}ms {chunked_peak / 1024:>6.0f}KiB"
+                f" {size / 1024:>6.0f}KiB {gzip_size / 1024:>6.0f}KiB"
+            )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,83 @@
+"""
+Compare per-request subscription construction cost with templates rendered and parsed on every request
+against the cached template artifacts.
+
+Run from the project root:
+    uv run python -m benchmarks.subscription_templates
+"""
+
+import json
+import time
+
+from app.subscription import SingBoxConfiguration, StandardLinks, XrayConfiguration
+from app.templates import render_template
+from config import (
+    GRPC_USER_AGENT_TEMPLATE,
+    SINGBOX_SUBSCRIPTION_TEMPLATE,
+    USER_AGENT_TEMPLATE,
+    XRAY_SUBSCRIPTION_TEMPLATE,
+)
+
+ROUNDS = 2000
+XRAY_HOSTS = 20
+
+
+def legacy_base():
+    user_agent_data = json.loads(render_template(USER_AGENT_TEMPLATE))
+    grpc_user_agent_data = json.loads(render_template(GRPC_USER_AGENT_TEMPLATE))
+    return user_agent_data.get("list", []), grpc_user_agent_data.get("list", [])
+
+
+def legacy_links():
+    legacy_base()
+
+
+def legacy_singbox():
+    legacy_base()
+    json.loads(render_template(SINGBOX_SUBSCRIPTION_TEMPLATE))
+
+
+def legacy_xray():
+    legacy_base()
+    template = render_template(XRAY_SUBSCRIPTION_TEMPLATE)
+    for _ in range(XRAY_HOSTS):
+        json.loads(template)
+
+
+def cached_links():
+    StandardLinks()
+
+
+def cached_singbox():
+    SingBoxConfiguration()
+
+
+def cached_xray():
+    conf = XrayConfiguration()
+    for i in range(XRAY_HOSTS):
+        conf.add_config(f"host-{i}", [])
+
+
+def measure(func) -> float:
+    func()  # warm up jinja and the artifact cache
+    start = time.perf_counter()
+    for _ in range(ROUNDS):
+        func()
+    return (time.perf_counter() - start) / ROUNDS
+
+
+def main():
+    cases = (
+        ("links", legacy_links, cached_links),
+        ("sing-box", legacy_singbox, cached_singbox),
+        (f"xray ({XRAY_HOSTS} hosts)", legacy_xray, cached_xray),
+    )
+    print(f"{'format':>16} {'legacy':>10} {'cached':>10} {'speedup':>8}")
+    for name, legacy, cached in cases:
+        legacy_time = measure(legacy)
+        cached_time = measure(cached)
+        print(f"{name:>16} {legacy_time * 1e6:>8.1f}us {cached_time * 1e6:>8.1f}us {legacy_time / cached_time:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+Compare recording subscription fetches with an insert and commit per request against the queue flushed
+in one bulk insert, on a sqlite file database.
+
+Run from the project root:
+    uv run python -m benchmarks.subscription_updates
+"""
+
+import asyncio
+import random
+import tempfile
+import time
+from pathlib import Path
+
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from app.db.base import Base
+from app.db.models import Admin, User, UserSubscriptionUpdate
+from app.subscription.updates import SubscriptionUpdateQueue
+
+USERS = 500
+FETCHES = 5000
+CLIENTS_LIMIT = 10
+USER_AGENTS = ("v2rayNG/1.9.46", "ClashMetaForAndroid/2.10.1", "Happ/2.0.1", "SFA/1.9.3", "Hiddify/2.5.7")
+
+
+async def setup(path: Path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{path}")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    session = async_sessionmaker(engine, expire_on_commit=False)
+    async with session() as db:
+        admin = Admin(username="admin", hashed_password="-")
+        db.add(admin)
+        await db.flush()
+        db.add_all([User(username=f"user-{i}", proxy_settings={}, admin_id=admin.id) for i in range(USERS)])
+        await db.commit()
+    return engine, session
+
+
+async def count_rows(session) -> int:
+    async with session() as db:
+        return (await db.execute(select(func.count(UserSubscriptionUpdate.id)))).scalar()
+
+
+async def main():
+    random.seed(1)
+    fetches = [(random.randint(1, USERS), random.choice(USER_AGENTS)) for _ in range(FETCHES)]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine, session = await setup(Path(tmp) / "legacy.sqlite3")
+        start = time.perf_counter()
+        for user_id, user_agent in fetches:
+            async with session() as db:
+                db.add(UserSubscriptionUpdate(user_id=user_id, user_agent=user_agent))
+                await db.commit()
+        legacy_time = time.perf_counter() - start
+        legacy_rows = await count_rows(session)
+        await engine.dispose()
+
+        engine, session = await setup(Path(tmp) / "queue.sqlite3")
+        queue = SubscriptionUpdateQueue(maxsize=FETCHES, limit=CLIENTS_LIMIT)
+        start = time.perf_counter()
+        for user_id, user_agent in fetches:
+            queue.record(user_id, user_agent)
+        record_time = time.perf_counter() - start
+        async with session() as db:
+            start = time.perf_counter()
+            await queue.flush(db)
+            flush_time = time.perf_counter() - start
+        queue_rows = await count_rows(session)
+        await engine.dispose()
+
+    print(f"{FETCHES} fetches of {USERS} users, {len(USER_AGENTS)} clients")
+    print(f"insert + commit per fetch: {legacy_time * 1e3:>8.1f}ms total, {legacy_time / FETCHES * 1e6:.1f}us/fetch")
+    print(f"queue record:              {record_time * 1e3:>8.1f}ms total, {record_time / FETCHES * 1e6:.1f}us/fetch")
+    print(f"queue flush:               {flush_time * 1e3:>8.1f}ms total")
+    print(f"rows written: {legacy_rows} -> {queue_rows} ({queue.coalesced} fetches coalesced)")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,81 @@
+"""
+Compare verifying subscription and admin tokens on every request against the verified token cache, and the
+admin lookup of API authentication with and without the admin record cache, on a sqlite file database.
+
+Run from the project root:
+    uv run python -m benchmarks.token_cache
+"""
+
+import asyncio
+import tempfile
+import time
+from pathlib import Path
+
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from app.db.base import Base
+from app.db.models import Admin, User
+from app.operation.admin import admin_cache
+from app.routers import authentication
+from app.utils import jwt as jwt_utils
+
+ROUNDS = 2000
+SECRET_KEY = "benchmark-secret-key"
+
+
+async def secret_key():
+    return SECRET_KEY
+
+
+async def measure(func, *args) -> float:
+    await func(*args)
+    start = time.perf_counter()
+    for _ in range(ROUNDS):
+        await func(*args)
+    return (time.perf_counter() - start) / ROUNDS
+
+
+async def main():
+    jwt_utils.get_secret_key = secret_key
+    legacy_token = await jwt_utils.create_subscription_token("benchmark")
+    jwt_token = jwt_utils.jwt.encode(
+        {"sub": "benchmark", "access": "subscription", "iat": int(time.time())}, SECRET_KEY, algorithm="HS256"
+    )
+    admin_token = await jwt_utils.create_admin_token("admin", is_sudo=True)
+
+    print(f"{'token':>14} {'verified':>10} {'cached':>10}")
+    for name, cache, verify, token in (
+        ("subscription", jwt_utils.subscription_tokens, jwt_utils.get_subscription_payload, legacy_token),
+        ("jwt sub", jwt_utils.subscription_tokens, jwt_utils.get_subscription_payload, jwt_token),
+        ("admin", jwt_utils.admin_tokens, jwt_utils.get_admin_payload, admin_token),
+    ):
+        cache.maxsize = 0
+        uncached = await measure(verify, token)
+        cache.maxsize = 10000
+        cached = await measure(verify, token)
+        print(f"{name:>14} {uncached * 1e6:>8.1f}us {cached * 1e6:>8.1f}us")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_async_engine(f"sqlite+aiosqlite:///{Path(tmp) / 'admins.sqlite3'}")
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        session = async_sessionmaker(engine, expire_on_commit=False)
+        async with session() as db:
+            admin = Admin(username="admin", hashed_password="-", is_sudo=True)
+            db.add(admin)
+            await db.flush()
+            db.add_all([User(username=f"user-{i}", proxy_settings={}, admin_id=admin.id) for i in range(200)])
+            await db.commit()
+
+        async with session() as db:
+            admin_cache.ttl = 0
+            uncached = await measure(authentication.get_admin, db, admin_token)
+            admin_cache.ttl = 5
+            cached = await measure(authentication.get_admin, db, admin_token)
+        await engine.dispose()
+
+    print(f"admin lookup (200 users): {uncached * 1e6:.1f}us -> {cached * 1e6:.1f}us per api call")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
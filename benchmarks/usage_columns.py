@@ -0,0 +1,107 @@
+"""
+Compare memory and time of the dict based usage pipeline with the array backed `UsageColumns` pipeline.
+
+Both paths parse user stats of every node, apply node coefficients, sum usage across nodes and
+prepare the per-node rows, without touching the database.
+
+Run from the project root:
+    uv run python -m benchmarks.usage_columns
+"""
+
+import gc
+import random
+import time
+import tracemalloc
+from collections import defaultdict
+from datetime import datetime as dt, timezone as tz
+from operator import attrgetter
+
+from PasarGuardNodeBridge.common.service_pb2 import Stat, StatResponse
+
+from app.usage import UsageAccumulator, UsageColumns
+
+NODES = 15
+USERS = 40_000
+
+
+def build_responses() -> dict[int, StatResponse]:
+    responses = {}
+    for node_id in range(1, NODES + 1):
+        stats = []
+        for uid in range(1, USERS + 1):
+            stats.append(Stat(name=f"{uid}.user{uid}", link="uplink", value=random.randint(0, 1 << 20)))
+            stats.append(Stat(name=f"{uid}.user{uid}", link="downlink", value=random.randint(0, 1 << 24)))
+        responses[node_id] = StatResponse(stats=stats)
+    return responses
+
+
+def dict_pipeline(responses: dict[int, StatResponse], coefficients: dict[int, float]):
+    api_params = {}
+    for node_id, response in responses.items():
+        params = defaultdict(int)
+        for stat in filter(attrgetter("value"), response.stats):
+            params[stat.name.split(".", 1)[0]] += stat.value
+        api_params[node_id] = list({"uid": int(uid), "value": value} for uid, value in params.items())
+
+    users_usage = defaultdict(int)
+    for node_id, params in api_params.items():
+        coeff = coefficients.get(node_id, 1)
+        for uid, value in ((int(param["uid"]), int(param["value"] * coeff)) for param in params):
+            users_usage[uid] += value
+    users_usage = [{"uid": uid, "value": value} for uid, value in users_usage.items()]
+
+    node_rows = {}
+    for node_id, params in api_params.items():
+        new_users = [{"uid": int(p["uid"])} for p in params]
+        update_params = [{"uid": int(p["uid"]), "value": p["value"]} for p in params]
+        node_rows[node_id] = (new_users, update_params)
+
+    return users_usage, node_rows
+
+
+def columns_pipeline(responses: dict[int, StatResponse], coefficients: dict[int, float]):
+    api_params = {}
+    for node_id, response in responses.items():
+        params = defaultdict(int)
+        for stat in filter(attrgetter("value"), response.stats):
+            params[int(stat.name.split(".", 1)[0])] += stat.value
+        api_params[node_id] = UsageColumns.from_dict(params).scale(coefficients[node_id])
+
+    # the accumulator sums the users across nodes as each node's columns are added
+    accumulator = UsageAccumulator()
+    now = dt.now(tz.utc)
+    for node_id, node_usage in api_params.items():
+        accumulator.add_users(node_usage, now)
+        accumulator.add_node_users(node_id, node_usage, now)
+
+    return accumulator
+
+
+def measure(pipeline, responses, coefficients) -> tuple[float, float]:
+    gc.collect()
+    start = time.perf_counter()
+    pipeline(responses, coefficients)
+    elapsed = time.perf_counter() - start
+
+    gc.collect()
+    tracemalloc.start()
+    result = pipeline(responses, coefficients)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return elapsed, peak / (1 << 20)
+
+
+def main():
+    responses = build_responses()
+    coefficients = {node_id: random.choice((1, 1.5, 2)) for node_id in responses}
+
+    print(f"{NODES} nodes x {USERS} users")
+    print(f"{'pipeline':>10} {'time (s)':>10} {'peak (MiB)':>12}")
+    for name, pipeline in (("dict", dict_pipeline), ("columns", columns_pipeline)):
+        elapsed, peak = measure(pipeline, responses, coefficients)
+        print(f"{name:>10} {elapsed:>10.3f} {peak:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+Compare reviewing users with a periodic scan of every user against the deadline heaps of the user review,
+for 100000 active users of which 1000 expire during a simulated hour. Shows the work done per review
+and how late users are expired. The scan stands in for the ``is_expired`` query the database runs.
+
+Run from the project root:
+    uv run python -m benchmarks.user_review
+"""
+
+import random
+import time
+from datetime import datetime as dt, timezone as tz
+from types import SimpleNamespace
+
+from app.db.models import UserStatus
+from app.usage import UsageAccumulator
+from app.usage.review import UserReview
+
+USERS = 100000
+EXPIRING = 1000
+HOUR = 3600
+SCAN_INTERVAL = 30
+REVIEW_INTERVAL = 1
+
+
+def main():
+    random.seed(1)
+    start = dt.now(tz.utc).timestamp()
+    expires = [start + HOUR * 24 for _ in range(USERS)]
+    for user_id in random.sample(range(USERS), EXPIRING):
+        expires[user_id] = start + random.uniform(0, HOUR)
+
+    # periodic scan, every user is checked on each run
+    expired: set[int] = set()
+    lateness = []
+    scan_time = 0.0
+    for now in range(SCAN_INTERVAL, HOUR + 1, SCAN_INTERVAL):
+        now += start
+        begin = time.perf_counter()
+        due = [user_id for user_id, expire in enumerate(expires) if expire <= now and user_id not in expired]
+        scan_time += time.perf_counter() - begin
+        expired.update(due)
+        lateness.extend(now - expires[user_id] for user_id in due)
+    scans = HOUR // SCAN_INTERVAL
+    print(
+        f"scan every {SCAN_INTERVAL}s: {scan_time / scans * 1e3:>7.2f}ms per review,"
+        f" {len(lateness)} expired, {sum(lateness) / len(lateness):>5.1f}s late on average"
+    )
+
+    # deadline heaps, reviewed when the earliest deadline is due (polled every second here)
+    review = UserReview(UsageAccumulator())
+    begin = time.perf_counter()
+    for user_id, expire in enumerate(expires):
+        review.update(
+            SimpleNamespace(
+                id=user_id,
+                status=UserStatus.active,
+                expire=dt.fromtimestamp(expire, tz.utc),
+                data_limit=None,
+                used_traffic=0,
+                on_hold_timeout=None,
+            )
+        )
+    build_time = time.perf_counter() - begin
+
+    lateness = []
+    review_time = 0.0
+    for now in range(REVIEW_INTERVAL, HOUR + 1, REVIEW_INTERVAL):
+        now += start
+        begin = time.perf_counter()
+        due, _, _ = review.take_due(now)
+        review_time += time.perf_counter() - begin
+        lateness.extend(now - expires[user_id] for user_id in due)
+    reviews = HOUR // REVIEW_INTERVAL
+    print(
+        f"deadlines:     {review_time / reviews * 1e3:>7.4f}ms per review,"
+        f" {len(lateness)} expired, {sum(lateness) / len(lateness):>5.1f}s late on average"
+        f" (built in {build_time * 1e3:.0f}ms, reviewed every {REVIEW_INTERVAL}s)"
+    )
+
+
+if __name__ == "__main__":
+    main()
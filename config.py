@@ -41,8 +41,32 @@ if not SUBSCRIPTION_PATH:
     SUBSCRIPTION_PATH = config("SUBSCRIPTION_PATH", default="sub").strip("/")
 
 USER_SUBSCRIPTION_CLIENTS_LIMIT = config("USER_SUBSCRIPTION_CLIENTS_LIMIT", cast=int, default=10)
+# subscription fetches waiting to be written, the oldest are dropped once it is full
+SUBSCRIPTION_UPDATES_QUEUE_SIZE = config("SUBSCRIPTION_UPDATES_QUEUE_SIZE", cast=int, default=10000)
+
+# rendered subscriptions cache, set SUBSCRIPTION_CACHE_SIZE to 0 to disable it
+SUBSCRIPTION_CACHE_SIZE = config("SUBSCRIPTION_CACHE_SIZE", cast=int, default=4096)
+SUBSCRIPTION_CACHE_TTL = config("SUBSCRIPTION_CACHE_TTL", cast=int, default=300)
+# memory held by the cached configs and their compressed bodies, least recently used are evicted past it
+SUBSCRIPTION_CACHE_MAX_BYTES = config("SUBSCRIPTION_CACHE_MAX_BYTES", cast=int, default=268435456)
+SUBSCRIPTION_CACHE_TRAFFIC_BUCKET = config("SUBSCRIPTION_CACHE_TRAFFIC_BUCKET", cast=int, default=104857600)
+# render links, xray and sing-box subscriptions chunk by chunk into the response, without the rendered
+# subscriptions cache and etags, keeps memory flat for very large configs
+SUBSCRIPTION_STREAMING = config("SUBSCRIPTION_STREAMING", cast=bool, default=False)
+# user agent -> client rule results kept by the client detection
+SUBSCRIPTION_USER_AGENT_CACHE_SIZE = config("SUBSCRIPTION_USER_AGENT_CACHE_SIZE", cast=int, default=1024)
+
+# public addresses used for SERVER_IP/SERVER_IPV6, discovered after startup when not set
+SERVER_IP = config("SERVER_IP", default="")
+SERVER_IPV6 = config("SERVER_IPV6", default="")
+PUBLIC_IP_CACHE_FILE = config("PUBLIC_IP_CACHE_FILE", default="/var/lib/pasarguard/public_ip.json")
 
 JWT_ACCESS_TOKEN_EXPIRE_MINUTES = config("JWT_ACCESS_TOKEN_EXPIRE_MINUTES", cast=int, default=1440)
+# verified admin and subscription tokens, set TOKEN_CACHE_SIZE to 0 to disable it
+TOKEN_CACHE_SIZE = config("TOKEN_CACHE_SIZE", cast=int, default=10000)
+TOKEN_CACHE_TTL = config("TOKEN_CACHE_TTL", cast=int, default=600)
+# admin records used to authenticate API calls, set ADMIN_CACHE_TTL to 0 to disable it
+ADMIN_CACHE_TTL = config("ADMIN_CACHE_TTL", cast=int, default=5)
 
 CUSTOM_TEMPLATES_DIRECTORY = config("CUSTOM_TEMPLATES_DIRECTORY", default=None)
 SUBSCRIPTION_PAGE_TEMPLATE = config("SUBSCRIPTION_PAGE_TEMPLATE", default="subscription/index.html")
@@ -87,14 +111,28 @@ if SQLALCHEMY_DATABASE_URL.startswith("postgresql"):
 else:
     ENABLE_RECORDING_NODES_STATS = False
 
+# user changes are pushed to nodes in batches, collected for NODE_USER_CHANGES_DELAY seconds
+NODE_USER_CHANGES_DELAY = config("NODE_USER_CHANGES_DELAY", cast=float, default=0.2)
+NODE_USER_CHANGES_QUEUE_SIZE = config("NODE_USER_CHANGES_QUEUE_SIZE", cast=int, default=10000)
+
+# at most NODE_RECONNECT_CONCURRENCY nodes are (re)connected at once, a node that fails to connect is
+# retried after a jittered backoff doubling from NODE_RECONNECT_BACKOFF up to NODE_RECONNECT_MAX_BACKOFF seconds
+NODE_RECONNECT_CONCURRENCY = config("NODE_RECONNECT_CONCURRENCY", cast=int, default=5)
+NODE_RECONNECT_BACKOFF = config("NODE_RECONNECT_BACKOFF", cast=float, default=5)
+NODE_RECONNECT_MAX_BACKOFF = config("NODE_RECONNECT_MAX_BACKOFF", cast=float, default=300)
+
 # Interval jobs, all values are in seconds
 JOB_CORE_HEALTH_CHECK_INTERVAL = config("JOB_CORE_HEALTH_CHECK_INTERVAL", cast=int, default=10)
 JOB_RECORD_NODE_USAGES_INTERVAL = config("JOB_RECORD_NODE_USAGES_INTERVAL", cast=int, default=30)
 JOB_RECORD_USER_USAGES_INTERVAL = config("JOB_RECORD_USER_USAGES_INTERVAL", cast=int, default=10)
+JOB_FLUSH_USER_USAGES_INTERVAL = config("JOB_FLUSH_USER_USAGES_INTERVAL", cast=int, default=60)
 JOB_REVIEW_USERS_INTERVAL = config("JOB_REVIEW_USERS_INTERVAL", cast=int, default=30)
+# users are expired, limited and activated when due, this full scan only catches what was missed
+JOB_RECONCILE_USERS_STATUS_INTERVAL = config("JOB_RECONCILE_USERS_STATUS_INTERVAL", cast=int, default=600)
 JOB_SEND_NOTIFICATIONS_INTERVAL = config("JOB_SEND_NOTIFICATIONS_INTERVAL", cast=int, default=30)
 JOB_GHATER_NODES_STATS_INTERVAL = config("JOB_GHATER_NODES_STATS_INTERVAL", cast=int, default=25)
 JOB_REMOVE_OLD_INBOUNDS_INTERVAL = config("JOB_REMOVE_OLD_INBOUNDS_INTERVAL", cast=int, default=600)
 JOB_REMOVE_EXPIRED_USERS_INTERVAL = config("JOB_REMOVE_EXPIRED_USERS_INTERVAL", cast=int, default=3600)
 JOB_RESET_USER_DATA_USAGE_INTERVAL = config("JOB_RESET_USER_DATA_USAGE_INTERVAL", cast=int, default=600)
-JOB_CLEANUP_SUBSCRIPTION_UPDATES_INTERVAL = config("JOB_CLEANUP_SUBSCRIPTION_UPDATES_INTERVAL", cast=int, default=600)
+JOB_FLUSH_SUBSCRIPTION_UPDATES_INTERVAL = config("JOB_FLUSH_SUBSCRIPTION_UPDATES_INTERVAL", cast=int, default=30)
+JOB_RESYNC_USER_ADMIN_INDEX_INTERVAL = config("JOB_RESYNC_USER_ADMIN_INDEX_INTERVAL", cast=int, default=3600)
@@ -2,11 +2,15 @@ from unittest.mock import AsyncMock, MagicMock
 
 import pytest
 from aiorwlock import RWLock
+from sqlalchemy import event
 
 from app.db.models import Settings
 
 from . import TestSession, client
 
+# test modules import the package as tests.api, count statements on that copy's engine
+from tests.api import engine
+
 
 @pytest.fixture(autouse=True)
 def mock_db_session(monkeypatch: pytest.MonkeyPatch):
@@ -82,6 +86,7 @@ def mock_settings(monkeypatch: pytest.MonkeyPatch):
                 {"pattern": "^[Ss]treisand", "target": "links_base64"},
                 {"pattern": "^Happ", "target": "links_base64"},
                 {"pattern": "^ktor\\-client", "target": "links_base64"},
+                {"pattern": "^CompactClient", "target": "xray", "compact": True},
                 {"pattern": "^.*", "target": "links_base64"},
             ],
             "manual_sub_request": {
@@ -123,3 +128,27 @@ def disable_cache(monkeypatch: pytest.MonkeyPatch):
         return wrapper
 
     monkeypatch.setattr("app.settings.cached", dummy_cached)
+
+
+class QueryCounter:
+    def __init__(self):
+        self.statements: list[str] = []
+
+    def __call__(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements.append(statement)
+
+    @property
+    def count(self) -> int:
+        return len(self.statements)
+
+    def reset(self):
+        self.statements.clear()
+
+
+@pytest.fixture
+def query_counter():
+    """Records every SQL statement sent to the test database while the test runs."""
+    counter = QueryCounter()
+    event.listen(engine.sync_engine, "before_cursor_execute", counter)
+    yield counter
+    event.remove(engine.sync_engine, "before_cursor_execute", counter)
@@ -55,6 +55,48 @@ def test_admin_db_login():
     assert "access_token" in response.json()
 
 
+def test_admin_token_after_update(access_token):
+    """Test that cached admin tokens and records are dropped when the admin is disabled or its password reset."""
+
+    username = "testadmincache"
+    password = "TestAdmincache#11"
+    response = client.post(
+        url="/api/admin",
+        json={"username": username, "password": password, "is_sudo": False},
+        headers={"Authorization": f"Bearer {access_token}"},
+    )
+    assert response.status_code == status.HTTP_201_CREATED
+    token = client.post(
+        url="/api/admin/token",
+        data={"username": username, "password": password, "grant_type": "password"},
+    ).json()["access_token"]
+    for _ in range(2):
+        response = client.get(url="/api/admin", headers={"Authorization": f"Bearer {token}"})
+        assert response.status_code == status.HTTP_200_OK
+        assert response.json()["username"] == username
+
+    response = client.put(
+        url=f"/api/admin/{username}",
+        json={"is_sudo": False, "is_disabled": True},
+        headers={"Authorization": f"Bearer {access_token}"},
+    )
+    assert response.status_code == status.HTTP_200_OK
+    response = client.get(url="/api/admin", headers={"Authorization": f"Bearer {token}"})
+    assert response.status_code == status.HTTP_403_FORBIDDEN
+
+    response = client.put(
+        url=f"/api/admin/{username}",
+        json={"password": "TestAdmincache#22", "is_sudo": False, "is_disabled": False},
+        headers={"Authorization": f"Bearer {access_token}"},
+    )
+    assert response.status_code == status.HTTP_200_OK
+    response = client.get(url="/api/admin", headers={"Authorization": f"Bearer {token}"})
+    assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+    response = client.delete(url=f"/api/admin/{username}", headers={"Authorization": f"Bearer {access_token}"})
+    assert response.status_code == status.HTTP_204_NO_CONTENT
+
+
 def test_update_admin(access_token):
     """Test that the admin update route is accessible."""
 
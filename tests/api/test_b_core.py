@@ -1,5 +1,7 @@
+import pytest
 from fastapi import status
 
+from app.core.manager import freeze, thaw
 from tests.api import client
 
 xray_config = {
@@ -416,3 +418,17 @@ def test_inbounds_get(access_token):
     assert response.status_code == status.HTTP_200_OK
     assert len(response.json()) > 0
     assert set(response_tags) == set(config_tags)
+
+
+def test_inbound_snapshot_is_read_only():
+    """Test that nested inbound values are frozen and thawed into modifiable copies."""
+    inbound = {"tag": "a", "sni": ["a.com"], "settings": {"headers": {"Host": ["a.com"]}}}
+    frozen = freeze(inbound)
+    with pytest.raises(TypeError):
+        frozen["settings"]["headers"]["Host"] = []
+    assert frozen["sni"] == ("a.com",)
+
+    copy = thaw(frozen)
+    copy["settings"]["headers"]["Host"].append("b.com")
+    assert copy == {"tag": "a", "sni": ["a.com"], "settings": {"headers": {"Host": ["a.com", "b.com"]}}}
+    assert frozen["settings"]["headers"]["Host"] == ("a.com",)
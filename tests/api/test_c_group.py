@@ -1,8 +1,12 @@
+import asyncio
 import random
 
 from fastapi import status
 
-from tests.api import client
+from app.core.groups import group_inbounds
+from app.db.models import Group, ProxyInbound
+from app.jobs import inboud
+from tests.api import GetTestDB, TestSession, client
 
 group_names = ["testgroup", "testgroup2", "testgroup3"]
 
@@ -71,3 +75,29 @@ def test_groups_get(access_token):
     assert response.status_code == status.HTTP_200_OK
     assert response.json()["total"] == 2
     return response.json()["groups"]
+
+
+def test_remove_old_inbounds_refreshes_group_inbounds(monkeypatch):
+    """Test that inbounds removed from the cores stop resolving for their groups."""
+
+    async def run():
+        async with TestSession() as db:
+            group = Group(name="removed-inbounds", inbounds=[ProxyInbound(tag="removed-inbound")])
+            db.add(group)
+            await db.flush()
+            group_id = group.id
+            await db.commit()
+            await group_inbounds.refresh(db)
+        assert "removed-inbound" in group_inbounds.get(group_id)
+
+        monkeypatch.setattr(inboud, "GetDB", GetTestDB)
+        try:
+            await inboud.remove_old_inbounds()
+            assert group_inbounds.get(group_id) == frozenset()
+        finally:
+            async with TestSession() as db:
+                await db.delete(await db.get(Group, group_id))
+                await db.commit()
+                await group_inbounds.refresh(db)
+
+    asyncio.run(run())
@@ -1,8 +1,17 @@
+import asyncio
+import base64
+import json
 from datetime import datetime, timedelta, timezone
 
+from array import array
+
 from fastapi import status
+from sqlalchemy import select
 
-from tests.api import client
+from app.db.models import Admin
+from app.usage import UsageColumns, usage_accumulator, user_admin_index
+from config import USER_SUBSCRIPTION_CLIENTS_LIMIT
+from tests.api import TestSession, client
 from tests.api.test_f_user_template import test_user_template_create  # noqa
 
 
@@ -110,6 +119,88 @@ def test_user_subscriptions(access_token):
             assert response.status_code == status.HTTP_200_OK
 
 
+def test_user_subscription_etag(access_token):
+    """Test that an unchanged subscription is answered with 304 when the client sends its ETag."""
+    user = test_users_get(access_token)[0]
+    url = f"{user['subscription_url']}/links"
+
+    response = client.get(url)
+    assert response.status_code == status.HTTP_200_OK
+    etag = response.headers["etag"]
+
+    response = client.get(url, headers={"If-None-Match": etag})
+    assert response.status_code == status.HTTP_304_NOT_MODIFIED
+    assert response.headers["etag"] == etag
+    assert response.content == b""
+
+    response = client.get(url, headers={"If-None-Match": '"stale"'})
+    assert response.status_code == status.HTTP_200_OK
+
+
+def test_user_subscription_content_encoding(access_token, monkeypatch):
+    """Test that subscriptions are compressed on request, and streamed with the same configs."""
+
+    def shape(client_type: str, body: bytes):
+        # hosts may pick random addresses and ports on every render, compare what was rendered
+        if client_type == "links_base64":
+            body = base64.b64decode(body)
+        if client_type in ("links", "links_base64"):
+            return [line.split("://")[0] for line in body.decode().split("\n")]
+        config = json.loads(body)
+        return [outbound["tag"] for outbound in config["outbounds"]] if client_type == "sing_box" else len(config)
+
+    user = test_users_get(access_token)[0]
+    bodies = {}
+    for client_type in ("links", "links_base64", "xray", "sing_box"):
+        url = f"{user['subscription_url']}/{client_type}"
+        response = client.get(url, headers={"Accept-Encoding": "identity"})
+        assert response.status_code == status.HTTP_200_OK
+        assert "content-encoding" not in response.headers
+        bodies[client_type] = response.content
+
+        response = client.get(url, headers={"Accept-Encoding": "gzip"})
+        assert response.status_code == status.HTTP_200_OK
+        assert shape(client_type, response.content) == shape(client_type, bodies[client_type])
+        if len(bodies[client_type]) >= 512:
+            assert response.headers["content-encoding"] == "gzip"
+            assert response.headers["etag"].endswith('-gzip"')
+
+    monkeypatch.setattr("app.operation.subscription.SUBSCRIPTION_STREAMING", True)
+    for client_type, body in bodies.items():
+        response = client.get(f"{user['subscription_url']}/{client_type}", headers={"Accept-Encoding": "gzip"})
+        assert response.status_code == status.HTTP_200_OK
+        assert response.headers["content-encoding"] == "gzip"
+        assert "etag" not in response.headers
+        assert shape(client_type, response.content) == shape(client_type, body)
+
+
+def test_user_subscription_compact_rule(access_token):
+    """Test that a client rule with compact set gets its json config without indentation."""
+    user = test_users_get(access_token)[0]
+
+    response = client.get(user["subscription_url"], headers={"User-Agent": "CompactClient/1.0"})
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["content-type"] == "application/json"
+    assert "\n" not in response.text
+    assert isinstance(response.json(), list)
+
+    response = client.get(f"{user['subscription_url']}/xray")
+    assert response.status_code == status.HTTP_200_OK
+    assert "\n    " in response.text
+
+
+def test_subscription_rules_stats(access_token):
+    """Test that the subscription client rules report their hits."""
+    response = client.get(
+        "/api/settings/subscription/rules/stats",
+        headers={"Authorization": f"Bearer {access_token}"},
+    )
+    assert response.status_code == status.HTTP_200_OK
+    rules = {rule["pattern"]: rule for rule in response.json()["rules"]}
+    assert rules["^CompactClient"]["hits"] >= 1
+    assert rules["^CompactClient"]["target"] == "xray"
+
+
 def test_user_sub_update_user_agent(access_token):
     """Test that the user sub_update user_agent is accessible."""
     users = test_users_get(access_token)
@@ -125,6 +216,24 @@ def test_user_sub_update_user_agent(access_token):
     assert response.json()["updates"][0]["user_agent"] == user_agent
 
 
+def test_user_sub_update_coalesced_and_limited(access_token):
+    """Test that repeated fetches are recorded once and each user keeps only its clients limit."""
+    user = test_users_get(access_token)[0]
+    user_agents = [f"v2rayNG/1.9.{i} limit test" for i in range(USER_SUBSCRIPTION_CLIENTS_LIMIT + 2)]
+    for user_agent in user_agents:
+        for _ in range(2):
+            client.get(user["subscription_url"], headers={"User-Agent": user_agent})
+
+    response = client.get(
+        f"/api/user/{user['username']}/sub_update?limit=100",
+        headers={"Authorization": f"Bearer {access_token}"},
+    )
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()["count"] == USER_SUBSCRIPTION_CLIENTS_LIMIT
+    recorded = [update["user_agent"] for update in response.json()["updates"]]
+    assert recorded == user_agents[::-1][:USER_SUBSCRIPTION_CLIENTS_LIMIT]
+
+
 def test_user_get(access_token):
     """Test that the user get by id route is accessible."""
     response = client.get(
@@ -145,6 +254,23 @@ def test_reset_user_usage(access_token):
     assert response.status_code == status.HTTP_200_OK
 
 
+def test_reset_user_usage_drops_pending_usage(access_token):
+    """Test that traffic collected before a reset isn't written back on top of it."""
+    headers = {"Authorization": f"Bearer {access_token}"}
+    user_id = client.get("/api/user/test_user_active", headers=headers).json()["id"]
+    other_id = user_id + 10**6
+    usage_accumulator.add_users(
+        UsageColumns(array("q", [user_id, other_id]), array("q", [5000, 7000])), datetime.now(timezone.utc)
+    )
+
+    response = client.post("/api/user/test_user_active/reset", headers=headers)
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()["used_traffic"] == 0
+    assert usage_accumulator.pending_user_usage(user_id) == 0
+    assert usage_accumulator.pending_user_usage(other_id) == 7000
+    usage_accumulator.discard_users([other_id])
+
+
 def test_user_update(access_token):
     """Test that the user update route is accessible."""
     response = client.put(
@@ -192,6 +318,35 @@ def test_user_delete(access_token):
     assert response.status_code == status.HTTP_204_NO_CONTENT
 
 
+def test_user_admin_index_follows_owner(access_token):
+    """Test that the user admin index is updated when a user is created, given a new owner and removed."""
+    headers = {"Authorization": f"Bearer {access_token}"}
+
+    async def admin_ids() -> dict[str, int]:
+        async with TestSession() as db:
+            return dict((await db.execute(select(Admin.username, Admin.id))).all())
+
+    response = client.post(
+        "/api/admin", json={"username": "test_owner", "password": "TestOwner#11", "is_sudo": False}, headers=headers
+    )
+    assert response.status_code == status.HTTP_201_CREATED
+    admins = asyncio.run(admin_ids())
+
+    response = client.post("/api/user", headers=headers, json={"username": "test_user_owner", "proxy_settings": {}})
+    assert response.status_code == status.HTTP_201_CREATED
+    user_id = response.json()["id"]
+    # the sudo admin of the tests comes from the environment, its users have no owner
+    assert user_id in user_admin_index._admins and user_admin_index._admins[user_id] is None
+
+    response = client.put("/api/user/test_user_owner/set_owner?admin_username=test_owner", headers=headers)
+    assert response.status_code == status.HTTP_200_OK
+    assert user_admin_index._admins[user_id] == admins["test_owner"]
+
+    assert client.delete("/api/user/test_user_owner", headers=headers).status_code == status.HTTP_204_NO_CONTENT
+    assert user_id not in user_admin_index._admins
+    assert client.delete("/api/admin/test_owner", headers=headers).status_code == status.HTTP_204_NO_CONTENT
+
+
 def test_create_user_with_template(access_token):
     response = client.post(
         "/api/user/from_template",
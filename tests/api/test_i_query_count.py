@@ -0,0 +1,49 @@
+from fastapi import status
+
+from tests.api import client
+
+usernames = [f"query_count_user_{i}" for i in range(6)]
+
+
+def count_get_users(access_token, query_counter, limit: int) -> int:
+    query_counter.reset()
+    response = client.get(f"/api/users?limit={limit}", headers={"Authorization": f"Bearer {access_token}"})
+    assert response.status_code == status.HTTP_200_OK
+    assert len(response.json()["users"]) == limit
+    return query_counter.count
+
+
+def test_get_users_query_count(access_token, query_counter):
+    """Test that listing users costs the same number of statements whatever the page size."""
+    response = client.get("/api/groups", headers={"Authorization": f"Bearer {access_token}"})
+    group_ids = [g["id"] for g in response.json()["groups"]]
+    for username in usernames:
+        client.post(
+            "/api/user",
+            headers={"Authorization": f"Bearer {access_token}"},
+            json={"username": username, "proxy_settings": {}, "group_ids": group_ids},
+        )
+
+    one = count_get_users(access_token, query_counter, 1)
+    many = count_get_users(access_token, query_counter, len(usernames))
+
+    assert many == one
+    assert many <= 5
+
+    for username in usernames:
+        client.delete(f"/api/user/{username}", headers={"Authorization": f"Bearer {access_token}"})
+
+
+def test_get_user_query_count(access_token, query_counter):
+    """Test that fetching a single user loads its relationships without lazy loads."""
+    client.post(
+        "/api/user",
+        headers={"Authorization": f"Bearer {access_token}"},
+        json={"username": usernames[0], "proxy_settings": {}},
+    )
+    query_counter.reset()
+    response = client.get(f"/api/user/{usernames[0]}", headers={"Authorization": f"Bearer {access_token}"})
+    assert response.status_code == status.HTTP_200_OK
+    assert query_counter.count <= 4
+
+    client.delete(f"/api/user/{usernames[0]}", headers={"Authorization": f"Bearer {access_token}"})
@@ -0,0 +1,139 @@
+from uuid import UUID
+
+import jinja2
+import pytest
+import yaml
+
+from app.subscription import clash
+from app.subscription.clash import ClashConfiguration, ClashMetaConfiguration
+from app.templates import env, render_template
+
+ALPN = ["h2", "http/1.1"]
+
+INBOUNDS = [
+    {"protocol": "vmess", "network": "ws", "tls": "tls", "path": "/ws", "http_headers": {"X-Test": "yes"}},
+    {"protocol": "vless", "network": "tcp", "tls": "reality", "pbk": "public-key", "sid": "abcd", "fp": "chrome"},
+    {"protocol": "vless", "network": "httpupgrade", "tls": "none", "path": "/upgrade"},
+    {"protocol": "trojan", "network": "grpc", "tls": "tls", "path": "trojan-service", "alpn": ALPN},
+    {"protocol": "trojan", "network": "h2", "tls": "tls", "path": "/h2", "alpn": ALPN},
+    {"protocol": "shadowsocks", "network": "tcp", "tls": "none", "header_type": "http", "path": "/tcp"},
+    {
+        "protocol": "vmess",
+        "network": "ws",
+        "tls": "none",
+        "path": "/mux?ed=2048",
+        "mux_settings": {
+            "clash": {"enable": True, "protocol": "smux", "max_connections": 4, "brutal": None},
+        },
+    },
+]
+
+ASCII_REMARKS = ["fast", "yes", "123", "2024-01-01", "fast", "x" * 120, "null", "~", "# comment: value"]
+# libyaml escapes some of these, they are dumped by the python emitter
+UNICODE_REMARKS = ["🚀 Fast", "🇩🇪 Germany", "Köln", "line\rbreak", *ASCII_REMARKS]
+
+SETTINGS = {
+    "id": UUID("1a5d4f82-8e3b-4a8b-9c2e-5f0a1b2c3d4e"),
+    "password": "p@ss: word",
+    "method": "chacha20-ietf-poly1305",
+    "flow": "xtls-rprx-vision",
+}
+
+
+def build(config_class, hosts: int, remarks: list[str] = ASCII_REMARKS):
+    conf = config_class()
+    for i in range(hosts):
+        inbound = INBOUNDS[i % len(INBOUNDS)]
+        conf.add(
+            remark=remarks[i % len(remarks)],
+            address=f"{i}.example.com",
+            inbound={
+                "port": 443 + i,
+                "sni": f"sni-{i}.example.com",
+                "host": f"host-{i}.example.com" if i % 2 else "",
+                "path": "",
+                "header_type": "none",
+                **inbound,
+            },
+            settings=SETTINGS,
+        )
+    return conf
+
+
+def legacy_render(conf, reverse=False) -> str:
+    """The render as it was before the template was parsed once, the output has to stay byte for byte."""
+    if reverse:
+        conf.data["proxies"].reverse()
+
+    return yaml.dump(
+        yaml.load(
+            render_template(
+                clash.CLASH_SUBSCRIPTION_TEMPLATE, {"conf": conf.data, "proxy_remarks": conf.proxy_remarks}
+            ),
+            Loader=yaml.SafeLoader,
+        ),
+        sort_keys=False,
+        allow_unicode=True,
+    )
+
+
+@pytest.mark.parametrize("config_class", [ClashConfiguration, ClashMetaConfiguration])
+@pytest.mark.parametrize("hosts", [0, 1, 2, 25])
+@pytest.mark.parametrize("reverse", [False, True])
+@pytest.mark.parametrize("remarks", [ASCII_REMARKS, UNICODE_REMARKS], ids=["ascii", "unicode"])
+def test_clash_render_matches_template_round_trip(config_class, hosts, reverse, remarks):
+    assert build(config_class, hosts, remarks).render(reverse) == legacy_render(
+        build(config_class, hosts, remarks), reverse
+    )
+
+
+def test_clash_custom_template_without_placeholders(monkeypatch: pytest.MonkeyPatch):
+    """Templates that use the proxies for more than dumping them whole keep the full render."""
+    template = (
+        "proxies:\n{% for proxy in conf.proxies %}- name: '{{ proxy.name }}'\n  server: {{ proxy.server }}\n"
+        "{% endfor %}rules: []\n"
+    )
+    loader = jinja2.ChoiceLoader([jinja2.DictLoader({"clash/test-loop.yml": template}), env.loader])
+    monkeypatch.setattr(env, "loader", loader)
+    monkeypatch.setattr(clash, "CLASH_SUBSCRIPTION_TEMPLATE", "clash/test-loop.yml")
+
+    assert (
+        clash.template_artifact("clash/test-loop.yml", clash.ClashTemplate, clash.ClashTemplate.context).document
+        is None
+    )
+    for config_class in (ClashConfiguration, ClashMetaConfiguration):
+        assert build(config_class, 10, UNICODE_REMARKS).render() == legacy_render(
+            build(config_class, 10, UNICODE_REMARKS)
+        )
+
+
+@pytest.mark.parametrize(
+    "template",
+    [
+        "proxy-count: {{ conf.proxies|length }}\n{{ conf | yaml }}",
+        "{% if proxy_remarks|length > 5 %}mode: rule\n{% endif %}{{ conf | yaml }}",
+    ],
+    ids=["length", "length-condition"],
+)
+def test_clash_custom_template_using_list_length(monkeypatch: pytest.MonkeyPatch, template):
+    """Templates that depend on the number of proxies keep the full render."""
+    loader = jinja2.ChoiceLoader([jinja2.DictLoader({"clash/test-length.yml": template}), env.loader])
+    monkeypatch.setattr(env, "loader", loader)
+    monkeypatch.setattr(clash, "CLASH_SUBSCRIPTION_TEMPLATE", "clash/test-length.yml")
+
+    for config_class in (ClashConfiguration, ClashMetaConfiguration):
+        for hosts in (1, 10):
+            assert build(config_class, hosts).render() == legacy_render(build(config_class, hosts))
+    assert (
+        clash.template_artifact("clash/test-length.yml", clash.ClashTemplate, clash.ClashTemplate.context).document
+        is None
+    )
+
+
+def test_clash_default_template_is_compiled():
+    """The shipped template keeps its parsed document after verification."""
+    build(ClashConfiguration, 2).render()
+    template = clash.template_artifact(
+        clash.CLASH_SUBSCRIPTION_TEMPLATE, clash.ClashTemplate, clash.ClashTemplate.context
+    )
+    assert template.verified and template.document is not None
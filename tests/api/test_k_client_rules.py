@@ -0,0 +1,77 @@
+import re
+
+import pytest
+
+from app.models.settings import SubRule
+from app.subscription.client_rules import ClientRuleMatcher
+
+DEFAULT_RULES = [
+    (r"^([Cc]lash[\-\.]?[Vv]erge|[Cc]lash[\-\.]?[Mm]eta|[Ff][Ll][Cc]lash|[Mm]ihomo)", "clash_meta"),
+    (r"^([Cc]lash|[Ss]tash)", "clash"),
+    (r"^(SFA|SFI|SFM|SFT|[Kk]aring|[Hh]iddify[Nn]ext)|.*[Ss]ing[\-b]?ox.*", "sing_box"),
+    (r"^(SS|SSR|SSD|SSS|Outline|Shadowsocks|SSconf)", "outline"),
+    (r"^(v2rayNG|v2rayN|Streisand|Happ|ktor\-client)", "xray"),
+    (r"^Blocked", "block"),
+]
+
+USER_AGENTS = [
+    "ClashMetaForAndroid/2.10.1.Meta",
+    "clash-verge/v1.6.6",
+    "Stash/2.4.7 Clash/1.9.0",
+    "SFA/1.9.3 (android)",
+    "Mozilla/5.0 sing-box 1.8",
+    "Shadowsocks/5.0",
+    "v2rayNG/1.9.46",
+    "Happ/2.0",
+    "Blocked client",
+    "curl/8.4.0",
+    "",
+]
+
+RULE_SETS = {
+    "default": DEFAULT_RULES,
+    "catch-all": [*DEFAULT_RULES, (r"^.*", "links_base64")],
+    # the ones below can not be joined into one pattern
+    "backreference": [(r"^(\w)\1", "links"), *DEFAULT_RULES],
+    "global flag": [(r"(?i)^CURL", "links"), *DEFAULT_RULES],
+    "group names": [(r"^(?P<name>Clash)", "clash"), (r"^(?P<name>curl)", "links")],
+    "invalid pattern": [(r"^(curl", "links"), *DEFAULT_RULES],
+}
+
+
+def reference(user_agent: str, rules: list[SubRule]) -> SubRule | None:
+    for rule in rules:
+        try:
+            if re.match(rule.pattern, user_agent):
+                return rule
+        except re.error:
+            continue
+    return None
+
+
+@pytest.mark.parametrize("rule_set", RULE_SETS.keys())
+def test_client_rules_match_like_ordered_re_match(rule_set):
+    rules = [SubRule(pattern=pattern, target=target) for pattern, target in RULE_SETS[rule_set]]
+    matcher = ClientRuleMatcher(maxsize=4)
+
+    # twice, the second round is answered from the cache for some of the user agents
+    for _ in range(2):
+        for user_agent in USER_AGENTS:
+            assert matcher.match(user_agent, rules) is reference(user_agent, rules)
+
+    expected = [0] * len(rules)
+    for user_agent in USER_AGENTS:
+        if rule := reference(user_agent, rules):
+            expected[rules.index(rule)] += 2
+    assert [hits for _, hits in matcher.stats(rules)] == expected
+    assert matcher.cached_user_agents == 4
+
+
+def test_client_rules_recompile_on_new_rules():
+    matcher = ClientRuleMatcher()
+    rules = [SubRule(pattern=r"^curl", target="links")]
+    assert matcher.match("curl/8.4.0", rules) is rules[0]
+
+    rules = [SubRule(pattern=r"^curl", target="block")]
+    assert matcher.match("curl/8.4.0", rules).target == "block"
+    assert [hits for _, hits in matcher.stats(rules)] == [1]
@@ -0,0 +1,40 @@
+import asyncio
+
+from app.utils import public_ip as public_ip_module
+from app.utils.public_ip import PublicIP
+
+
+def test_public_ip_override(tmp_path):
+    """Test that addresses from the environment are used without discovery."""
+    public_ip = PublicIP(cache_file=str(tmp_path / "public_ip.json"), ipv4="1.2.3.4", ipv6="2001:db8::1")
+    assert public_ip.ipv4 == "1.2.3.4"
+    assert public_ip.ipv6 == "[2001:db8::1]"
+    assert asyncio.run(public_ip.discover()) is False
+    assert not (tmp_path / "public_ip.json").exists()
+
+
+def test_public_ip_cache(tmp_path, monkeypatch):
+    """Test that discovered addresses are cached on disk and kept when a later discovery fails."""
+    cache_file = str(tmp_path / "public_ip.json")
+
+    async def discovered_ipv4():
+        return "8.8.4.4"
+
+    async def unreachable():
+        return None
+
+    monkeypatch.setattr(public_ip_module, "get_public_ip", discovered_ipv4)
+    monkeypatch.setattr(public_ip_module, "get_public_ipv6", unreachable)
+    public_ip = PublicIP(cache_file=cache_file, ipv4="", ipv6="")
+    assert public_ip.ipv4 == "127.0.0.1"
+    assert asyncio.run(public_ip.discover()) is True
+    assert public_ip.ipv4 == "8.8.4.4"
+    assert public_ip.ipv6 == "[::1]"
+
+    monkeypatch.setattr(public_ip_module, "get_public_ip", unreachable)
+    restarted = PublicIP(cache_file=cache_file, ipv4="", ipv6="")
+    assert restarted.ipv4 == "127.0.0.1"
+    restarted.load()
+    assert restarted.ipv4 == "8.8.4.4"
+    assert asyncio.run(restarted.discover()) is False
+    assert restarted.ipv4 == "8.8.4.4"
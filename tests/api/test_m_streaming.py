@@ -0,0 +1,58 @@
+import base64
+import gzip
+import json
+
+from app.subscription.cache import SubscriptionCache
+from app.subscription.streaming import b64encode_chunks, compress_chunks, join_chunks, negotiate_encoding
+from app.utils.serializer import json_chunks, json_dumps
+
+LINKS = [f"vless://{i}@example.com:443?security=tls#remark-{i}-\U0001f1e9\U0001f1ea" for i in range(2000)]
+
+
+def test_join_and_base64_chunks():
+    """Test that chunked links and their base64 match the whole rendered config."""
+    expected = "\n".join(LINKS)
+    chunks = list(join_chunks(LINKS, "\n", chunk_size=1000))
+    assert len(chunks) > 1
+    assert "".join(chunks) == expected
+    assert "".join(b64encode_chunks(chunks)) == base64.b64encode(expected.encode()).decode()
+    assert "".join(b64encode_chunks(["a", "bc", "d", ""])) == base64.b64encode(b"abcd").decode()
+    assert list(join_chunks([], "\n")) == []
+
+
+def test_json_chunks():
+    """Test that chunked json matches json_dumps, indented and compact."""
+    document = {"outbounds": [{"tag": f"proxy-{i}", "remark": "\U0001f680", "port": i} for i in range(500)]}
+    for indent in (4, None):
+        assert "".join(json_chunks(document, indent=indent, chunk_size=1000)) == json_dumps(document, indent=indent)
+    assert json.loads(gzip.decompress(b"".join(compress_chunks(json_chunks(document), "gzip")))) == document
+
+
+def test_negotiate_encoding():
+    assert negotiate_encoding("") == "identity"
+    assert negotiate_encoding("gzip, deflate") == "gzip"
+    assert negotiate_encoding("gzip;q=0") == "identity"
+    assert negotiate_encoding("*") in ("br", "gzip")
+    assert negotiate_encoding("deflate, identity") == "identity"
+
+
+def test_subscription_cache_max_bytes():
+    """Test that the cache evicts the least recently used entries once configs and their bodies pass maxbytes."""
+    cache = SubscriptionCache(maxsize=10, ttl=60, maxbytes=300)
+    first = cache.set((1, "links"), "a" * 100, "text/plain")
+    cache.set((2, "links"), "b" * 100, "text/plain")
+    gzip_size = len(first.body("gzip"))
+    assert cache.size == 200 + gzip_size
+
+    cache.get((1, "links"))
+    cache.set((3, "links"), "c" * 100, "text/plain")
+    assert cache.get((2, "links")) is None
+    assert cache.size == 200 + gzip_size and len(cache) == 2
+
+    cache.set((4, "links"), "d" * 301, "text/plain")
+    assert len(cache) == 0 and cache.size == 0
+
+    last = cache.set((5, "links"), "e" * 100, "text/plain")
+    cache.invalidate_users([5])
+    last.body("gzip")
+    assert len(cache) == 0 and cache.size == 0
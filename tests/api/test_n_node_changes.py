@@ -0,0 +1,212 @@
+import asyncio
+
+from fastapi import status
+
+from app.node import node_manager, user as node_user
+from app.node.changes import NodeChangeQueue
+from app.node.user import UserRoster, serialize_user_for_node
+from tests.api import client
+
+
+class RecordingNode:
+    def __init__(self):
+        self.batches: list[list] = []
+        self.syncs: list[list] = []
+
+    async def update_users(self, users: list):
+        self.batches.append(users)
+
+    async def sync_users(self, users: list, flush_queue: bool, timeout: int):
+        self.syncs.append(users)
+
+
+def proto_user(user_id: int, password: str = "secret"):
+    return serialize_user_for_node(user_id, f"user{user_id}", {"trojan": {"password": password}}, ["trojan"])
+
+
+class StaticRoster:
+    def __init__(self, users: list | None = None):
+        self.users = users if users is not None else [proto_user(1)]
+        self.version = 0
+
+    async def get(self) -> list:
+        return self.users
+
+
+def test_node_changes_coalesced_in_batches():
+    """Test that changes within the window are coalesced by user and shipped in one batch."""
+
+    async def run():
+        node = RecordingNode()
+        changes = NodeChangeQueue(1, node, StaticRoster(), delay=0.05, maxsize=100)
+        for version in range(3):
+            for user_id in range(10):
+                changes.push(user_id, (user_id, version))
+        assert len(changes) == 10
+        await asyncio.sleep(0.2)
+
+        assert node.batches == [[(user_id, 2) for user_id in range(10)]]
+        stats = changes.stats()
+        assert (stats.enqueued, stats.coalesced, stats.shipped, stats.batches, stats.pending) == (30, 20, 10, 1, 0)
+
+        changes.push(1, (1, 3))
+        await changes.close()
+        assert node.batches[-1] == [(1, 3)]
+
+    asyncio.run(run())
+
+
+def test_node_changes_overflow_resyncs():
+    """Test that a full queue drops its changes and resyncs the node with the whole roster."""
+
+    async def run():
+        node = RecordingNode()
+        roster = StaticRoster()
+        changes = NodeChangeQueue(1, node, roster, delay=0.05, maxsize=5)
+        for user_id in range(8):
+            changes.push(user_id, user_id)
+        await changes.close()
+
+        assert node.batches == []
+        assert node.syncs == [roster.users]
+        assert changes.stats().overflows == 1
+
+    asyncio.run(run())
+
+
+class FailingNode(RecordingNode):
+    def __init__(self, failures: int):
+        super().__init__()
+        self.failures = failures
+
+    async def update_users(self, users: list):
+        if self.failures:
+            self.failures -= 1
+            raise ConnectionError("node is unreachable")
+        await super().update_users(users)
+
+    async def sync_users(self, users: list, flush_queue: bool, timeout: int):
+        if self.failures:
+            self.failures -= 1
+            raise ConnectionError("node is unreachable")
+        await super().sync_users(users, flush_queue, timeout)
+
+
+def test_node_changes_failed_push_resyncs():
+    """Test that the change after a failed push resyncs the node instead of being dropped."""
+
+    async def run():
+        node = FailingNode(failures=1)
+        roster = StaticRoster()
+        changes = NodeChangeQueue(1, node, roster, delay=0.02, maxsize=100)
+        changes.push(1, (1, 0))
+        await asyncio.sleep(0.1)
+        assert changes.stats().failures == 1
+
+        changes.push(2, (2, 0))
+        await asyncio.sleep(0.1)
+        assert node.syncs == [roster.users]
+        assert changes.stats().lag == 0
+        await changes.close()
+
+    asyncio.run(run())
+
+
+def test_node_resync_sends_delta():
+    """Test that a resync after a full push only sends the added, changed and removed users."""
+
+    async def run():
+        node = RecordingNode()
+        roster = StaticRoster([proto_user(user_id) for user_id in range(100)])
+        changes = NodeChangeQueue(1, node, roster, delay=0.05, maxsize=100)
+        await changes.sync()
+        assert node.syncs == [roster.users]
+
+        await changes.sync()
+        assert node.batches == [] and changes.stats().delta_syncs == 1
+
+        roster.users = roster.users[1:] + [proto_user(100)]
+        roster.users[0] = proto_user(1, password="changed")
+        roster.version += 1
+        await changes.sync()
+        assert [(user.email, list(user.inbounds)) for user in node.batches[-1]] == [
+            ("1.user1", ["trojan"]),
+            ("100.user100", ["trojan"]),
+            ("0.user0", []),
+        ]
+
+        await changes.sync(full=True)
+        assert len(node.syncs) == 2
+        stats = changes.stats()
+        assert (stats.full_syncs, stats.delta_syncs, stats.synced_users) == (2, 2, 100)
+
+    asyncio.run(run())
+
+
+def test_user_roster_shared_by_version(monkeypatch):
+    """Test that nodes connecting together share one roster build and changes bump the version."""
+
+    async def run():
+        builds: list[int] = []
+        release = asyncio.Event()
+
+        class NoDB:
+            async def __aenter__(self):
+                return None
+
+            async def __aexit__(self, *args):
+                pass
+
+        async def core_users(db):
+            builds.append(len(builds))
+            await release.wait()
+            return [proto_user(len(builds))]
+
+        monkeypatch.setattr(node_user, "GetDB", NoDB)
+        monkeypatch.setattr(node_user, "core_users", core_users)
+        roster = UserRoster()
+
+        # two nodes connecting at the same time await the same build
+        first, second = asyncio.create_task(roster.get()), asyncio.create_task(roster.get())
+        await asyncio.sleep(0)
+        release.set()
+        assert await first is await second
+        assert len(builds) == 1 and await roster.get() is await first
+
+        version = roster.version
+        roster.invalidate()
+        assert roster.version == version + 1
+        rebuilt = await roster.get()
+        assert len(builds) == 2 and rebuilt is not await first
+
+        # a change landing during a build is handed to its callers but not cached
+        release.clear()
+        roster.invalidate()
+        building = asyncio.create_task(roster.get())
+        await asyncio.sleep(0)
+        roster.invalidate()
+        release.set()
+        await building
+        await roster.get()
+        assert len(builds) == 4
+
+    asyncio.run(run())
+
+
+def test_nodes_user_changes_stats(access_token, monkeypatch):
+    """Test that the route reports the user changes pushed to each node."""
+
+    async def run() -> NodeChangeQueue:
+        changes = NodeChangeQueue(7, RecordingNode(), StaticRoster(), delay=0.01, maxsize=100)
+        for user_id in (1, 2, 1):
+            changes.push(user_id, proto_user(user_id))
+        await asyncio.sleep(0.1)
+        await changes.close()
+        return changes
+
+    monkeypatch.setattr(node_manager, "_changes", {7: asyncio.run(run())})
+    response = client.get("/api/nodes/user_changes", headers={"Authorization": f"Bearer {access_token}"})
+    assert response.status_code == status.HTTP_200_OK
+    stats = response.json()["7"]
+    assert (stats["enqueued"], stats["coalesced"], stats["shipped"], stats["batches"]) == (3, 1, 2, 1)
+    assert (stats["pending"], stats["overflows"], stats["failures"]) == (0, 0, 0)
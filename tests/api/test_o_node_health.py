@@ -0,0 +1,50 @@
+import asyncio
+
+from PasarGuardNodeBridge import Health
+
+from app.node.health import NodeHealthTable
+
+
+class StaticHealthNode:
+    def __init__(self, health: Health):
+        self.health = health
+        self.polls = 0
+
+    async def get_health(self) -> Health:
+        self.polls += 1
+        return self.health
+
+
+def test_node_health_snapshot():
+    """Test that the health snapshot buckets every node from one poll and is reused until it is too old."""
+
+    async def run():
+        nodes = {
+            1: StaticHealthNode(Health.HEALTHY),
+            2: StaticHealthNode(Health.BROKEN),
+            3: StaticHealthNode(Health.NOT_CONNECTED),
+            4: StaticHealthNode(Health.INVALID),
+        }
+        table = NodeHealthTable(nodes, max_age=60)
+
+        snapshot = await table.snapshot()
+        assert [node_id for node_id, _ in snapshot.healthy] == [1]
+        assert [node_id for node_id, _ in snapshot.broken] == [2]
+        assert [node_id for node_id, _ in snapshot.not_connected] == [3]
+        assert await table.snapshot() is snapshot
+        assert all(node.polls == 1 for node in nodes.values())
+
+        nodes[2].health = Health.HEALTHY
+        await table.refresh(2)
+        assert [node_id for node_id, _ in (await table.snapshot()).healthy] == [1, 2]
+
+        del nodes[1]
+        table.discard(1)
+        assert [node_id for node_id, _ in (await table.snapshot()).healthy] == [2]
+
+        table.max_age = 0
+        await asyncio.sleep(0.01)
+        await table.snapshot()
+        assert nodes[3].polls == 2
+
+    asyncio.run(run())
@@ -0,0 +1,126 @@
+import asyncio
+from datetime import datetime as dt, timedelta as td, timezone as tz
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+
+from fastapi import status
+from sqlalchemy import delete
+
+from app.db.models import NodeUserUsage
+from app.jobs import node_checker
+from app.node.reconnect import NodeReconnectScheduler
+from app.operation import node as node_operation
+from tests.api import GetTestDB, TestSession, client
+
+
+def test_node_reconnect_scheduler():
+    """Test that nodes connect a few at a time by priority and failed nodes back off."""
+
+    async def run():
+        order: list[int] = []
+        running = 0
+        max_running = 0
+
+        async def connect(node_id: int) -> bool:
+            nonlocal running, max_running
+            running += 1
+            max_running = max(max_running, running)
+            order.append(node_id)
+            await asyncio.sleep(0.01)
+            running -= 1
+            return node_id != 0
+
+        scheduler = NodeReconnectScheduler(connect, concurrency=2, backoff=0.2, max_backoff=1)
+        for node_id in range(6):
+            scheduler.schedule(node_id, priority=node_id)
+        await scheduler.join()
+
+        assert order == [5, 4, 3, 2, 1, 0]
+        assert max_running == 2
+        stats = scheduler.stats()
+        assert (stats.attempts, stats.connected, stats.failed) == (6, 5, 1)
+        assert stats.nodes[0].state == "failed" and stats.nodes[0].failures == 1
+
+        scheduler.schedule(0)
+        assert scheduler.stats().nodes[0].state == "waiting"
+        await scheduler.join()
+        assert order.count(0) == 1
+
+        scheduler.schedule(0, immediate=True)
+        await scheduler.join()
+        assert order.count(0) == 2
+        assert scheduler.stats().nodes[0].failures == 2
+        await scheduler.close()
+
+    asyncio.run(run())
+
+
+def test_startup_connects_busiest_nodes_first(monkeypatch):
+    """Test that nodes not collected yet connect in order of their users in the latest recorded hour."""
+    node_ids = [901, 902, 903, 904]
+    hour = dt.now(tz.utc).replace(minute=0, second=0, microsecond=0)
+    # node id -> users per hour, only the latest hour counts
+    usages = {901: {hour: 1}, 902: {hour - td(hours=1): 50, hour: 3}, 903: {hour: 2}}
+
+    async def run():
+        async with TestSession() as db:
+            for node_id, hours in usages.items():
+                for created_at, users in hours.items():
+                    db.add_all(
+                        NodeUserUsage(created_at=created_at, user_id=user_id, node_id=node_id, used_traffic=1)
+                        for user_id in range(users)
+                    )
+            await db.commit()
+
+        order: list[int] = []
+
+        async def connect(node_id: int) -> bool:
+            order.append(node_id)
+            return True
+
+        async def get_nodes(db, enabled):
+            return [SimpleNamespace(id=node_id) for node_id in node_ids]
+
+        async def update_node(db_node):
+            pass
+
+        scheduler = NodeReconnectScheduler(connect, concurrency=1)
+        monkeypatch.setattr(node_operation, "node_reconnects", scheduler)
+        monkeypatch.setattr(node_checker, "GetDB", GetTestDB)
+        monkeypatch.setattr(node_checker, "get_nodes", get_nodes)
+        monkeypatch.setattr(node_checker.node_manager, "update_node", update_node)
+        monkeypatch.setattr(node_checker, "scheduler", MagicMock())
+        try:
+            await node_checker.initialize_nodes()
+            await scheduler.join()
+            assert order == [902, 903, 901, 904]
+        finally:
+            await scheduler.close()
+            async with TestSession() as db:
+                await db.execute(delete(NodeUserUsage).where(NodeUserUsage.node_id.in_(node_ids)))
+                await db.commit()
+
+    asyncio.run(run())
+
+
+def test_nodes_reconnects_stats(access_token, monkeypatch):
+    """Test that the route reports the progress of the reconnection scheduler."""
+
+    async def connect(node_id: int) -> bool:
+        return node_id != 5
+
+    async def run() -> NodeReconnectScheduler:
+        scheduler = NodeReconnectScheduler(connect, concurrency=3, backoff=60)
+        scheduler.schedule(5, priority=10)
+        scheduler.schedule(6, priority=20)
+        await scheduler.join()
+        await scheduler.close()
+        return scheduler
+
+    monkeypatch.setattr(node_operation, "node_reconnects", asyncio.run(run()))
+    response = client.get("/api/nodes/reconnects", headers={"Authorization": f"Bearer {access_token}"})
+    assert response.status_code == status.HTTP_200_OK
+    stats = response.json()
+    assert (stats["concurrency"], stats["attempts"], stats["connected"], stats["failed"]) == (3, 2, 1, 1)
+    assert list(stats["nodes"]) == ["5"]
+    assert stats["nodes"]["5"]["state"] == "failed" and stats["nodes"]["5"]["failures"] == 1
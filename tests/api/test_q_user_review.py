@@ -0,0 +1,54 @@
+import asyncio
+from array import array
+from datetime import datetime as dt, timedelta as td, timezone as tz
+from types import SimpleNamespace
+
+from app.db.models import UserStatus
+from app.usage import UsageAccumulator, UsageColumns
+from app.usage.review import DeadlineHeap, UserReview
+
+
+def review_user(user_id: int, status=UserStatus.active, **fields):
+    values = {"expire": None, "data_limit": None, "used_traffic": 0, "on_hold_timeout": None}
+    return SimpleNamespace(id=user_id, status=status, **values | fields)
+
+
+def test_deadline_heap():
+    """Test that due deadlines pop in order and moved or removed deadlines are skipped."""
+    heap = DeadlineHeap()
+    for user_id, deadline in [(1, 30), (2, 10), (3, 20), (4, 40)]:
+        heap.set(user_id, deadline)
+    heap.set(2, 50)
+    heap.remove([3])
+
+    assert heap.next_deadline() == 30
+    assert heap.pop_due(45) == [1, 4]
+    assert heap.pop_due(45) == []
+    assert len(heap) == 1 and heap.next_deadline() == 50
+
+
+def test_user_review_due_users():
+    """Test that expired, limited and on hold users are taken once they are due."""
+
+    async def run():
+        review = UserReview(UsageAccumulator())
+        now = dt.now(tz.utc)
+        review.update(review_user(1, expire=now - td(seconds=1)))
+        review.update(review_user(2, expire=now + td(hours=1), data_limit=100, used_traffic=40))
+        review.update(review_user(3, UserStatus.on_hold, on_hold_timeout=now + td(hours=1)))
+        review.update(review_user(4, UserStatus.on_hold))
+        review.update(review_user(5, UserStatus.disabled, expire=now - td(seconds=1)))
+
+        await asyncio.wait_for(review.wait(), 1)
+        assert review.take_due() == ([1], [], [])
+
+        review.add_usage(UsageColumns(array("q", [2, 4]), array("q", [50, 1])))
+        assert review.take_due() == ([], [], [4])
+        review.add_usage(UsageColumns(array("q", [2]), array("q", [10])))
+        await asyncio.wait_for(review.wait(), 1)
+        assert review.take_due() == ([], [2], [])
+
+        assert review.take_due(now=(now + td(hours=2)).timestamp()) == ([2], [], [3])
+        assert review.stats() == {"expires": 0, "on_hold_timeouts": 0, "limits": 0, "on_hold": 0}
+
+    asyncio.run(run())
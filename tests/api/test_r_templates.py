@@ -0,0 +1,37 @@
+import jinja2
+import pytest
+
+from app.templates import env, template_artifact, uses_volatile_globals
+
+TEMPLATES = {
+    "test/static.txt": "static",
+    "test/now.txt": "{{ now().timestamp() }}",
+    "test/include-now.txt": "{% include 'test/now.txt' %}",
+}
+
+
+def test_template_artifact_skips_volatile_globals(monkeypatch: pytest.MonkeyPatch):
+    """Test that templates using now(), directly or through an include, are rendered on every call."""
+    loader = jinja2.ChoiceLoader([jinja2.DictLoader(TEMPLATES), env.loader])
+    monkeypatch.setattr(env, "loader", loader)
+    ticks = iter(range(1, 100))
+    monkeypatch.setitem(env.globals, "now", lambda: type("Now", (), {"timestamp": lambda self: next(ticks)})())
+
+    assert not uses_volatile_globals("test/static.txt")
+    assert uses_volatile_globals("test/include-now.txt")
+
+    assert template_artifact("test/static.txt", list) is template_artifact("test/static.txt", list)
+    assert template_artifact("test/now.txt", str) == "1"
+    assert template_artifact("test/now.txt", str) == "2"
+    assert template_artifact("test/include-now.txt", str) == "3"
+    assert template_artifact("test/include-now.txt", str) == "4"
+
+
+def test_template_artifact_reloads_included_templates(monkeypatch: pytest.MonkeyPatch):
+    """Test that editing a template included by a cached one rebuilds the artifact."""
+    templates = {"test/main.txt": "main {% include 'test/part.txt' %}", "test/part.txt": "one"}
+    monkeypatch.setattr(env, "loader", jinja2.ChoiceLoader([jinja2.DictLoader(templates), env.loader]))
+
+    assert template_artifact("test/main.txt", str) == "main one"
+    templates["test/part.txt"] = "two"
+    assert template_artifact("test/main.txt", str) == "main two"
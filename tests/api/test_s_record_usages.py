@@ -0,0 +1,163 @@
+import asyncio
+from datetime import datetime as dt, timezone as tz
+from types import SimpleNamespace
+
+from PasarGuardNodeBridge.common.service_pb2 import Stat
+from sqlalchemy import event, select
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.pool import StaticPool
+
+from app.db import base
+from app.db.models import Node, NodeUserUsage, User
+from app.jobs import record_usages
+from app.usage import UsageAccumulator, UsageColumns
+from app.usage.review import UserReview
+from tests.api import GetTestDB
+
+HOUR = dt(2025, 1, 1, 10, tzinfo=tz.utc)
+
+
+async def usage_session():
+    """A database of its own with foreign keys enforced, so usages of removed users are rejected."""
+    engine = create_async_engine("sqlite+aiosqlite:///:memory:", poolclass=StaticPool)
+
+    @event.listens_for(engine.sync_engine, "connect")
+    def enable_foreign_keys(dbapi_connection, _):
+        dbapi_connection.execute("PRAGMA foreign_keys=ON")
+
+    async with engine.begin() as conn:
+        await conn.run_sync(base.Base.metadata.create_all)
+
+    db = async_sessionmaker(engine, expire_on_commit=False)()
+    db.add_all([User(username="first", proxy_settings={}), User(username="second", proxy_settings={})])
+    db.add(Node(name="node", address="127.0.0.1", port=62050, server_ca="", api_key=None, core_config_id=None))
+    await db.commit()
+    return db
+
+
+async def node_user_usages(db) -> dict[int, int]:
+    rows = await db.execute(
+        select(NodeUserUsage.user_id, NodeUserUsage.used_traffic).where(NodeUserUsage.created_at == HOUR)
+    )
+    return dict(rows.all())
+
+
+def test_upsert_node_user_usages_adds_up():
+    """Test that usages of the same user, node and hour add up in one row."""
+
+    async def run():
+        db = await usage_session()
+        await record_usages.upsert_node_user_usages(db, [{"uid": 1, "value": 100}, {"uid": 2, "value": 5}], 1, HOUR)
+        await record_usages.upsert_node_user_usages(db, [{"uid": 1, "value": 50}], 1, HOUR)
+        assert await node_user_usages(db) == {1: 150, 2: 5}
+        await db.close()
+        await db.bind.dispose()
+
+    asyncio.run(run())
+
+
+def test_upsert_node_user_usages_of_removed_users():
+    """Test that usages of removed users are dropped and the rest of the batch is still written."""
+
+    async def run():
+        db = await usage_session()
+        params = [{"uid": 1, "value": 100}, {"uid": 404, "value": 7}, {"uid": 2, "value": 5}]
+        await record_usages.upsert_existing_node_user_usages(db, params, 1, HOUR)
+        assert await node_user_usages(db) == {1: 100, 2: 5}
+
+        # nothing is written for a removed node
+        await record_usages.upsert_existing_node_user_usages(db, [{"uid": 1, "value": 1}], 404, HOUR)
+        assert await node_user_usages(db) == {1: 100, 2: 5}
+        await db.close()
+        await db.bind.dispose()
+
+    asyncio.run(run())
+
+
+def test_parse_users_stats(monkeypatch):
+    """Test that user stats are summed by uid across chunks, with or without the username in the name."""
+    monkeypatch.setattr(record_usages, "USERS_STATS_CHUNK_SIZE", 2)
+    stats = [
+        Stat(name="1.first", type="uplink", value=10),
+        Stat(name="2", type="uplink", value=5),
+        # split from the first stat of its user by the chunk boundary
+        Stat(name="1.first", type="downlink", value=20),
+        Stat(name="3.third.with.dots", type="uplink", value=0),
+        Stat(name="3.third.with.dots", type="downlink", value=7),
+    ]
+    usage = asyncio.run(record_usages.parse_users_stats(stats))
+    assert dict(usage) == {1: 30, 2: 5, 3: 7}
+    assert asyncio.run(record_usages.parse_users_stats([])).uids.tolist() == []
+
+
+def test_usage_columns():
+    """Test that usage columns keep each user's value and scale them by the node coefficient."""
+    usage = UsageColumns.from_dict({3: 100, 1: 7})
+    assert len(usage) == 2 and list(usage) == [(3, 100), (1, 7)]
+    assert usage.scale(1) is usage
+
+    scaled = usage.scale(1.5)
+    assert scaled.uids is usage.uids
+    assert list(scaled) == [(3, 150), (1, 10)]
+
+    accumulator = UsageAccumulator()
+    online_at = dt.now(tz.utc)
+    accumulator.add_users(usage, online_at)
+    accumulator.add_users(scaled, online_at)
+    assert accumulator.pending_users_usage() == {3: 250, 1: 17}
+
+
+class StatsNode:
+    """Answers user stats after ``release`` is set, counting the requests."""
+
+    def __init__(self, stats: list):
+        self.stats = stats
+        self.requests = 0
+        self.release = asyncio.Event()
+
+    async def get_stats(self, stat_type, reset, timeout):
+        self.requests += 1
+        await self.release.wait()
+        return SimpleNamespace(stats=self.stats)
+
+
+def test_record_user_usages_per_node(monkeypatch):
+    """Test that each node's usage is accounted on arrival and a slow node isn't collected twice at once."""
+
+    async def run():
+        accumulator = UsageAccumulator()
+        collection_stats = {}
+        monkeypatch.setattr(record_usages, "GetDB", GetTestDB)
+        monkeypatch.setattr(record_usages, "usage_accumulator", accumulator)
+        monkeypatch.setattr(record_usages, "user_review", UserReview(accumulator))
+        monkeypatch.setattr(record_usages, "node_collection_stats", collection_stats)
+        monkeypatch.setattr(record_usages, "_collections", {})
+
+        fast = StatsNode([Stat(name="901.fast", type="uplink", value=10)])
+        slow = StatsNode([Stat(name="901.fast", type="uplink", value=5), Stat(name="902", type="uplink", value=1)])
+        fast.release.set()
+
+        async def get_healthy_nodes():
+            return [(1, fast), (2, slow)]
+
+        monkeypatch.setattr(record_usages.node_manager, "get_healthy_nodes", get_healthy_nodes)
+        monkeypatch.setattr(
+            record_usages.node_manager, "get_usage_coefficient", lambda node_id: 2 if node_id == 2 else 1
+        )
+
+        await record_usages.record_user_usages()
+        await asyncio.sleep(0.05)
+        # the fast node is accounted while the slow one is still collecting
+        assert accumulator.pending_users_usage() == {901: 10}
+        assert list(collection_stats) == [1] and collection_stats[1].users == 1
+
+        await record_usages.record_user_usages()
+        await asyncio.sleep(0.05)
+        assert (fast.requests, slow.requests) == (2, 1)
+
+        slow.release.set()
+        await asyncio.sleep(0.05)
+        assert accumulator.pending_users_usage() == {901: 30, 902: 2}
+        assert collection_stats[2].users == 2
+
+    asyncio.run(run())